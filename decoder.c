@@ -42,8 +42,17 @@
 /* The list of loaded protocol decoders. */
 static GSList *pd_list = NULL;
 
+/*
+ * The metadata index which tools/install-decoders writes into the
+ * decoders directory. Must match _index_file and _index_version there.
+ */
+#define INDEX_FILE	"decoders.index"
+#define INDEX_GROUP	"libsigrokdecode-index"
+#define INDEX_VERSION	1
+
 /* srd.c */
 extern SRD_PRIV GSList *searchpaths;
+extern SRD_PRIV struct srd_startup_times startup_times;
 
 /* session.c */
 extern SRD_PRIV GSList *sessions;
@@ -170,11 +179,16 @@ static void decoder_free(struct srd_decoder *dec)
 		return;
 
 	gstate = PyGILState_Ensure();
+	Py_XDECREF(dec->py_ann_text_ids);
 	Py_XDECREF(dec->py_dec);
 	Py_XDECREF(dec->py_mod);
 	PyGILState_Release(gstate);
 
+	if (dec->ann_texts)
+		g_ptr_array_free(dec->ann_texts, TRUE);
+
 	g_slist_free_full(dec->options, &decoder_option_free);
+	g_slist_free_full(dec->logic_output_channels, &logic_output_channel_free);
 	g_slist_free_full(dec->binary, (GDestroyNotify)&g_strfreev);
 	g_slist_free_full(dec->annotation_rows, &annotation_row_free);
 	g_slist_free_full(dec->annotations, (GDestroyNotify)&g_strfreev);
@@ -189,10 +203,21 @@ static void decoder_free(struct srd_decoder *dec)
 	g_free(dec->longname);
 	g_free(dec->name);
 	g_free(dec->id);
+	g_free(dec->module_name);
 
 	g_free(dec);
 }
 
+/* Account for the time spent loading a decoder, see srd_startup_times_get(). */
+static void decoder_times_add(struct srd_decoder *dec, int64_t import_time,
+		int64_t metadata_time)
+{
+	dec->import_time += import_time;
+	dec->metadata_time += metadata_time;
+	startup_times.import += import_time;
+	startup_times.metadata += metadata_time;
+}
+
 static int get_channels(const struct srd_decoder *d, const char *attr,
 		GSList **out_pdchl, int offset)
 {
@@ -800,64 +825,54 @@ static gboolean contains_duplicate_row_ids(GSList *list1, GSList *list2)
 	return FALSE;
 }
 
-/**
- * Load a protocol decoder module into the embedded Python interpreter.
- *
- * @param module_name The module name to be loaded.
- *
- * @return SRD_OK upon success, a (negative) error code otherwise.
- *
- * @since 0.1.0
+static struct srd_decoder *decoder_find_by_module(const char *module_name)
+{
+	GSList *l;
+	struct srd_decoder *dec;
+
+	for (l = pd_list; l; l = l->next) {
+		dec = l->data;
+		if (!strcmp(dec->module_name, module_name))
+			return dec;
+	}
+
+	return NULL;
+}
+
+/*
+ * Import the decoder's module and check its Decoder class. Must be
+ * called with the GIL held. Returns SRD_ERR_PYTHON if a Python exception
+ * is pending, SRD_ERR otherwise, with a description in fail_txt.
  */
-SRD_API int srd_decoder_load(const char *module_name)
+static int decoder_import(struct srd_decoder *d, const char **fail_txt)
 {
 	PyObject *py_basedec;
-	struct srd_decoder *d;
 	long apiver;
 	int is_subclass;
-	const char *fail_txt;
-	PyGILState_STATE gstate;
-
-	if (!srd_check_init())
-		return SRD_ERR;
-
-	if (!module_name)
-		return SRD_ERR_ARG;
-
-	gstate = PyGILState_Ensure();
-
-	if (PyDict_GetItemString(PyImport_GetModuleDict(), module_name)) {
-		/* Module was already imported. */
-		PyGILState_Release(gstate);
-		return SRD_OK;
-	}
-
-	d = g_malloc0(sizeof(struct srd_decoder));
-	fail_txt = NULL;
 
-	d->py_mod = py_import_by_name(module_name);
+	d->py_mod = py_import_by_name(d->module_name);
 	if (!d->py_mod) {
-		fail_txt = "import by name failed";
-		goto except_out;
+		*fail_txt = "import by name failed";
+		return SRD_ERR_PYTHON;
 	}
 
 	if (!mod_sigrokdecode) {
 		srd_err("sigrokdecode module not loaded.");
-		fail_txt = "sigrokdecode(3) not loaded";
-		goto err_out;
+		*fail_txt = "sigrokdecode(3) not loaded";
+		return SRD_ERR;
 	}
 
 	/* Get the 'Decoder' class as Python object. */
 	d->py_dec = PyObject_GetAttrString(d->py_mod, "Decoder");
 	if (!d->py_dec) {
-		fail_txt = "no 'Decoder' attribute in imported module";
-		goto except_out;
+		*fail_txt = "no 'Decoder' attribute in imported module";
+		return SRD_ERR_PYTHON;
 	}
 
 	py_basedec = PyObject_GetAttrString(mod_sigrokdecode, "Decoder");
 	if (!py_basedec) {
-		fail_txt = "no 'Decoder' attribute in sigrokdecode(3)";
-		goto except_out;
+		*fail_txt = "no 'Decoder' attribute in sigrokdecode(3)";
+		return SRD_ERR_PYTHON;
 	}
 
 	is_subclass = PyObject_IsSubclass(d->py_dec, py_basedec);
@@ -865,9 +880,9 @@ SRD_API int srd_decoder_load(const char *module_name)
 
 	if (!is_subclass) {
 		srd_err("Decoder class in protocol decoder module %s is not "
-			"a subclass of sigrokdecode.Decoder.", module_name);
-		fail_txt = "not a subclass of sigrokdecode.Decoder";
-		goto err_out;
+			"a subclass of sigrokdecode.Decoder.", d->module_name);
+		*fail_txt = "not a subclass of sigrokdecode.Decoder";
+		return SRD_ERR;
 	}
 
 	/*
@@ -877,28 +892,117 @@ SRD_API int srd_decoder_load(const char *module_name)
 	apiver = srd_decoder_apiver(d);
 	if (apiver != 3) {
 		srd_exception_catch("Only PD API version 3 is supported, "
-			"decoder %s has version %ld", module_name, apiver);
-		fail_txt = "API version mismatch";
-		goto err_out;
+			"decoder %s has version %ld", d->module_name, apiver);
+		*fail_txt = "API version mismatch";
+		return SRD_ERR;
 	}
 
 	/* Check Decoder class for required methods. */
 
-	if (check_method(d->py_dec, module_name, "reset") != SRD_OK) {
-		fail_txt = "no 'reset()' method";
-		goto err_out;
+	if (check_method(d->py_dec, d->module_name, "reset") != SRD_OK) {
+		*fail_txt = "no 'reset()' method";
+		return SRD_ERR;
 	}
 
-	if (check_method(d->py_dec, module_name, "start") != SRD_OK) {
-		fail_txt = "no 'start()' method";
-		goto err_out;
+	if (check_method(d->py_dec, d->module_name, "start") != SRD_OK) {
+		*fail_txt = "no 'start()' method";
+		return SRD_ERR;
 	}
 
-	if (check_method(d->py_dec, module_name, "decode") != SRD_OK) {
-		fail_txt = "no 'decode()' method";
-		goto err_out;
+	if (check_method(d->py_dec, d->module_name, "decode") != SRD_OK) {
+		*fail_txt = "no 'decode()' method";
+		return SRD_ERR;
+	}
+
+	return SRD_OK;
+}
+
+/* Check the decoder's metadata for duplicate IDs. */
+static const char *decoder_check_ids(const struct srd_decoder *d)
+{
+	if (contains_duplicates(d->inputs))
+		return "duplicate input IDs";
+
+	if (contains_duplicates(d->outputs))
+		return "duplicate output IDs";
+
+	if (contains_duplicates(d->tags))
+		return "duplicate tags";
+
+	if (contains_duplicate_ids(d->channels, d->channels))
+		return "duplicate channel IDs";
+
+	if (contains_duplicate_ids(d->opt_channels, d->opt_channels))
+		return "duplicate optional channel IDs";
+
+	if (contains_duplicate_ids(d->channels, d->opt_channels))
+		return "channel and optional channel IDs contain duplicates";
+
+	if (contains_duplicate_ids(d->options, d->options))
+		return "duplicate option IDs";
+
+	if (contains_duplicate_ids(d->annotations, d->annotations))
+		return "duplicate annotation class IDs";
+
+	if (contains_duplicate_row_ids(d->annotation_rows, d->annotation_rows))
+		return "duplicate annotation row IDs";
+
+	if (contains_duplicate_ids(d->annotations, d->annotation_rows))
+		return "annotation class/row IDs contain duplicates";
+
+	if (contains_duplicate_ids(d->binary, d->binary))
+		return "duplicate binary class IDs";
+
+	return NULL;
+}
+
+/**
+ * Load a protocol decoder module into the embedded Python interpreter.
+ *
+ * @param module_name The module name to be loaded.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.1.0
+ */
+SRD_API int srd_decoder_load(const char *module_name)
+{
+	struct srd_decoder *d;
+	const char *fail_txt;
+	int64_t start, imported;
+	int ret;
+	PyGILState_STATE gstate;
+
+	if (!srd_check_init())
+		return SRD_ERR;
+
+	if (!module_name)
+		return SRD_ERR_ARG;
+
+	/* Decoders listed from an index are loaded, but not imported yet. */
+	if (decoder_find_by_module(module_name))
+		return SRD_OK;
+
+	gstate = PyGILState_Ensure();
+
+	if (PyDict_GetItemString(PyImport_GetModuleDict(), module_name)) {
+		/* Module was already imported. */
+		PyGILState_Release(gstate);
+		return SRD_OK;
 	}
 
+	d = g_malloc0(sizeof(struct srd_decoder));
+	d->module_name = g_strdup(module_name);
+	fail_txt = NULL;
+
+	start = g_get_monotonic_time();
+	ret = decoder_import(d, &fail_txt);
+	imported = g_get_monotonic_time();
+	if (ret == SRD_ERR_PYTHON)
+		goto except_out;
+	if (ret != SRD_OK)
+		goto err_out;
+
 	/* Store required fields in newly allocated strings. */
 	if (py_attr_as_str(d->py_dec, "id", &(d->id)) != SRD_OK) {
 		fail_txt = "no 'id' attribute";
@@ -974,60 +1078,8 @@ SRD_API int srd_decoder_load(const char *module_name)
 		goto err_out;
 	}
 
-	if (contains_duplicates(d->inputs)) {
-		fail_txt = "duplicate input IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicates(d->outputs)) {
-		fail_txt = "duplicate output IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicates(d->tags)) {
-		fail_txt = "duplicate tags";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->channels, d->channels)) {
-		fail_txt = "duplicate channel IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->opt_channels, d->opt_channels)) {
-		fail_txt = "duplicate optional channel IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->channels, d->opt_channels)) {
-		fail_txt = "channel and optional channel IDs contain duplicates";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->options, d->options)) {
-		fail_txt = "duplicate option IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->annotations, d->annotations)) {
-		fail_txt = "duplicate annotation class IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicate_row_ids(d->annotation_rows, d->annotation_rows)) {
-		fail_txt = "duplicate annotation row IDs";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->annotations, d->annotation_rows)) {
-		fail_txt = "annotation class/row IDs contain duplicates";
-		goto err_out;
-	}
-
-	if (contains_duplicate_ids(d->binary, d->binary)) {
-		fail_txt = "duplicate binary class IDs";
+	if ((fail_txt = decoder_check_ids(d)))
 		goto err_out;
-	}
 
 	if (get_logic_output_channels(d) != SRD_OK) {
 		fail_txt = "cannot get logic output channels";
@@ -1036,6 +1088,11 @@ SRD_API int srd_decoder_load(const char *module_name)
 
 	PyGILState_Release(gstate);
 
+	decoder_times_add(d, imported - start,
+			g_get_monotonic_time() - imported);
+	srd_dbg("Loaded decoder %s: import %" PRId64 " us, metadata %"
+		PRId64 " us.", module_name, d->import_time, d->metadata_time);
+
 	/* Append it to the list of loaded decoders. */
 	pd_list = g_slist_append(pd_list, d);
 
@@ -1052,12 +1109,80 @@ except_out:
 err_out:
 	if (fail_txt)
 		srd_err("Failed to load decoder %s: %s", module_name, fail_txt);
+	/* Failed imports (e.g. of "common") still cost startup time. */
+	decoder_times_add(d, imported - start, 0);
 	decoder_free(d);
 	PyGILState_Release(gstate);
 
 	return SRD_ERR_PYTHON;
 }
 
+/**
+ * Import the Python module of a decoder which was loaded from an index.
+ *
+ * Decoders loaded from an index only carry their metadata, the module
+ * gets imported when it is first needed, e.g. by srd_inst_new().
+ *
+ * @param dec The loaded protocol decoder. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @private
+ */
+SRD_PRIV int srd_decoder_import(struct srd_decoder *dec)
+{
+	const char *fail_txt;
+	char *id;
+	int64_t start;
+	int ret;
+	PyGILState_STATE gstate;
+
+	gstate = PyGILState_Ensure();
+
+	if (dec->py_dec) {
+		PyGILState_Release(gstate);
+		return SRD_OK;
+	}
+
+	fail_txt = NULL;
+	start = g_get_monotonic_time();
+	ret = decoder_import(dec, &fail_txt);
+	if (ret == SRD_OK) {
+		/* Catch an index which is out of date with the decoders. */
+		if (py_attr_as_str(dec->py_dec, "id", &id) != SRD_OK) {
+			fail_txt = "no 'id' attribute";
+			ret = SRD_ERR;
+		} else {
+			if (strcmp(id, dec->id)) {
+				fail_txt = "decoder ID does not match the index";
+				ret = SRD_ERR;
+			}
+			g_free(id);
+		}
+	}
+
+	if (ret == SRD_ERR_PYTHON)
+		srd_exception_catch("Failed to import decoder %s: %s",
+				dec->module_name, fail_txt);
+	else if (ret != SRD_OK)
+		srd_err("Failed to import decoder %s: %s",
+				dec->module_name, fail_txt);
+
+	if (ret != SRD_OK) {
+		Py_CLEAR(dec->py_dec);
+		Py_CLEAR(dec->py_mod);
+		ret = SRD_ERR_PYTHON;
+	}
+
+	decoder_times_add(dec, g_get_monotonic_time() - start, 0);
+	srd_dbg("Imported decoder %s: import %" PRId64 " us.",
+		dec->module_name, dec->import_time);
+
+	PyGILState_Release(gstate);
+
+	return ret;
+}
+
 /**
  * Return a protocol decoder's docstring.
  *
@@ -1077,7 +1202,10 @@ SRD_API char *srd_decoder_doc_get(const struct srd_decoder *dec)
 	if (!srd_check_init())
 		return NULL;
 
-	if (!dec || !dec->py_mod)
+	if (!dec)
+		return NULL;
+
+	if (srd_decoder_import((struct srd_decoder *)dec) != SRD_OK)
 		return NULL;
 
 	gstate = PyGILState_Ensure();
@@ -1105,6 +1233,40 @@ err:
 	return NULL;
 }
 
+/**
+ * Return an interned annotation text of a protocol decoder.
+ *
+ * See srd_session_ann_text_ids_set().
+ *
+ * @param dec The loaded protocol decoder. Must not be NULL.
+ * @param id The ID of the text, as found in the 'ann_text_ids' of
+ *           struct srd_proto_data_annotation.
+ *
+ * @return The text, or NULL if there is no text with this ID. The text
+ *         remains valid until the decoder gets unloaded, and must not be
+ *         free'd by the caller.
+ *
+ * @since 0.6.0
+ */
+SRD_API const char *srd_decoder_ann_text_get(const struct srd_decoder *dec,
+		unsigned int id)
+{
+	const char *text;
+	PyGILState_STATE gstate;
+
+	if (!dec)
+		return NULL;
+
+	/* Decoders add texts to the table while holding the GIL. */
+	gstate = PyGILState_Ensure();
+	text = NULL;
+	if (dec->ann_texts && id < dec->ann_texts->len)
+		text = g_ptr_array_index(dec->ann_texts, id);
+	PyGILState_Release(gstate);
+
+	return text;
+}
+
 /**
  * Unload the specified protocol decoder.
  *
@@ -1144,16 +1306,412 @@ SRD_API int srd_decoder_unload(struct srd_decoder *dec)
 	return SRD_OK;
 }
 
+static void index_columns_free(char ***cols, gsize num)
+{
+	gsize i;
+
+	for (i = 0; i < num; i++)
+		g_strfreev(cols[i]);
+}
+
+/*
+ * Get several string lists of the same length from a decoder's group in
+ * the index, e.g. the IDs and the descriptions of its annotation classes.
+ */
+static int index_get_columns(GKeyFile *index, const char *group,
+		const char *const *keys, char ***cols, gsize *len)
+{
+	gsize i, n;
+
+	for (i = 0; keys[i]; i++) {
+		cols[i] = g_key_file_get_string_list(index, group, keys[i],
+				&n, NULL);
+		if (!cols[i] || (i > 0 && n != *len)) {
+			index_columns_free(cols, i + 1);
+			return SRD_ERR;
+		}
+		*len = n;
+	}
+
+	return SRD_OK;
+}
+
+static int index_get_strlist(GKeyFile *index, const char *group,
+		const char *key, GSList **out_list)
+{
+	const char *keys[] = { key, NULL };
+	char **cols[1];
+	GSList *list;
+	gsize i, len;
+
+	if (index_get_columns(index, group, keys, cols, &len) != SRD_OK)
+		return SRD_ERR;
+
+	list = NULL;
+	for (i = len; i > 0; i--)
+		list = g_slist_prepend(list, g_strdup(cols[0][i - 1]));
+	index_columns_free(cols, 1);
+	*out_list = list;
+
+	return SRD_OK;
+}
+
+static int index_get_channels(GKeyFile *index, struct srd_decoder *d,
+		const char *const *keys, GSList **out_pdchl, int offset)
+{
+	char **cols[3];
+	struct srd_channel *pdch;
+	GSList *pdchl;
+	gsize i, len;
+
+	if (index_get_columns(index, d->module_name, keys, cols, &len) != SRD_OK)
+		return SRD_ERR;
+
+	pdchl = NULL;
+	for (i = len; i > 0; i--) {
+		pdch = g_malloc(sizeof(struct srd_channel));
+		pdch->id = g_strdup(cols[0][i - 1]);
+		pdch->name = g_strdup(cols[1][i - 1]);
+		pdch->desc = g_strdup(cols[2][i - 1]);
+		pdch->order = offset + i - 1;
+		pdchl = g_slist_prepend(pdchl, pdch);
+	}
+	index_columns_free(cols, 3);
+	*out_pdchl = pdchl;
+
+	return SRD_OK;
+}
+
+static int index_get_options(GKeyFile *index, struct srd_decoder *d)
+{
+	const char *keys[] = { "options", "option_descs", "option_defaults",
+			"option_values", NULL };
+	char **cols[4];
+	struct srd_decoder_option *o;
+	GVariant *gvar, *gvalues;
+	GSList *options;
+	gsize i, j, len;
+	int ret;
+
+	if (index_get_columns(index, d->module_name, keys, cols, &len) != SRD_OK)
+		return SRD_ERR;
+
+	options = NULL;
+	ret = SRD_OK;
+	for (i = len; i > 0; i--) {
+		o = g_malloc0(sizeof(struct srd_decoder_option));
+		/* Add to list right away so it doesn't get lost. */
+		options = g_slist_prepend(options, o);
+
+		o->id = g_strdup(cols[0][i - 1]);
+		if (*cols[1][i - 1])
+			o->desc = g_strdup(cols[1][i - 1]);
+		if (*cols[2][i - 1]) {
+			o->def = g_variant_parse(NULL, cols[2][i - 1],
+					NULL, NULL, NULL);
+			if (!o->def) {
+				ret = SRD_ERR;
+				break;
+			}
+		}
+
+		gvalues = g_variant_parse(G_VARIANT_TYPE("av"),
+				cols[3][i - 1], NULL, NULL, NULL);
+		if (!gvalues) {
+			ret = SRD_ERR;
+			break;
+		}
+		for (j = g_variant_n_children(gvalues); j > 0; j--) {
+			gvar = g_variant_get_child_value(gvalues, j - 1);
+			o->values = g_slist_prepend(o->values,
+					g_variant_get_variant(gvar));
+			g_variant_unref(gvar);
+		}
+		g_variant_unref(gvalues);
+	}
+	index_columns_free(cols, 4);
+
+	if (ret != SRD_OK) {
+		g_slist_free_full(options, &decoder_option_free);
+		return ret;
+	}
+	d->options = options;
+
+	return SRD_OK;
+}
+
+/* Get annotation or binary classes as GSList of char **. */
+static int index_get_classes(GKeyFile *index, struct srd_decoder *d,
+		const char *const *keys, GSList **out_list)
+{
+	char **cols[2], **pair;
+	GSList *list;
+	gsize i, len;
+
+	if (index_get_columns(index, d->module_name, keys, cols, &len) != SRD_OK)
+		return SRD_ERR;
+
+	list = NULL;
+	for (i = len; i > 0; i--) {
+		pair = g_malloc0(3 * sizeof(char *));
+		pair[0] = g_strdup(cols[0][i - 1]);
+		pair[1] = g_strdup(cols[1][i - 1]);
+		list = g_slist_prepend(list, pair);
+	}
+	index_columns_free(cols, 2);
+	*out_list = list;
+
+	return SRD_OK;
+}
+
+static int index_get_annotation_rows(GKeyFile *index, struct srd_decoder *d)
+{
+	const char *keys[] = { "annotation_rows", "annotation_row_descs",
+			"annotation_row_classes", NULL };
+	char **cols[3], **classes, *end;
+	struct srd_decoder_annotation_row *ann_row;
+	GSList *annotation_rows;
+	guint64 class_idx;
+	gsize i, k, len;
+	int ret;
+
+	if (index_get_columns(index, d->module_name, keys, cols, &len) != SRD_OK)
+		return SRD_ERR;
+
+	annotation_rows = NULL;
+	ret = SRD_OK;
+	for (i = len; i > 0 && ret == SRD_OK; i--) {
+		ann_row = g_malloc0(sizeof(struct srd_decoder_annotation_row));
+		/* Add to list right away so it doesn't get lost. */
+		annotation_rows = g_slist_prepend(annotation_rows, ann_row);
+
+		ann_row->id = g_strdup(cols[0][i - 1]);
+		ann_row->desc = g_strdup(cols[1][i - 1]);
+
+		classes = g_strsplit(cols[2][i - 1], ",", 0);
+		for (k = g_strv_length(classes); k > 0; k--) {
+			class_idx = g_ascii_strtoull(classes[k - 1], &end, 10);
+			if (end == classes[k - 1] || *end) {
+				ret = SRD_ERR;
+				break;
+			}
+			ann_row->ann_classes = g_slist_prepend(ann_row->ann_classes,
+					GSIZE_TO_POINTER(class_idx));
+		}
+		g_strfreev(classes);
+	}
+	index_columns_free(cols, 3);
+
+	if (ret != SRD_OK) {
+		g_slist_free_full(annotation_rows, &annotation_row_free);
+		return ret;
+	}
+	d->annotation_rows = annotation_rows;
+
+	return SRD_OK;
+}
+
+static int index_get_logic_output_channels(GKeyFile *index,
+		struct srd_decoder *d)
+{
+	const char *keys[] = { "logic_output_channels",
+			"logic_output_channel_descs", NULL };
+	char **cols[2];
+	struct srd_decoder_logic_output_channel *logic_out_ch;
+	GSList *logic_out_chs;
+	gsize i, len;
+
+	if (index_get_columns(index, d->module_name, keys, cols, &len) != SRD_OK)
+		return SRD_ERR;
+
+	logic_out_chs = NULL;
+	for (i = len; i > 0; i--) {
+		logic_out_ch = g_malloc0(sizeof(*logic_out_ch));
+		logic_out_ch->id = g_strdup(cols[0][i - 1]);
+		logic_out_ch->desc = g_strdup(cols[1][i - 1]);
+		logic_out_chs = g_slist_prepend(logic_out_chs, logic_out_ch);
+	}
+	index_columns_free(cols, 2);
+	d->logic_output_channels = logic_out_chs;
+
+	return SRD_OK;
+}
+
+/*
+ * Load a decoder from its entry in the index, without importing its
+ * Python module. Returns FALSE if the entry is unusable, the caller then
+ * loads the decoder by importing it.
+ */
+static gboolean decoder_load_indexed(GKeyFile *index, const char *module_name)
+{
+	const char *channel_keys[] = { "channels", "channel_names",
+			"channel_descs", NULL };
+	const char *opt_channel_keys[] = { "optional_channels",
+			"optional_channel_names", "optional_channel_descs", NULL };
+	const char *ann_keys[] = { "annotations", "annotation_descs", NULL };
+	const char *bin_keys[] = { "binary", "binary_descs", NULL };
+	struct srd_decoder *d;
+	const char *fail_txt;
+	int64_t start;
+
+	if (decoder_find_by_module(module_name))
+		return TRUE;
+
+	start = g_get_monotonic_time();
+	d = g_malloc0(sizeof(struct srd_decoder));
+	d->module_name = g_strdup(module_name);
+	fail_txt = NULL;
+
+	d->id = g_key_file_get_string(index, module_name, "id", NULL);
+	d->name = g_key_file_get_string(index, module_name, "name", NULL);
+	d->longname = g_key_file_get_string(index, module_name, "longname", NULL);
+	d->desc = g_key_file_get_string(index, module_name, "desc", NULL);
+	d->license = g_key_file_get_string(index, module_name, "license", NULL);
+	if (!d->id || !d->name || !d->longname || !d->desc || !d->license)
+		fail_txt = "missing name or description";
+	else if (index_get_strlist(index, module_name, "inputs", &d->inputs) != SRD_OK
+			|| index_get_strlist(index, module_name, "outputs", &d->outputs) != SRD_OK
+			|| index_get_strlist(index, module_name, "tags", &d->tags) != SRD_OK)
+		fail_txt = "malformed inputs, outputs or tags";
+	else if (index_get_options(index, d) != SRD_OK)
+		fail_txt = "malformed options";
+	else if (index_get_channels(index, d, channel_keys, &d->channels, 0) != SRD_OK
+			|| index_get_channels(index, d, opt_channel_keys,
+				&d->opt_channels, g_slist_length(d->channels)) != SRD_OK)
+		fail_txt = "malformed channels";
+	else if (index_get_classes(index, d, ann_keys, &d->annotations) != SRD_OK
+			|| index_get_annotation_rows(index, d) != SRD_OK)
+		fail_txt = "malformed annotation classes";
+	else if (index_get_classes(index, d, bin_keys, &d->binary) != SRD_OK)
+		fail_txt = "malformed binary classes";
+	else if (index_get_logic_output_channels(index, d) != SRD_OK)
+		fail_txt = "malformed logic output channels";
+	else
+		fail_txt = decoder_check_ids(d);
+
+	if (fail_txt) {
+		srd_dbg("Ignoring index entry of decoder %s: %s.",
+			module_name, fail_txt);
+		decoder_free(d);
+		return FALSE;
+	}
+
+	decoder_times_add(d, 0, g_get_monotonic_time() - start);
+	srd_dbg("Loaded decoder %s from index: metadata %" PRId64 " us.",
+		module_name, d->metadata_time);
+
+	pd_list = g_slist_append(pd_list, d);
+
+	return TRUE;
+}
+
+/* Parse an index, which was read from the file or archive 'name'. */
+static GKeyFile *index_parse(const char *data, gsize len, const char *name)
+{
+	GKeyFile *index;
+	GError *error;
+
+	index = g_key_file_new();
+	error = NULL;
+	if (!g_key_file_load_from_data(index, data, len, G_KEY_FILE_NONE, &error)) {
+		srd_err("Failed to read decoder index %s: %s.",
+			name, error->message);
+		g_error_free(error);
+		g_key_file_free(index);
+		return NULL;
+	}
+
+	if (g_key_file_get_integer(index, INDEX_GROUP, "version", NULL)
+			!= INDEX_VERSION) {
+		srd_err("Decoder index %s has an unsupported version.", name);
+		g_key_file_free(index);
+		return NULL;
+	}
+
+	srd_dbg("Using decoder index %s.", name);
+
+	return index;
+}
+
+/* Open the index in a decoders directory, if there is a usable one. */
+static GKeyFile *index_open(const char *path)
+{
+	GKeyFile *index;
+	char *filename, *data;
+	gsize len;
+
+	filename = g_build_filename(path, INDEX_FILE, NULL);
+	if (!g_file_get_contents(filename, &data, &len, NULL)) {
+		g_free(filename);
+		return NULL;
+	}
+
+	index = index_parse(data, len, filename);
+	g_free(data);
+	g_free(filename);
+
+	return index;
+}
+
+/*
+ * Open the index in a zip archive of decoders, if there is a usable one.
+ * Must be called with the GIL held.
+ */
+static GKeyFile *index_open_zip(PyObject *zipimporter, const char *zip_path,
+		const char *prefix)
+{
+	PyObject *py_data;
+	GKeyFile *index;
+	char *path;
+
+	path = g_strconcat(prefix, INDEX_FILE, NULL);
+	py_data = PyObject_CallMethod(zipimporter, "get_data", "s", path);
+	g_free(path);
+	if (!py_data || !PyBytes_Check(py_data)) {
+		/* No index in this archive. */
+		Py_XDECREF(py_data);
+		PyErr_Clear();
+		return NULL;
+	}
+
+	index = index_parse(PyBytes_AsString(py_data),
+			PyBytes_Size(py_data), zip_path);
+	Py_DECREF(py_data);
+
+	return index;
+}
+
+/* Check whether the index lists a directory entry as not being a PD. */
+static gboolean index_ignores(GKeyFile *index, const char *direntry)
+{
+	char **ignore;
+	gboolean ret;
+	gsize i;
+
+	ignore = g_key_file_get_string_list(index, INDEX_GROUP, "ignore",
+			NULL, NULL);
+	ret = FALSE;
+	for (i = 0; ignore && ignore[i]; i++) {
+		if (!strcmp(direntry, ignore[i]))
+			ret = TRUE;
+	}
+	g_strfreev(ignore);
+
+	return ret;
+}
+
 static void srd_decoder_load_all_zip_path(char *zip_path)
 {
 	PyObject *zipimport_mod, *zipimporter_class, *zipimporter;
 	PyObject *prefix_obj, *files, *key, *value, *set, *modname;
 	Py_ssize_t pos = 0;
+	GKeyFile *index;
 	char *prefix;
 	size_t prefix_len;
 	PyGILState_STATE gstate;
 
 	set = files = prefix_obj = zipimporter = zipimporter_class = NULL;
+	index = NULL;
 
 	gstate = PyGILState_Ensure();
 
@@ -1186,6 +1744,12 @@ static void srd_decoder_load_all_zip_path(char *zip_path)
 
 	prefix_len = strlen(prefix);
 
+	/*
+	 * Like in decoder directories, an index lets decoders get imported
+	 * only once they are needed.
+	 */
+	index = index_open_zip(zipimporter, zip_path, prefix);
+
 	while (PyDict_Next(files, &pos, &key, &value)) {
 		char *path, *slash;
 		if (py_str_as_str(key, &path) == SRD_OK) {
@@ -1211,13 +1775,18 @@ static void srd_decoder_load_all_zip_path(char *zip_path)
 		char *modname_str;
 		if (py_str_as_str(modname, &modname_str) == SRD_OK) {
 			/* The directory name is the module name (e.g. "i2c"). */
-			srd_decoder_load(modname_str);
+			if (!index || (!index_ignores(index, modname_str)
+					&& !(g_key_file_has_group(index, modname_str)
+					&& decoder_load_indexed(index, modname_str))))
+				srd_decoder_load(modname_str);
 			g_free(modname_str);
 		}
 		Py_DECREF(modname);
 	}
 
 err_out:
+	if (index)
+		g_key_file_free(index);
 	Py_XDECREF(set);
 	Py_XDECREF(files);
 	Py_XDECREF(prefix_obj);
@@ -1231,6 +1800,7 @@ err_out:
 static void srd_decoder_load_all_path(char *path)
 {
 	GDir *dir;
+	GKeyFile *index;
 	const gchar *direntry;
 
 	if (!(dir = g_dir_open(path, 0, NULL))) {
@@ -1239,21 +1809,42 @@ static void srd_decoder_load_all_path(char *path)
 		return;
 	}
 
+	/*
+	 * Decoders listed in the index only get imported once they are
+	 * needed. Others are imported right away.
+	 */
+	index = index_open(path);
+
 	/*
 	 * This ignores errors returned by srd_decoder_load(). That
 	 * function will have logged the cause, but in any case we
 	 * want to continue anyway.
 	 */
 	while ((direntry = g_dir_read_name(dir)) != NULL) {
+		if (!strcmp(direntry, INDEX_FILE))
+			continue;
+		if (index && index_ignores(index, direntry))
+			continue;
 		/* The directory name is the module name (e.g. "i2c"). */
+		if (index && g_key_file_has_group(index, direntry)
+				&& decoder_load_indexed(index, direntry))
+			continue;
 		srd_decoder_load(direntry);
 	}
 	g_dir_close(dir);
+
+	if (index)
+		g_key_file_free(index);
 }
 
 /**
  * Load all installed protocol decoders.
  *
+ * If a decoders directory contains an index written by install-decoders,
+ * the decoders listed there are loaded from it, and their Python modules
+ * only get imported once they are instantiated. Remove the index to have
+ * all decoders imported here (e.g. while working on decoders).
+ *
  * @return SRD_OK upon success, a (negative) error code otherwise.
  *
  * @since 0.1.0
@@ -1261,13 +1852,24 @@ static void srd_decoder_load_all_path(char *path)
 SRD_API int srd_decoder_load_all(void)
 {
 	GSList *l;
+	int64_t start, elapsed, loading;
 
 	if (!srd_check_init())
 		return SRD_ERR;
 
+	start = g_get_monotonic_time();
+	loading = startup_times.import + startup_times.metadata;
+
 	for (l = searchpaths; l; l = l->next)
 		srd_decoder_load_all_path(l->data);
 
+	/* What the decoders' own loading didn't take went into scanning. */
+	elapsed = g_get_monotonic_time() - start;
+	loading = startup_times.import + startup_times.metadata - loading;
+	startup_times.scan += elapsed - loading;
+	srd_dbg("Loaded all decoders in %" PRId64 " us, %" PRId64
+		" us of which scanning.", elapsed, elapsed - loading);
+
 	return SRD_OK;
 }
 
@@ -307,7 +307,8 @@ def get_data_bits(self, rxtx, signal):
         if self.startsample[rxtx] == -1:
             self.startsample[rxtx] = self.samplenum
 
-        self.putg([Ann.RX_DATA_BIT + rxtx, ['%d' % signal]])
+        if self.ann_enabled(Ann.RX_DATA_BIT + rxtx):
+            self.putg([Ann.RX_DATA_BIT + rxtx, ['%d' % signal]])
 
         # Store individual data bits and their start/end samplenumbers.
         s, halfbit = self.samplenum, int(self.bit_width / 2)
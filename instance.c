@@ -25,6 +25,7 @@
 #include <inttypes.h>
 #include <stdlib.h>
 #include <stdint.h>
+#include <string.h>
 
 /** @cond PRIVATE */
 
@@ -213,6 +214,67 @@ static gint compare_channel_id(const struct srd_channel *pdch,
 	return strcmp(pdch->id, channel_id);
 }
 
+/* Set up the gather stage's channel map and lookup table. */
+static void gather_channelmap_update(struct srd_decoder_inst *di)
+{
+	int i, j, k, ch, num_mapped, value;
+
+	g_free(di->gather_channelmap);
+	di->gather_channelmap = NULL;
+	g_free(di->gather_lut);
+	di->gather_lut = NULL;
+	di->gather_num_bytes = 0;
+
+	if (!di->gather_enabled)
+		return;
+
+	num_mapped = 0;
+	for (i = 0; i < di->dec_num_channels; i++) {
+		if (di->dec_channelmap[i] != -1)
+			num_mapped++;
+	}
+	if (num_mapped == 0 || num_mapped > 8) {
+		srd_dbg("%s: Not gathering %d channels.", di->inst_id,
+			num_mapped);
+		return;
+	}
+
+	/* Assign gathered bits, and collect the input bytes to look at. */
+	di->gather_channelmap = g_malloc(sizeof(int) * di->dec_num_channels);
+	num_mapped = 0;
+	for (i = 0; i < di->dec_num_channels; i++) {
+		ch = di->dec_channelmap[i];
+		di->gather_channelmap[i] = -1;
+		if (ch == -1)
+			continue;
+		di->gather_channelmap[i] = num_mapped++;
+		for (j = 0; j < di->gather_num_bytes; j++) {
+			if (di->gather_offsets[j] == ch / 8)
+				break;
+		}
+		if (j == di->gather_num_bytes)
+			di->gather_offsets[di->gather_num_bytes++] = ch / 8;
+	}
+
+	/* Per input byte, map each possible value to the gathered bits. */
+	di->gather_lut = g_malloc0(di->gather_num_bytes * 256);
+	for (i = 0; i < di->dec_num_channels; i++) {
+		ch = di->dec_channelmap[i];
+		if (ch == -1)
+			continue;
+		for (j = 0; j < di->gather_num_bytes; j++) {
+			if (di->gather_offsets[j] == ch / 8)
+				break;
+		}
+		for (value = 0; value < 256; value++) {
+			if (!(value & (1 << (ch % 8))))
+				continue;
+			k = j * 256 + value;
+			di->gather_lut[k] |= 1 << di->gather_channelmap[i];
+		}
+	}
+}
+
 /**
  * Set all channels in a decoder instance.
  *
@@ -315,10 +377,137 @@ SRD_API int srd_inst_channel_set_all(struct srd_decoder_inst *di,
 
 	g_free(di->dec_channelmap);
 	di->dec_channelmap = new_channelmap;
+	gather_channelmap_update(di);
+
+	return SRD_OK;
+}
+
+/**
+ * Enable or disable the gather stage of a decoder instance.
+ *
+ * With the gather stage enabled, the instance copies the input channels
+ * it uses into a private buffer of one byte per sample, once per chunk.
+ * The instance's condition matching then works on this compact buffer
+ * instead of striding over the frontend's (possibly wide) samples. This
+ * helps when many instances each use few channels of a wide capture.
+ *
+ * Gathering only takes effect for instances with one to eight mapped
+ * channels, others keep reading the frontend's buffer. The setting must
+ * be changed before the first chunk of samples gets sent.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param enable TRUE to enable the gather stage, FALSE to disable it.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_inst_channel_gather_set(struct srd_decoder_inst *di,
+		gboolean enable)
+{
+	if (!di) {
+		srd_err("Invalid decoder instance.");
+		return SRD_ERR_ARG;
+	}
+
+	if (di->thread_handle) {
+		srd_err("Cannot change the gather stage of instance %s "
+			"while decoding.", di->inst_id);
+		return SRD_ERR;
+	}
+
+	di->gather_enabled = enable;
+	gather_channelmap_update(di);
+
+	return SRD_OK;
+}
+
+/**
+ * Enable or disable an annotation class of a decoder instance.
+ *
+ * All annotation classes are enabled by default. Annotations of disabled
+ * classes are dropped by the instance's put() before they get converted
+ * or passed to any callback. Decoders can check with
+ * self.ann_enabled(cls) whether a class is enabled, to skip building
+ * annotations which nobody receives. To only receive some annotation
+ * rows, disable the classes of the other rows (see the decoder's
+ * annotation_rows).
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param ann_class The annotation class, an index into the decoder's
+ *                  annotations.
+ * @param enable TRUE to enable the annotation class, FALSE to disable it.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_inst_ann_class_enable(struct srd_decoder_inst *di,
+		int ann_class, gboolean enable)
+{
+	int num_classes;
+
+	if (!di) {
+		srd_err("Invalid decoder instance.");
+		return SRD_ERR_ARG;
+	}
+
+	num_classes = g_slist_length(di->decoder->annotations);
+	if (ann_class < 0 || ann_class >= num_classes) {
+		srd_err("Invalid annotation class %d for instance %s.",
+			ann_class, di->inst_id);
+		return SRD_ERR_ARG;
+	}
+
+	if (!di->ann_classes_enabled) {
+		if (enable)
+			return SRD_OK;
+		di->ann_classes_enabled = g_malloc(num_classes);
+		memset(di->ann_classes_enabled, 1, num_classes);
+		di->num_ann_classes = num_classes;
+	}
+	di->ann_classes_enabled[ann_class] = enable ? 1 : 0;
+
+	return SRD_OK;
+}
+
+/**
+ * Get the profiling counters of a decoder instance.
+ *
+ * The counters accumulate from the creation of the instance, across
+ * srd_session_terminate_reset(). They tell whether decoding time goes
+ * into matching wait() conditions, into the decoder's Python code,
+ * into output callbacks (see put_time), or into stacked decoders.
+ * With the log level set to SRD_LOG_DBG, the counters of all instances
+ * are also logged by srd_session_destroy().
+ *
+ * The counters are updated by the instance's decoding thread without
+ * locking. Call this while no data is being sent, for consistent values.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param stats Where to store the counters. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_inst_stats_get(const struct srd_decoder_inst *di,
+		struct srd_inst_stats *stats)
+{
+	if (!di || !stats)
+		return SRD_ERR_ARG;
+
+	*stats = di->stats;
 
 	return SRD_OK;
 }
 
+/** @private */
+SRD_PRIV const int *srd_inst_input_channelmap(const struct srd_decoder_inst *di)
+{
+	return di->gather_channelmap ? di->gather_channelmap : di->dec_channelmap;
+}
+
 /**
  * Create a new protocol decoder instance.
  *
@@ -352,6 +541,10 @@ SRD_API struct srd_decoder_inst *srd_inst_new(struct srd_session *sess,
 		return NULL;
 	}
 
+	/* Decoders loaded from an index get imported on first use. */
+	if (srd_decoder_import(dec) != SRD_OK)
+		return NULL;
+
 	di = g_malloc0(sizeof(struct srd_decoder_inst));
 
 	di->decoder = dec;
@@ -415,13 +608,24 @@ SRD_API struct srd_decoder_inst *srd_inst_new(struct srd_session *sess,
 		return NULL;
 	}
 
+	/* Let the Python object find its instance without a search. */
+	((srd_Decoder *)di->py_inst)->di = di;
+
 	di->condition_list = NULL;
 	di->match_array = NULL;
 	di->abs_start_samplenum = 0;
 	di->abs_end_samplenum = 0;
 	di->inbuf = NULL;
 	di->inbuflen = 0;
+	di->inbuf_samplenums = NULL;
+	di->inbuf_num_transitions = 0;
+	di->inbuf_transition_idx = 0;
 	di->abs_cur_samplenum = 0;
+	di->chunk_queue = NULL;
+	di->chunk_queue_depth = 0;
+	di->chunk_queue_head = 0;
+	di->chunk_queue_len = 0;
+	di->chunk_queue_end_samplenum = 0;
 	di->thread_handle = NULL;
 	di->got_new_samples = FALSE;
 	di->handled_all_samples = FALSE;
@@ -495,12 +699,19 @@ static void srd_inst_reset_state(struct srd_decoder_inst *di)
 	di->abs_end_samplenum = 0;
 	di->inbuf = NULL;
 	di->inbuflen = 0;
+	di->inbuf_samplenums = NULL;
+	di->inbuf_num_transitions = 0;
+	di->inbuf_transition_idx = 0;
 	di->abs_cur_samplenum = 0;
 	oldpins_array_free(di);
+	di->chunk_queue_head = 0;
+	di->chunk_queue_len = 0;
+	di->chunk_queue_end_samplenum = 0;
 	di->got_new_samples = FALSE;
 	di->handled_all_samples = FALSE;
 	di->want_wait_terminate = FALSE;
 	di->decoder_state = SRD_OK;
+	di->wait_return_time = 0;
 	/* Conditions and mutex got reset after joining the thread. */
 }
 
@@ -706,6 +917,20 @@ SRD_PRIV int srd_inst_start(struct srd_decoder_inst *di)
 	/* Set self.matched to None. */
 	PyObject_SetAttrString(di->py_inst, "matched", Py_None);
 
+	/*
+	 * Look up the methods which get called for every item or chunk
+	 * once. Stacked PDs can receive their input in batches.
+	 */
+	Py_CLEAR(di->py_decode);
+	Py_CLEAR(di->py_flush);
+	Py_CLEAR(di->py_decode_batch);
+	if (PyObject_HasAttrString(di->py_inst, "decode"))
+		di->py_decode = PyObject_GetAttrString(di->py_inst, "decode");
+	if (PyObject_HasAttrString(di->py_inst, "flush"))
+		di->py_flush = PyObject_GetAttrString(di->py_inst, "flush");
+	if (PyObject_HasAttrString(di->py_inst, "decode_batch"))
+		di->py_decode_batch = PyObject_GetAttrString(di->py_inst, "decode_batch");
+
 	PyGILState_Release(gstate);
 
 	/* Start all the PDs stacked on top of this one. */
@@ -803,6 +1028,213 @@ SRD_PRIV void condition_list_free(struct srd_decoder_inst *di)
 
 	g_slist_free(di->condition_list);
 	di->condition_list = NULL;
+
+	if (di->cond_masks)
+		g_array_free(di->cond_masks, TRUE);
+	di->cond_masks = NULL;
+	di->cond_masks_bytes = 0;
+}
+
+/**
+ * Add one term to the compiled form of a condition.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param cm The compiled condition to update. Must not be NULL.
+ * @param term The term to add. Must not be NULL.
+ * @param max_bit Pointer to the highest sample bit used so far.
+ *
+ * @retval TRUE The term was added (or made the condition never match).
+ * @retval FALSE The term cannot be expressed as bitmasks.
+ */
+static gboolean cond_mask_add_term(const struct srd_decoder_inst *di,
+		struct srd_cond_mask *cm, struct srd_term *term, int *max_bit)
+{
+	uint64_t bit, level;
+	const int *map;
+	int ch;
+
+	map = srd_inst_input_channelmap(di);
+
+	if (term->type == SRD_TERM_ALWAYS_FALSE) {
+		cm->never = TRUE;
+		return TRUE;
+	}
+
+	/* Skip terms are only handled when they are the sole term. */
+	if (term->type == SRD_TERM_SKIP)
+		return FALSE;
+
+	ch = map[term->channel];
+	if (ch == -1) {
+		/*
+		 * Unused optional channels read as low, and their "old"
+		 * pin value never changes. The term's result is constant.
+		 */
+		if (!sample_matches(di->old_pins_array->data[term->channel], 0, term))
+			cm->never = TRUE;
+		return TRUE;
+	}
+	if (ch >= 64)
+		return FALSE;
+	*max_bit = MAX(*max_bit, ch);
+	bit = (uint64_t)1 << ch;
+
+	switch (term->type) {
+	case SRD_TERM_HIGH:
+	case SRD_TERM_RISING_EDGE:
+		level = bit;
+		break;
+	case SRD_TERM_LOW:
+	case SRD_TERM_FALLING_EDGE:
+		level = 0;
+		break;
+	case SRD_TERM_EITHER_EDGE:
+		cm->change_mask |= bit;
+		return TRUE;
+	case SRD_TERM_NO_EDGE:
+		cm->stable_mask |= bit;
+		return TRUE;
+	default:
+		return FALSE;
+	}
+
+	/* Contradicting levels for the same sample bit never match. */
+	if ((cm->level_mask & bit) && (cm->level_value & bit) != level)
+		cm->never = TRUE;
+	cm->level_mask |= bit;
+	cm->level_value |= level;
+	if (term->type == SRD_TERM_RISING_EDGE || term->type == SRD_TERM_FALLING_EDGE)
+		cm->change_mask |= bit;
+
+	return TRUE;
+}
+
+/**
+ * Compile the condition list into per-condition bitmasks.
+ *
+ * Each condition gets translated into masks over the packed sample word,
+ * such that find_match() can check a sample with a few AND/XOR operations
+ * instead of walking the list of terms. When the conditions cannot be
+ * expressed that way (input channels beyond the 64th bit, skip terms mixed
+ * with channel terms, several decoder channels mapped to the same input
+ * channel), di->cond_masks is left NULL and the terms get evaluated one
+ * by one.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void condition_list_compile(struct srd_decoder_inst *di)
+{
+	GSList *l, *t;
+	struct srd_cond_mask *cm;
+	struct srd_term *term;
+	GArray *masks;
+	const int *map;
+	uint64_t mapped;
+	int i, ch, max_bit;
+
+	if (di->cond_masks)
+		g_array_free(di->cond_masks, TRUE);
+	di->cond_masks = NULL;
+	di->cond_masks_bytes = 0;
+
+	if (!di->condition_list)
+		return;
+
+	/*
+	 * Decoder channels which share an input channel can have different
+	 * "old" pin values (initial pins), which the masks cannot express.
+	 */
+	map = srd_inst_input_channelmap(di);
+	mapped = 0;
+	for (i = 0; i < di->dec_num_channels; i++) {
+		ch = map[i];
+		if (ch < 0 || ch >= 64)
+			continue;
+		if (mapped & ((uint64_t)1 << ch))
+			return;
+		mapped |= (uint64_t)1 << ch;
+	}
+
+	oldpins_array_seed(di);
+	masks = g_array_sized_new(FALSE, TRUE, sizeof(struct srd_cond_mask),
+		g_slist_length(di->condition_list));
+	max_bit = -1;
+	for (l = di->condition_list; l; l = l->next) {
+		g_array_set_size(masks, masks->len + 1);
+		cm = &g_array_index(masks, struct srd_cond_mask, masks->len - 1);
+		t = l->data;
+		if (!t) {
+			/* Empty conditions never match. */
+			cm->never = TRUE;
+			continue;
+		}
+		term = t->data;
+		if (!t->next && term->type == SRD_TERM_SKIP) {
+			cm->skip = term;
+			continue;
+		}
+		for (; t; t = t->next) {
+			if (!cond_mask_add_term(di, cm, t->data, &max_bit)) {
+				g_array_free(masks, TRUE);
+				return;
+			}
+		}
+	}
+
+	di->cond_masks = masks;
+	di->cond_masks_bytes = (max_bit + 8) / 8;
+}
+
+/**
+ * Get the position of a sample's value in the current chunk.
+ *
+ * Chunks either hold a value for every sample, or a list of transitions
+ * (see srd_session_send_transitions()). For the latter, the transition
+ * which covers the sample gets looked up. Consecutive lookups typically
+ * refer to the same or the next transition, which is checked first
+ * before resorting to a binary search.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param samplenum The absolute sample number, must be within the chunk.
+ *
+ * @return Pointer to the sample's value (of 'data_unitsize' bytes).
+ *
+ * @private
+ */
+SRD_PRIV const uint8_t *srd_inst_sample_pos(struct srd_decoder_inst *di,
+		uint64_t samplenum)
+{
+	const uint64_t *samplenums;
+	uint64_t lo, hi, mid, num;
+
+	if (!di->inbuf_samplenums)
+		return di->inbuf + ((samplenum - di->abs_start_samplenum) * di->data_unitsize);
+
+	samplenums = di->inbuf_samplenums;
+	num = di->inbuf_num_transitions;
+
+	/* Find lo such that samplenums[lo] <= samplenum < samplenums[lo + 1]. */
+	lo = 0;
+	hi = num;
+	if (di->inbuf_transition_idx < num && samplenums[di->inbuf_transition_idx] <= samplenum) {
+		lo = di->inbuf_transition_idx;
+		if (lo + 1 < num && samplenums[lo + 1] <= samplenum)
+			lo++;
+		if (lo + 1 >= num || samplenum < samplenums[lo + 1])
+			hi = lo + 1;
+	}
+	while (hi - lo > 1) {
+		mid = lo + (hi - lo) / 2;
+		if (samplenums[mid] <= samplenum)
+			lo = mid;
+		else
+			hi = mid;
+	}
+	di->inbuf_transition_idx = lo;
+
+	return di->inbuf + (lo * di->data_unitsize);
 }
 
 static gboolean have_non_null_conds(const struct srd_decoder_inst *di)
@@ -825,17 +1257,19 @@ static void update_old_pins_array(struct srd_decoder_inst *di,
 		const uint8_t *sample_pos)
 {
 	uint8_t sample;
+	const int *map;
 	int i, byte_offset, bit_offset;
 
 	if (!di || !di->dec_channelmap || !sample_pos)
 		return;
 
+	map = srd_inst_input_channelmap(di);
 	oldpins_array_seed(di);
 	for (i = 0; i < di->dec_num_channels; i++) {
-		if (di->dec_channelmap[i] == -1)
+		if (map[i] == -1)
 			continue; /* Ignore unused optional channels. */
-		byte_offset = di->dec_channelmap[i] / 8;
-		bit_offset = di->dec_channelmap[i] % 8;
+		byte_offset = map[i] / 8;
+		bit_offset = map[i] % 8;
 		sample = *(sample_pos + byte_offset) & (1 << bit_offset) ? 1 : 0;
 		di->old_pins_array->data[i] = sample;
 	}
@@ -844,22 +1278,24 @@ static void update_old_pins_array(struct srd_decoder_inst *di,
 static void update_old_pins_array_initial_pins(struct srd_decoder_inst *di)
 {
 	uint8_t sample;
+	const int *map;
 	int i, byte_offset, bit_offset;
 	const uint8_t *sample_pos;
 
 	if (!di || !di->dec_channelmap)
 		return;
 
-	sample_pos = di->inbuf + ((di->abs_cur_samplenum - di->abs_start_samplenum) * di->data_unitsize);
+	sample_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum);
 
+	map = srd_inst_input_channelmap(di);
 	oldpins_array_seed(di);
 	for (i = 0; i < di->dec_num_channels; i++) {
 		if (di->old_pins_array->data[i] != SRD_INITIAL_PIN_SAME_AS_SAMPLE0)
 			continue;
-		if (di->dec_channelmap[i] == -1)
+		if (map[i] == -1)
 			continue; /* Ignore unused optional channels. */
-		byte_offset = di->dec_channelmap[i] / 8;
-		bit_offset = di->dec_channelmap[i] % 8;
+		byte_offset = map[i] / 8;
+		bit_offset = map[i] % 8;
 		sample = *(sample_pos + byte_offset) & (1 << bit_offset) ? 1 : 0;
 		di->old_pins_array->data[i] = sample;
 	}
@@ -870,15 +1306,17 @@ static gboolean term_matches(const struct srd_decoder_inst *di,
 {
 	uint8_t old_sample, sample;
 	int byte_offset, bit_offset, ch;
+	const int *map;
 
 	/* Caller ensures di, di->dec_channelmap, term, sample_pos != NULL. */
 
 	if (term->type == SRD_TERM_SKIP)
 		return sample_matches(0, 0, term);
 
+	map = srd_inst_input_channelmap(di);
 	ch = term->channel;
-	byte_offset = di->dec_channelmap[ch] / 8;
-	bit_offset = di->dec_channelmap[ch] % 8;
+	byte_offset = map[ch] / 8;
+	bit_offset = map[ch] % 8;
 	sample = *(sample_pos + byte_offset) & (1 << bit_offset) ? 1 : 0;
 	old_sample = di->old_pins_array->data[ch];
 
@@ -919,6 +1357,346 @@ static gboolean at_least_one_condition_matched(
 	return FALSE;
 }
 
+/**
+ * Get the packed value of a sample as a word.
+ *
+ * Sample bit N (input channel N) ends up in bit N of the word.
+ *
+ * @param sample_pos Pointer to the sample. Must not be NULL.
+ * @param num_bytes The number of sample bytes to consider (1-8).
+ *
+ * @return The sample's value.
+ */
+__attribute__((always_inline))
+static inline uint64_t sample_word(const uint8_t *sample_pos,
+		unsigned int num_bytes)
+{
+	uint64_t word;
+	unsigned int i;
+
+	switch (num_bytes) {
+	case 1:
+		return sample_pos[0];
+	case 2:
+		return sample_pos[0] | ((uint64_t)sample_pos[1] << 8);
+	default:
+		word = 0;
+		for (i = 0; i < num_bytes; i++)
+			word |= (uint64_t)sample_pos[i] << (8 * i);
+		return word;
+	}
+}
+
+/* Get the "old" pin values as a word in sample bit order. */
+static uint64_t old_pins_array_to_word(const struct srd_decoder_inst *di)
+{
+	uint64_t word;
+	const int *map;
+	int i, ch;
+
+	map = srd_inst_input_channelmap(di);
+	word = 0;
+	for (i = 0; i < di->dec_num_channels; i++) {
+		ch = map[i];
+		if (ch == -1 || ch >= 64)
+			continue;
+		if (di->old_pins_array->data[i] == 1)
+			word |= (uint64_t)1 << ch;
+	}
+
+	return word;
+}
+
+/* Check whether a compiled condition matches the given sample values. */
+__attribute__((always_inline))
+static inline gboolean cond_mask_matches(const struct srd_cond_mask *cm,
+		uint64_t old_word, uint64_t cur_word)
+{
+	uint64_t changed;
+
+	if (cm->never)
+		return FALSE;
+	if ((cur_word ^ cm->level_value) & cm->level_mask)
+		return FALSE;
+	changed = old_word ^ cur_word;
+	if ((changed & cm->change_mask) != cm->change_mask)
+		return FALSE;
+	if (changed & cm->stable_mask)
+		return FALSE;
+
+	return TRUE;
+}
+
+/**
+ * Find the next sample which differs from a reference value.
+ *
+ * Only the sample bits in 'mask' are compared. Sample widths which evenly
+ * divide a 64bit word get compared eight bytes at a time.
+ *
+ * @param sample_pos Pointer to the first sample to check. Must not be NULL.
+ * @param num_samples The number of samples to check.
+ * @param unitsize The number of bytes per sample.
+ * @param ref_word The reference value, in sample word format.
+ * @param mask The sample bits to compare, in sample word format.
+ *
+ * @return The index of the first differing sample, or num_samples if
+ *         all samples are equal to the reference value.
+ */
+static uint64_t find_next_change(const uint8_t *sample_pos,
+		uint64_t num_samples, unsigned int unitsize,
+		uint64_t ref_word, uint64_t mask)
+{
+	uint64_t i, num_words, word, rep_ref, rep_mask, rep;
+	unsigned int num_bytes;
+
+	num_bytes = MIN(unitsize, 8);
+	i = 0;
+
+	if (!mask)
+		return num_samples;
+
+	/* Factor which replicates a sample across a whole word. */
+	switch (unitsize) {
+	case 1:
+		rep = UINT64_C(0x0101010101010101);
+		break;
+	case 2:
+		rep = UINT64_C(0x0001000100010001);
+		break;
+	case 4:
+		rep = UINT64_C(0x0000000100000001);
+		break;
+	case 8:
+		rep = 1;
+		break;
+	default:
+		rep = 0;
+		break;
+	}
+
+	if (rep) {
+		rep_ref = (ref_word & mask) * rep;
+		rep_mask = mask * rep;
+		num_words = num_samples * unitsize / 8;
+		for (; i < num_words; i++) {
+			memcpy(&word, sample_pos + i * 8, sizeof(word));
+			if ((GUINT64_FROM_LE(word) ^ rep_ref) & rep_mask)
+				break;
+		}
+		/* Locate the differing sample within that word. */
+		i = i * 8 / unitsize;
+	}
+
+	for (; i < num_samples; i++) {
+		word = sample_word(sample_pos + i * unitsize, num_bytes);
+		if ((word ^ ref_word) & mask)
+			break;
+	}
+
+	return i;
+}
+
+/**
+ * Find the next sample which differs from a reference value, for chunks
+ * which were sent as a list of transitions.
+ *
+ * Values can only change at transitions, so only these get checked.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param samplenum The absolute sample number to start the search at.
+ * @param num_samples The number of samples to check.
+ * @param ref_word The reference value, in sample word format.
+ * @param mask The sample bits to compare, in sample word format.
+ *
+ * @return The number of samples from 'samplenum' to the first differing
+ *         sample, or num_samples if all samples are equal to the
+ *         reference value.
+ */
+static uint64_t find_next_change_transitions(struct srd_decoder_inst *di,
+		uint64_t samplenum, uint64_t num_samples,
+		uint64_t ref_word, uint64_t mask)
+{
+	uint64_t idx, word, end;
+	unsigned int num_bytes;
+
+	if (!mask || !num_samples)
+		return num_samples;
+
+	num_bytes = MIN(di->data_unitsize, 8);
+	word = sample_word(srd_inst_sample_pos(di, samplenum), num_bytes);
+	if ((word ^ ref_word) & mask)
+		return 0;
+
+	end = samplenum + num_samples;
+	for (idx = di->inbuf_transition_idx + 1; idx < di->inbuf_num_transitions; idx++) {
+		if (di->inbuf_samplenums[idx] >= end)
+			break;
+		word = sample_word(di->inbuf + (idx * di->data_unitsize), num_bytes);
+		if ((word ^ ref_word) & mask)
+			return di->inbuf_samplenums[idx] - samplenum;
+	}
+
+	return num_samples;
+}
+
+/* Check whether at least one compiled condition matches the given samples. */
+static gboolean cond_masks_match_any(const struct srd_decoder_inst *di,
+		unsigned int num_conditions, uint64_t old_word, uint64_t cur_word)
+{
+	const struct srd_cond_mask *cm;
+	unsigned int j;
+
+	for (j = 0; j < num_conditions; j++) {
+		cm = &g_array_index(di->cond_masks, struct srd_cond_mask, j);
+		if (cm->skip)
+			continue;
+		if (cond_mask_matches(cm, old_word, cur_word))
+			return TRUE;
+	}
+
+	return FALSE;
+}
+
+/*
+ * Get the number of samples until the first skip-only condition matches,
+ * counting from the current sample. Returns UINT64_MAX without such
+ * conditions.
+ */
+static uint64_t cond_masks_skip_remaining(const struct srd_decoder_inst *di,
+		unsigned int num_conditions)
+{
+	const struct srd_cond_mask *cm;
+	uint64_t remaining;
+	unsigned int j;
+
+	remaining = UINT64_MAX;
+	for (j = 0; j < num_conditions; j++) {
+		cm = &g_array_index(di->cond_masks, struct srd_cond_mask, j);
+		if (!cm->skip || cm->never)
+			continue;
+		remaining = MIN(remaining, cm->skip->num_samples_to_skip -
+			cm->skip->num_samples_already_skipped);
+	}
+
+	return remaining;
+}
+
+/* Account for samples which were passed over without evaluation. */
+static void cond_masks_skip_advance(const struct srd_decoder_inst *di,
+		unsigned int num_conditions, uint64_t num_samples)
+{
+	const struct srd_cond_mask *cm;
+	unsigned int j;
+
+	for (j = 0; j < num_conditions; j++) {
+		cm = &g_array_index(di->cond_masks, struct srd_cond_mask, j);
+		if (cm->skip)
+			cm->skip->num_samples_already_skipped += num_samples;
+	}
+}
+
+/**
+ * Find a match using the compiled (bitmask) form of the conditions.
+ *
+ * Behaves exactly like the term based loop in find_match(), but checks
+ * each condition with a handful of word operations.
+ *
+ * The result of the conditions only depends on the channels they watch.
+ * While these channels keep their value, all samples yield the same
+ * result. So when a sample doesn't match and the next sample holds the
+ * same values, the unchanged ("steady") state is checked once and if
+ * it doesn't match either, the scan jumps to the next sample where one
+ * of the watched channels changes.
+ *
+ * Skip-only conditions are not evaluated for every sample either. Their
+ * remaining sample count bounds the jump, and gets reduced by the number
+ * of samples jumped over. The counts persist across chunks.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param num_conditions The number of conditions.
+ *
+ * @return TRUE if at least one condition matched, FALSE otherwise.
+ */
+static gboolean find_match_masks(struct srd_decoder_inst *di,
+		unsigned int num_conditions)
+{
+	uint64_t old_word, cur_word, watch_mask, num_unchanged, num_samples;
+	const struct srd_cond_mask *cm;
+	const uint8_t *sample_pos, *next_pos;
+	unsigned int j, num_bytes, unitsize;
+	gboolean match, matched;
+
+	/* Caller ensures di, di->cond_masks, di->match_array != NULL. */
+
+	unitsize = di->data_unitsize;
+	num_bytes = MIN(unitsize, 8);
+	old_word = old_pins_array_to_word(di);
+	sample_pos = NULL;
+
+	watch_mask = 0;
+	for (j = 0; j < num_conditions; j++) {
+		cm = &g_array_index(di->cond_masks, struct srd_cond_mask, j);
+		if (cm->never)
+			continue;
+		watch_mask |= cm->level_mask | cm->change_mask | cm->stable_mask;
+	}
+
+	while (di->abs_cur_samplenum < di->abs_end_samplenum) {
+		sample_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum);
+		cur_word = sample_word(sample_pos, num_bytes);
+
+		/* All conditions are checked, even if there was a match already. */
+		matched = FALSE;
+		for (j = 0; j < num_conditions; j++) {
+			cm = &g_array_index(di->cond_masks, struct srd_cond_mask, j);
+			match = cond_mask_matches(cm, old_word, cur_word);
+			if (match && cm->skip)
+				match = sample_matches(0, 0, cm->skip);
+			di->match_array->data[j] = match;
+			matched |= match;
+		}
+
+		old_word = cur_word;
+
+		if (matched) {
+			update_old_pins_array(di, sample_pos);
+			return TRUE;
+		}
+
+		(di->abs_cur_samplenum)++;
+		if (di->abs_cur_samplenum >= di->abs_end_samplenum)
+			continue;
+
+		/* Only worth it when the next sample is unchanged, too. */
+		next_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum);
+		if ((sample_word(next_pos, num_bytes) ^ cur_word) & watch_mask)
+			continue;
+		if (cond_masks_match_any(di, num_conditions, cur_word, cur_word))
+			continue;
+
+		/* Don't jump beyond the sample where a skip condition matches. */
+		num_samples = di->abs_end_samplenum - di->abs_cur_samplenum;
+		num_samples = MIN(num_samples,
+			cond_masks_skip_remaining(di, num_conditions));
+		if (di->inbuf_samplenums)
+			num_unchanged = find_next_change_transitions(di,
+				di->abs_cur_samplenum, num_samples,
+				cur_word, watch_mask);
+		else
+			num_unchanged = find_next_change(next_pos,
+				num_samples, unitsize, cur_word, watch_mask);
+		cond_masks_skip_advance(di, num_conditions, num_unchanged);
+		di->abs_cur_samplenum += num_unchanged;
+		sample_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum - 1);
+		old_word = sample_word(sample_pos, num_bytes);
+	}
+
+	if (sample_pos)
+		update_old_pins_array(di, sample_pos);
+
+	return FALSE;
+}
+
 static gboolean find_match(struct srd_decoder_inst *di)
 {
 	uint64_t i, j, num_samples_to_process;
@@ -943,17 +1721,26 @@ static gboolean find_match(struct srd_decoder_inst *di)
 	num_samples_to_process = di->abs_end_samplenum - di->abs_cur_samplenum;
 	num_conditions = g_slist_length(di->condition_list);
 
-	/* di->match_array is NULL here. Create a new GArray. */
-	di->match_array = g_array_sized_new(FALSE, TRUE, sizeof(gboolean), num_conditions);
+	/*
+	 * Re-use the array from a previous chunk (same conditions, no
+	 * match yet), or create a new GArray.
+	 */
+	if (!di->match_array)
+		di->match_array = g_array_sized_new(FALSE, TRUE, sizeof(gboolean), num_conditions);
 	g_array_set_size(di->match_array, num_conditions);
+	memset(di->match_array->data, 0, num_conditions * sizeof(gboolean));
 
 	/* Sample 0: Set di->old_pins_array for SRD_INITIAL_PIN_SAME_AS_SAMPLE0 pins. */
 	if (di->abs_cur_samplenum == 0)
 		update_old_pins_array_initial_pins(di);
 
+	/* Use the compiled conditions when they cover the sample width. */
+	if (di->cond_masks && di->cond_masks_bytes <= MIN(di->data_unitsize, 8))
+		return find_match_masks(di, num_conditions);
+
 	for (i = 0; i < num_samples_to_process; i++, (di->abs_cur_samplenum)++) {
 
-		sample_pos = di->inbuf + ((di->abs_cur_samplenum - di->abs_start_samplenum) * di->data_unitsize);
+		sample_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum);
 
 		/* Check whether the current sample matches at least one of the conditions (logical OR). */
 		/* IMPORTANT: We need to check all conditions, even if there was a match already! */
@@ -994,6 +1781,9 @@ static gboolean find_match(struct srd_decoder_inst *di)
  */
 SRD_PRIV int process_samples_until_condition_match(struct srd_decoder_inst *di, gboolean *found_match)
 {
+	uint64_t start_samplenum;
+	int64_t start;
+
 	if (!di || !found_match)
 		return SRD_ERR_ARG;
 
@@ -1001,6 +1791,9 @@ SRD_PRIV int process_samples_until_condition_match(struct srd_decoder_inst *di,
 	if (di->want_wait_terminate)
 		return SRD_OK;
 
+	start = g_get_monotonic_time();
+	start_samplenum = di->abs_cur_samplenum;
+
 	/* Check if any of the current condition(s) match. */
 	while (TRUE) {
 		/* Feed the (next chunk of the) buffer to find_match(). */
@@ -1011,7 +1804,7 @@ SRD_PRIV int process_samples_until_condition_match(struct srd_decoder_inst *di,
 			srd_dbg("Done, handled all samples (abs cur %" PRIu64
 				" / abs end %" PRIu64 ").",
 				di->abs_cur_samplenum, di->abs_end_samplenum);
-			return SRD_OK;
+			break;
 		}
 
 		/* If we didn't find a match, continue looking. */
@@ -1019,9 +1812,14 @@ SRD_PRIV int process_samples_until_condition_match(struct srd_decoder_inst *di,
 			continue;
 
 		/* At least one condition matched, return. */
-		return SRD_OK;
+		break;
 	}
 
+	di->stats.samples_scanned += di->abs_cur_samplenum - start_samplenum;
+	if (*found_match)
+		di->stats.matches++;
+	di->stats.match_time += g_get_monotonic_time() - start;
+
 	return SRD_OK;
 }
 
@@ -1072,7 +1870,7 @@ static gpointer di_thread(gpointer data)
 	wanted_term = di->want_wait_terminate;
 	di->want_wait_terminate = TRUE;
 	di->handled_all_samples = TRUE;
-	g_cond_signal(&di->handled_all_samples_cond);
+	g_cond_broadcast(&di->handled_all_samples_cond);
 	g_mutex_unlock(&di->data_mutex);
 
 	/*
@@ -1119,6 +1917,269 @@ static gpointer di_thread(gpointer data)
 	return NULL;
 }
 
+/**
+ * Copy the instance's channels of a chunk into the chunk's gather buffer.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param chunk The chunk to gather. Must not be NULL.
+ * @param num_values The number of sample values in the chunk.
+ */
+static void gather_samples(const struct srd_decoder_inst *di,
+		struct srd_chunk *chunk, uint64_t num_values)
+{
+	const uint8_t *lut, *in;
+	uint8_t *out;
+	uint64_t i, unitsize;
+	int j, off0, off1;
+
+	if (chunk->gather_buflen < num_values) {
+		g_free(chunk->gather_buf);
+		chunk->gather_buf = g_malloc(num_values);
+		chunk->gather_buflen = num_values;
+	}
+
+	lut = di->gather_lut;
+	in = chunk->inbuf;
+	unitsize = chunk->unitsize;
+	out = chunk->gather_buf;
+	off0 = di->gather_offsets[0];
+	off1 = di->gather_offsets[1];
+
+	switch (di->gather_num_bytes) {
+	case 1:
+		for (i = 0; i < num_values; i++, in += unitsize)
+			out[i] = lut[in[off0]];
+		break;
+	case 2:
+		for (i = 0; i < num_values; i++, in += unitsize)
+			out[i] = lut[in[off0]] | lut[256 + in[off1]];
+		break;
+	default:
+		for (i = 0; i < num_values; i++, in += unitsize) {
+			out[i] = 0;
+			for (j = 0; j < di->gather_num_bytes; j++)
+				out[i] |= lut[j * 256 + in[di->gather_offsets[j]]];
+		}
+		break;
+	}
+
+	chunk->inbuf = chunk->gather_buf;
+	chunk->inbuflen = num_values;
+	chunk->unitsize = 1;
+}
+
+/* Free the instance's ring of chunks. The ring must be empty. */
+static void chunk_queue_free(struct srd_decoder_inst *di)
+{
+	unsigned int i;
+
+	for (i = 0; i < di->chunk_queue_depth; i++)
+		g_free(di->chunk_queue[i].gather_buf);
+	g_free(di->chunk_queue);
+	di->chunk_queue = NULL;
+	di->chunk_queue_depth = 0;
+	di->chunk_queue_head = 0;
+	di->chunk_queue_len = 0;
+}
+
+/**
+ * Make the oldest queued chunk the worker thread's current chunk.
+ *
+ * The caller must hold the instance's data_mutex.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ *
+ * @return TRUE if a chunk is available for processing, FALSE otherwise.
+ *
+ * @private
+ */
+SRD_PRIV gboolean srd_inst_chunk_next(struct srd_decoder_inst *di)
+{
+	const struct srd_chunk *chunk;
+
+	if (di->got_new_samples)
+		return TRUE;
+	if (!di->chunk_queue_len)
+		return FALSE;
+
+	chunk = &di->chunk_queue[di->chunk_queue_head];
+	di->abs_start_samplenum = chunk->abs_start_samplenum;
+	di->abs_end_samplenum = chunk->abs_end_samplenum;
+	di->inbuf = chunk->inbuf;
+	di->inbuflen = chunk->inbuflen;
+	di->inbuf_samplenums = chunk->samplenums;
+	di->inbuf_num_transitions = chunk->num_transitions;
+	di->inbuf_transition_idx = 0;
+	di->data_unitsize = chunk->unitsize;
+	di->got_new_samples = TRUE;
+	di->handled_all_samples = FALSE;
+
+	return TRUE;
+}
+
+/**
+ * Hand the worker thread's current chunk back to the application.
+ *
+ * Gets called when all samples of the chunk were processed. The caller
+ * must hold the instance's data_mutex.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void srd_inst_chunk_done(struct srd_decoder_inst *di)
+{
+	if (di->got_new_samples && di->chunk_queue_len) {
+		di->chunk_queue_head = (di->chunk_queue_head + 1) % di->chunk_queue_depth;
+		di->chunk_queue_len--;
+	}
+
+	di->got_new_samples = FALSE;
+	di->abs_start_samplenum = 0;
+	di->abs_end_samplenum = 0;
+	di->inbuf = NULL;
+	di->inbuflen = 0;
+	di->inbuf_samplenums = NULL;
+	di->inbuf_num_transitions = 0;
+	di->handled_all_samples = (di->chunk_queue_len == 0);
+
+	/* Wake up the application thread(s) waiting for a free slot. */
+	g_cond_broadcast(&di->handled_all_samples_cond);
+}
+
+/**
+ * Pass a chunk of samples to the decoder instance's worker thread.
+ *
+ * The chunk gets queued in the instance's ring of chunks, which holds up
+ * to the session's chunk queue depth of chunks. When the ring is full,
+ * this waits for the worker thread to finish the oldest chunk. With a
+ * depth of 1 (the default), this waits until all samples were handled,
+ * unless the session sends to its instances in parallel. Then the caller
+ * must call srd_inst_decode_wait().
+ *
+ * @param di The decoder instance to call. Must not be NULL.
+ * @param abs_start_samplenum The absolute starting sample number.
+ * @param abs_end_samplenum The absolute ending sample number.
+ * @param inbuf The sample values. Must not be NULL.
+ * @param inbuflen Length of the buffer.
+ * @param samplenums The sample numbers where the values in 'inbuf' start,
+ *                   or NULL when 'inbuf' holds a value for every sample.
+ * @param num_transitions The number of items in 'samplenums'.
+ * @param unitsize The number of bytes per sample.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ */
+static int srd_inst_decode_chunk(struct srd_decoder_inst *di,
+		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
+		const uint8_t *inbuf, uint64_t inbuflen,
+		const uint64_t *samplenums, uint64_t num_transitions,
+		uint64_t unitsize)
+{
+	struct srd_chunk *chunk;
+	unsigned int depth;
+	uint64_t num_values;
+
+	depth = MAX(di->sess->chunk_queue_depth, 1);
+
+	srd_dbg("Decoding: abs start sample %" PRIu64 ", abs end sample %"
+		PRIu64 " (%" PRIu64 " samples, %" PRIu64 " bytes, unitsize = "
+		"%" PRIu64 "), instance %s.", abs_start_samplenum, abs_end_samplenum,
+		abs_end_samplenum - abs_start_samplenum, inbuflen, unitsize,
+		di->inst_id);
+
+	/* (Re-)Allocate the ring while no chunks are in flight. */
+	if (di->chunk_queue_depth != depth && !di->chunk_queue_len) {
+		chunk_queue_free(di);
+		di->chunk_queue = g_malloc0(depth * sizeof(struct srd_chunk));
+		di->chunk_queue_depth = depth;
+	}
+
+	/* If this is the first call, start the worker thread. */
+	if (!di->thread_handle) {
+		srd_dbg("No worker thread for this decoder stack "
+			"exists yet, creating one: %s.", di->inst_id);
+		di->thread_handle = g_thread_new(di->inst_id,
+						 di_thread, di);
+	}
+
+	/* Wait for a free slot in the ring. */
+	g_mutex_lock(&di->data_mutex);
+	while (di->chunk_queue_len >= di->chunk_queue_depth && !di->want_wait_terminate)
+		g_cond_wait(&di->handled_all_samples_cond, &di->data_mutex);
+	if (di->want_wait_terminate) {
+		g_mutex_unlock(&di->data_mutex);
+		return SRD_ERR_TERM_REQ;
+	}
+	chunk = &di->chunk_queue[(di->chunk_queue_head + di->chunk_queue_len) %
+		di->chunk_queue_depth];
+	g_mutex_unlock(&di->data_mutex);
+
+	/* The free slot is only accessed by this thread. */
+	chunk->abs_start_samplenum = abs_start_samplenum;
+	chunk->abs_end_samplenum = abs_end_samplenum;
+	chunk->inbuf = inbuf;
+	chunk->inbuflen = inbuflen;
+	chunk->samplenums = samplenums;
+	chunk->num_transitions = num_transitions;
+	chunk->unitsize = unitsize;
+
+	/* Repack the instance's channels into the private buffer. */
+	if (di->gather_channelmap) {
+		num_values = samplenums ? num_transitions : inbuflen / unitsize;
+		gather_samples(di, chunk, num_values);
+	}
+
+	/* Push the new sample chunk to the worker thread. */
+	g_mutex_lock(&di->data_mutex);
+	di->chunk_queue_len++;
+	di->chunk_queue_end_samplenum = abs_end_samplenum;
+	di->handled_all_samples = FALSE;
+
+	/* Signal the thread that we have new data. */
+	g_cond_signal(&di->got_new_samples_cond);
+	g_mutex_unlock(&di->data_mutex);
+
+	/*
+	 * Without a ring, return when all samples in this chunk were
+	 * handled, unless the session waits for all instances at once.
+	 * With a ring, the worker thread flushes after each chunk.
+	 */
+	if (depth == 1 && !di->sess->parallel_send)
+		return srd_inst_decode_wait(di);
+
+	if (di->want_wait_terminate)
+		return SRD_ERR_TERM_REQ;
+
+	return SRD_OK;
+}
+
+/**
+ * Wait until the decoder instance has handled all samples it was sent.
+ *
+ * Afterwards all PDs in the stack that can be flushed get flushed.
+ *
+ * @param di The decoder instance to wait for. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @private
+ */
+SRD_PRIV int srd_inst_decode_wait(struct srd_decoder_inst *di)
+{
+	g_mutex_lock(&di->data_mutex);
+	while (!di->handled_all_samples && !di->want_wait_terminate)
+		g_cond_wait(&di->handled_all_samples_cond, &di->data_mutex);
+	g_mutex_unlock(&di->data_mutex);
+
+	/* Flush all PDs in the stack that can be flushed. */
+	srd_inst_flush(di);
+
+	if (di->want_wait_terminate)
+		return SRD_ERR_TERM_REQ;
+
+	return SRD_OK;
+}
+
 /**
  * Decode a chunk of samples.
  *
@@ -1191,56 +2252,88 @@ SRD_PRIV int srd_inst_decode(struct srd_decoder_inst *di,
 		return SRD_ERR_ARG;
 	}
 
-	if (abs_start_samplenum != di->abs_cur_samplenum ||
+	if (abs_start_samplenum != di->chunk_queue_end_samplenum ||
 	    abs_end_samplenum < abs_start_samplenum) {
 		srd_dbg("Incorrect sample numbers: start=%" PRIu64 ", cur=%"
 			PRIu64 ", end=%" PRIu64 ".", abs_start_samplenum,
-			di->abs_cur_samplenum, abs_end_samplenum);
+			di->chunk_queue_end_samplenum, abs_end_samplenum);
 		return SRD_ERR_ARG;
 	}
 
-	di->data_unitsize = unitsize;
+	return srd_inst_decode_chunk(di, abs_start_samplenum,
+		abs_end_samplenum, inbuf, inbuflen, NULL, 0, unitsize);
+}
 
-	srd_dbg("Decoding: abs start sample %" PRIu64 ", abs end sample %"
-		PRIu64 " (%" PRIu64 " samples, %" PRIu64 " bytes, unitsize = "
-		"%d), instance %s.", abs_start_samplenum, abs_end_samplenum,
-		abs_end_samplenum - abs_start_samplenum, inbuflen, di->data_unitsize,
-		di->inst_id);
+/**
+ * Decode a chunk of samples which is given as a list of transitions.
+ *
+ * Value number i (of 'unitsize' bytes each) in 'values' holds for all
+ * samples from samplenums[i] up to samplenums[i + 1] - 1, the last value
+ * holds up to the end of the chunk. The first transition must be at the
+ * start of the chunk, the sample numbers must be strictly increasing.
+ *
+ * The same rules as for srd_inst_decode() apply to the sequence of
+ * chunks, both kinds of chunks can be mixed.
+ *
+ * @param di The decoder instance to call. Must not be NULL.
+ * @param abs_start_samplenum The absolute starting sample number for the
+ * 		chunk, relative to the start of capture.
+ * @param abs_end_samplenum The absolute ending sample number for the
+ * 		chunk, relative to the start of capture.
+ * @param samplenums The absolute sample numbers of the transitions.
+ * 		Must not be NULL.
+ * @param values The sample values after each transition. Must not be NULL.
+ * @param num_transitions The number of transitions. Must be > 0.
+ * @param unitsize The number of bytes per sample. Must be > 0.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @private
+ */
+SRD_PRIV int srd_inst_decode_transitions(struct srd_decoder_inst *di,
+		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
+		const uint64_t *samplenums, const uint8_t *values,
+		uint64_t num_transitions, uint64_t unitsize)
+{
+	uint64_t i;
 
-	/* If this is the first call, start the worker thread. */
-	if (!di->thread_handle) {
-		srd_dbg("No worker thread for this decoder stack "
-			"exists yet, creating one: %s.", di->inst_id);
-		di->thread_handle = g_thread_new(di->inst_id,
-						 di_thread, di);
+	/* Return an error upon unusable input. */
+	if (!di) {
+		srd_dbg("empty decoder instance");
+		return SRD_ERR_ARG;
+	}
+	if (!samplenums || !values) {
+		srd_dbg("NULL buffer pointer");
+		return SRD_ERR_ARG;
+	}
+	if (num_transitions == 0) {
+		srd_dbg("empty list of transitions");
+		return SRD_ERR_ARG;
+	}
+	if (unitsize == 0) {
+		srd_dbg("unitsize 0");
+		return SRD_ERR_ARG;
 	}
 
-	/* Push the new sample chunk to the worker thread. */
-	g_mutex_lock(&di->data_mutex);
-	di->abs_start_samplenum = abs_start_samplenum;
-	di->abs_end_samplenum = abs_end_samplenum;
-	di->inbuf = inbuf;
-	di->inbuflen = inbuflen;
-	di->got_new_samples = TRUE;
-	di->handled_all_samples = FALSE;
-
-	/* Signal the thread that we have new data. */
-	g_cond_signal(&di->got_new_samples_cond);
-	g_mutex_unlock(&di->data_mutex);
-
-	/* When all samples in this chunk were handled, return. */
-	g_mutex_lock(&di->data_mutex);
-	while (!di->handled_all_samples && !di->want_wait_terminate)
-		g_cond_wait(&di->handled_all_samples_cond, &di->data_mutex);
-	g_mutex_unlock(&di->data_mutex);
-
-	/* Flush all PDs in the stack that can be flushed */
-	srd_inst_flush(di);
-
-	if (di->want_wait_terminate)
-		return SRD_ERR_TERM_REQ;
+	if (abs_start_samplenum != di->chunk_queue_end_samplenum ||
+	    abs_end_samplenum <= abs_start_samplenum ||
+	    samplenums[0] != abs_start_samplenum ||
+	    samplenums[num_transitions - 1] >= abs_end_samplenum) {
+		srd_dbg("Incorrect sample numbers: start=%" PRIu64 ", cur=%"
+			PRIu64 ", end=%" PRIu64 ".", abs_start_samplenum,
+			di->chunk_queue_end_samplenum, abs_end_samplenum);
+		return SRD_ERR_ARG;
+	}
+	for (i = 1; i < num_transitions; i++) {
+		if (samplenums[i] <= samplenums[i - 1]) {
+			srd_dbg("Transition %" PRIu64 " is out of order.", i);
+			return SRD_ERR_ARG;
+		}
+	}
 
-	return SRD_OK;
+	return srd_inst_decode_chunk(di, abs_start_samplenum,
+		abs_end_samplenum, values, num_transitions * unitsize,
+		samplenums, num_transitions, unitsize);
 }
 
 
@@ -1264,13 +2357,17 @@ SRD_PRIV int srd_inst_flush(struct srd_decoder_inst *di)
 		return SRD_ERR_ARG;
 
 	gstate = PyGILState_Ensure();
-	if (PyObject_HasAttrString(di->py_inst, "flush")) {
+	decode_batch_deliver(di);
+	if (di->py_flush) {
 		srd_dbg("Calling flush() of instance %s", di->inst_id);
-		py_ret = PyObject_CallMethod(di->py_inst, "flush", NULL);
+		py_ret = PyObject_CallObject(di->py_flush, NULL);
 		Py_XDECREF(py_ret);
 	}
 	PyGILState_Release(gstate);
 
+	/* Hand the chunk's annotations to the frontend. */
+	ann_batch_deliver(di);
+
 	/* Pass the "flush" request to all stacked decoders. */
 	for (l = di->next_di; l; l = l->next) {
 		ret = srd_inst_flush(l->data);
@@ -1319,6 +2416,7 @@ SRD_PRIV int srd_inst_terminate_reset(struct srd_decoder_inst *di)
 	srd_dbg("Terminating instance %s", di->inst_id);
 	srd_inst_join_decode_thread(di);
 	srd_inst_reset_state(di);
+	ann_batch_free(di);
 
 	/*
 	 * Have the Python side's .reset() method executed (if the PD
@@ -1328,6 +2426,8 @@ SRD_PRIV int srd_inst_terminate_reset(struct srd_decoder_inst *di)
 	 * as it's not referenced any longer.
 	 */
 	gstate = PyGILState_Ensure();
+	chunk_views_release(di);
+	Py_CLEAR(di->py_batch);
 	if (PyObject_HasAttrString(di->py_inst, "reset")) {
 		srd_dbg("Calling reset() of instance %s", di->inst_id);
 		py_ret = PyObject_CallMethod(di->py_inst, "reset", NULL);
@@ -1359,11 +2459,21 @@ SRD_PRIV void srd_inst_free(struct srd_decoder_inst *di)
 	srd_inst_reset_state(di);
 
 	gstate = PyGILState_Ensure();
+	chunk_views_release(di);
+	tuple_caches_free(di);
+	Py_CLEAR(di->py_batch);
+	Py_CLEAR(di->py_decode_batch);
+	Py_CLEAR(di->py_decode);
+	Py_CLEAR(di->py_flush);
+	((srd_Decoder *)di->py_inst)->di = NULL;
 	Py_DECREF(di->py_inst);
 	PyGILState_Release(gstate);
 
 	g_free(di->inst_id);
 	g_free(di->dec_channelmap);
+	g_free(di->gather_channelmap);
+	g_free(di->gather_lut);
+	chunk_queue_free(di);
 	g_free(di->channel_samples);
 	g_slist_free(di->next_di);
 	for (l = di->pd_output; l; l = l->next) {
@@ -1372,6 +2482,9 @@ SRD_PRIV void srd_inst_free(struct srd_decoder_inst *di)
 		g_free(pdo);
 	}
 	g_slist_free(di->pd_output);
+	g_free(di->pd_output_array);
+	g_free(di->ann_classes_enabled);
+	ann_batch_free(di);
 	g_free(di);
 }
 
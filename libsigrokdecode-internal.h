@@ -22,7 +22,7 @@
 #define LIBSIGROKDECODE_LIBSIGROKDECODE_INTERNAL_H
 
 /* Use the stable ABI subset as per PEP 384. */
-#define Py_LIMITED_API 0x03020000
+#define Py_LIMITED_API 0x03030000
 
 #include <Python.h> /* First, so we avoid a _POSIX_C_SOURCE warning. */
 #include "libsigrokdecode.h"
@@ -45,8 +45,33 @@ struct srd_term {
 	uint64_t num_samples_already_skipped;
 };
 
+/*
+ * Compiled form of one condition (a list of AND-ed terms), as bitmasks
+ * over the packed sample word. Rising and falling edges are expressed as
+ * a level requirement on the current sample plus a change requirement.
+ */
+struct srd_cond_mask {
+	/* The condition can never match (empty, or conflicting terms). */
+	gboolean never;
+	/* Bits which must have the level in 'level_value'. */
+	uint64_t level_mask;
+	uint64_t level_value;
+	/* Bits which must differ from the previous sample. */
+	uint64_t change_mask;
+	/* Bits which must be the same as in the previous sample. */
+	uint64_t stable_mask;
+	/* The SRD_TERM_SKIP term of a skip-only condition, or NULL. */
+	struct srd_term *skip;
+};
+
 /* Custom Python types: */
 
+typedef struct {
+	PyObject_HEAD
+	/* The decoder instance which owns this object, or NULL. */
+	struct srd_decoder_inst *di;
+} srd_Decoder;
+
 typedef struct {
 	PyObject_HEAD
 	struct srd_decoder_inst *di;
@@ -57,14 +82,83 @@ typedef struct {
 	PyObject *sample;
 } srd_logic;
 
+/* Annotations of an instance which are pending for the batch callback. */
+struct srd_ann_batch {
+	/* struct srd_proto_data items, 'data' gets set up on delivery. */
+	GArray *pdata;
+	/* struct srd_proto_data_annotation items, one per pdata item. */
+	GArray *pda;
+	/* Index of each item's first text in 'texts'. */
+	GArray *text_offsets;
+	/* The NULL-terminated text vectors of all items. */
+	GPtrArray *texts;
+	/* The IDs of the texts (0 for the terminators), if enabled. */
+	GArray *text_ids;
+	/* Storage for all texts, released in one go. */
+	GStringChunk *strings;
+};
+
+/* A chunk of input samples which was passed to a decoder instance. */
+struct srd_chunk {
+	uint64_t abs_start_samplenum;
+	uint64_t abs_end_samplenum;
+	const uint8_t *inbuf;
+	uint64_t inbuflen;
+	/* Sample numbers of the transitions, or NULL. */
+	const uint64_t *samplenums;
+	uint64_t num_transitions;
+	uint64_t unitsize;
+	/* Private buffer for the gathered samples of this chunk. */
+	uint8_t *gather_buf;
+	uint64_t gather_buflen;
+};
+
 struct srd_session {
 	int session_id;
 
+	/* Number of chunks which can be in flight per decoder instance. */
+	unsigned int chunk_queue_depth;
+
+	/* Send chunks to all instances first, then wait for all of them. */
+	gboolean parallel_send;
+
 	/* List of decoder instances. */
 	GSList *di_list;
 
 	/* List of frontend callbacks to receive decoder output. */
 	GSList *callbacks;
+
+	/* The first callback of 'callbacks' per output type, or NULL. */
+	struct srd_pd_callback *callback_table[SRD_OUTPUT_META + 1];
+
+	/* Annotations carry interned texts and their IDs. */
+	gboolean ann_text_ids;
+
+	/* Frontend callback to receive annotations in batches, or NULL. */
+	srd_pd_output_batch_callback ann_batch_cb;
+	void *ann_batch_cb_data;
+};
+
+struct srd_session_pool_entry {
+	/* The key the session was set up for. */
+	char *key;
+
+	/* Whether the session is in the pool, as opposed to handed out. */
+	gboolean idle;
+};
+
+struct srd_session_pool {
+	/* Builds the decoder stack of a new session for a key. */
+	srd_session_setup_callback setup;
+	void *setup_cb_data;
+
+	/* Idle sessions (GSList) by key. */
+	GHashTable *idle;
+
+	/* The entries of all sessions of the pool, idle or handed out. */
+	GHashTable *keys;
+
+	GMutex mutex;
 };
 
 /* srd.c */
@@ -78,9 +172,20 @@ SRD_PRIV struct srd_pd_callback *srd_pd_output_callback_find(struct srd_session
 SRD_PRIV int srd_inst_start(struct srd_decoder_inst *di);
 SRD_PRIV void match_array_free(struct srd_decoder_inst *di);
 SRD_PRIV void condition_list_free(struct srd_decoder_inst *di);
+SRD_PRIV void condition_list_compile(struct srd_decoder_inst *di);
 SRD_PRIV int srd_inst_decode(struct srd_decoder_inst *di,
 		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
 		const uint8_t *inbuf, uint64_t inbuflen, uint64_t unitsize);
+SRD_PRIV int srd_inst_decode_transitions(struct srd_decoder_inst *di,
+		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
+		const uint64_t *samplenums, const uint8_t *values,
+		uint64_t num_transitions, uint64_t unitsize);
+SRD_PRIV int srd_inst_decode_wait(struct srd_decoder_inst *di);
+SRD_PRIV const uint8_t *srd_inst_sample_pos(struct srd_decoder_inst *di,
+		uint64_t samplenum);
+SRD_PRIV const int *srd_inst_input_channelmap(const struct srd_decoder_inst *di);
+SRD_PRIV gboolean srd_inst_chunk_next(struct srd_decoder_inst *di);
+SRD_PRIV void srd_inst_chunk_done(struct srd_decoder_inst *di);
 SRD_PRIV int process_samples_until_condition_match(struct srd_decoder_inst *di, gboolean *found_match);
 SRD_PRIV int srd_inst_flush(struct srd_decoder_inst *di);
 SRD_PRIV int srd_inst_terminate_reset(struct srd_decoder_inst *di);
@@ -107,10 +212,16 @@ SRD_PRIV int srd_log(int loglevel, const char *format, ...) G_GNUC_PRINTF(2, 3);
 
 /* decoder.c */
 SRD_PRIV long srd_decoder_apiver(const struct srd_decoder *d);
+SRD_PRIV int srd_decoder_import(struct srd_decoder *dec);
 
 /* type_decoder.c */
 SRD_PRIV PyObject *srd_Decoder_type_new(void);
 SRD_PRIV const char *output_type_name(unsigned int idx);
+SRD_PRIV void chunk_views_release(struct srd_decoder_inst *di);
+SRD_PRIV void tuple_caches_free(struct srd_decoder_inst *di);
+SRD_PRIV void decode_batch_deliver(struct srd_decoder_inst *di);
+SRD_PRIV void ann_batch_deliver(struct srd_decoder_inst *di);
+SRD_PRIV void ann_batch_free(struct srd_decoder_inst *di);
 
 /* type_logic.c */
 SRD_PRIV PyObject *srd_logic_type_new(void);
@@ -29,6 +29,7 @@ extern "C" {
 #endif
 
 struct srd_session;
+struct srd_session_pool;
 
 /**
  * @file
@@ -197,11 +198,32 @@ struct srd_decoder {
 	/** List of decoder options. */
 	GSList *options;
 
-	/** Python module. */
+	/** Python module name, e.g. "i2c". */
+	char *module_name;
+
+	/**
+	 * Python module. NULL for a decoder loaded from an index, until it
+	 * is first instantiated.
+	 */
 	void *py_mod;
 
 	/** sigrokdecode.Decoder class. */
 	void *py_dec;
+
+	/** Python dict of interned annotation texts and their IDs, or NULL. */
+	void *py_ann_text_ids;
+
+	/** Interned annotation texts, indexed by ID. */
+	GPtrArray *ann_texts;
+
+	/** Time spent importing the Python module, in microseconds. */
+	int64_t import_time;
+
+	/**
+	 * Time spent reading the decoder's metadata from its module or
+	 * from an index, in microseconds.
+	 */
+	int64_t metadata_time;
 };
 
 enum srd_initial_pin {
@@ -243,6 +265,45 @@ struct srd_decoder_logic_output_channel {
 	char *desc;
 };
 
+struct srd_chunk;
+struct srd_ann_batch;
+
+/**
+ * Profiling counters of a decoder instance, see srd_inst_stats_get().
+ * All times are in microseconds.
+ */
+struct srd_inst_stats {
+	/** Number of wait() and wait_many() calls. */
+	uint64_t wait_calls;
+
+	/** Number of samples checked against wait() conditions. */
+	uint64_t samples_scanned;
+
+	/** Number of samples which matched the wait() conditions. */
+	uint64_t matches;
+
+	/** Time spent checking wait() conditions in C. */
+	int64_t match_time;
+
+	/** Time spent in Python between returning from and calling wait(). */
+	int64_t python_time;
+
+	/** Number of put() calls, indexed by output type (SRD_OUTPUT_*). */
+	uint64_t put_calls[SRD_OUTPUT_META + 1];
+
+	/**
+	 * Time spent in put(), including output callbacks and decoders
+	 * stacked on top.
+	 */
+	int64_t put_time;
+
+	/**
+	 * Time spent in this instance's decode() or decode_batch() as a
+	 * stacked decoder.
+	 */
+	int64_t stacked_decode_time;
+};
+
 struct srd_decoder_inst {
 	struct srd_decoder *decoder;
 	struct srd_session *sess;
@@ -261,6 +322,16 @@ struct srd_decoder_inst {
 	/** Array of booleans denoting which conditions matched. */
 	GArray *match_array;
 
+	/**
+	 * Compiled form of the condition list (array of bitmask
+	 * descriptions), or NULL when the terms must be evaluated
+	 * one by one.
+	 */
+	GArray *cond_masks;
+
+	/** Number of sample bytes covered by the compiled conditions. */
+	int cond_masks_bytes;
+
 	/** Absolute start sample number. */
 	uint64_t abs_start_samplenum;
 
@@ -273,6 +344,100 @@ struct srd_decoder_inst {
 	/** Length (in bytes) of the input sample buffer. */
 	uint64_t inbuflen;
 
+	/**
+	 * Sample numbers where the values in the input sample buffer
+	 * start, when the chunk was sent as a list of transitions.
+	 * NULL for chunks which hold a value for every sample.
+	 */
+	const uint64_t *inbuf_samplenums;
+
+	/** Number of transitions in the input sample buffer. */
+	uint64_t inbuf_num_transitions;
+
+	/** Index of the most recently looked up transition. */
+	uint64_t inbuf_transition_idx;
+
+	/** Indicates whether the gather stage was requested. */
+	gboolean gather_enabled;
+
+	/**
+	 * Channel map into the gathered (one byte per sample) input
+	 * samples, or NULL when the input buffer is used as is.
+	 */
+	int *gather_channelmap;
+
+	/** Number of input sample bytes which hold mapped channels. */
+	int gather_num_bytes;
+
+	/** Offsets of the input sample bytes which hold mapped channels. */
+	int gather_offsets[8];
+
+	/** Lookup tables (256 entries per input byte) for gathering. */
+	uint8_t *gather_lut;
+
+	/** Ring of chunks which were passed to the worker thread. */
+	struct srd_chunk *chunk_queue;
+
+	/** Number of entries in the chunk ring. */
+	unsigned int chunk_queue_depth;
+
+	/** Index of the oldest (current) chunk in the ring. */
+	unsigned int chunk_queue_head;
+
+	/** Number of chunks in the ring, including the current chunk. */
+	unsigned int chunk_queue_len;
+
+	/** Absolute end sample number of the most recently queued chunk. */
+	uint64_t chunk_queue_end_samplenum;
+
+	/** Python memoryview of the current chunk's sample values, or NULL. */
+	void *py_chunk_data;
+
+	/** Python memoryview of the current chunk's transitions, or NULL. */
+	void *py_chunk_samplenums;
+
+	/** The instance's bound decode_batch() method, or NULL. */
+	void *py_decode_batch;
+
+	/** List of (ss, es, data) items pending for decode_batch(), or NULL. */
+	void *py_batch;
+
+	/** The instance's bound decode() method, or NULL. */
+	void *py_decode;
+
+	/** The instance's bound flush() method, or NULL. */
+	void *py_flush;
+
+	/** The instance's outputs (see pd_output), indexed by output ID. */
+	struct srd_pd_output **pd_output_array;
+
+	/** Number of entries in pd_output_array. */
+	int pd_output_count;
+
+	/** Annotations pending for the session's batch callback, or NULL. */
+	struct srd_ann_batch *ann_batch;
+
+	/** Per annotation class: 1 if enabled, or NULL if all are enabled. */
+	uint8_t *ann_classes_enabled;
+
+	/** Number of entries in ann_classes_enabled. */
+	int num_ann_classes;
+
+	/**
+	 * Cache of pin value tuples (indexed by the pin values as a
+	 * bitmask) for instances with up to 8 channels, or NULL.
+	 */
+	void **py_pin_tuples;
+
+	/** Unused channels (bitmask) when the pin value tuples were cached. */
+	uint64_t py_pin_tuples_unused;
+
+	/**
+	 * Cache of matched tuples for up to 8 conditions, indexed by
+	 * (1 << number of conditions) + matched conditions bitmask, or NULL.
+	 */
+	void **py_matched_tuples;
+
 	/** Absolute current samplenumber. */
 	uint64_t abs_cur_samplenum;
 
@@ -294,6 +459,12 @@ struct srd_decoder_inst {
 	/** Indicates the current state of the decoder stack. */
 	int decoder_state;
 
+	/** Profiling counters. */
+	struct srd_inst_stats stats;
+
+	/** When wait() last returned to Python, or 0. */
+	int64_t wait_return_time;
+
 	GCond got_new_samples_cond;
 	GCond handled_all_samples_cond;
 	GMutex data_mutex;
@@ -316,9 +487,14 @@ struct srd_proto_data {
 	struct srd_pd_output *pdo;
 	void *data;
 };
+/* ID of an annotation text which did not fit into the intern table. */
+#define SRD_ANN_TEXT_ID_NONE ((unsigned int)-1)
+
 struct srd_proto_data_annotation {
 	int ann_class; /* Index into "struct srd_decoder"->annotations. */
 	char **ann_text;
+	/* IDs of the texts, see srd_session_ann_text_ids_set(), or NULL. */
+	unsigned int *ann_text_ids;
 };
 struct srd_proto_data_binary {
 	int bin_class; /* Index into "struct srd_decoder"->binary. */
@@ -334,6 +510,33 @@ struct srd_proto_data_logic {
 typedef void (*srd_pd_output_callback)(struct srd_proto_data *pdata,
 					void *cb_data);
 
+typedef void (*srd_pd_output_batch_callback)(struct srd_proto_data *pdata,
+					unsigned int num_pdata, void *cb_data);
+
+typedef int (*srd_session_setup_callback)(struct srd_session *sess,
+					const char *key, void *cb_data);
+
+/**
+ * Where the time spent starting up libsigrokdecode went, see
+ * srd_startup_times_get(). All times are in microseconds.
+ */
+struct srd_startup_times {
+	/** srd_init(), mostly initializing the Python interpreter. */
+	int64_t init;
+
+	/**
+	 * Scanning the search paths and reading indexes in
+	 * srd_decoder_load_all(), without the decoders' own load times.
+	 */
+	int64_t scan;
+
+	/** Importing decoder modules, including imports on first use. */
+	int64_t import;
+
+	/** Reading decoder metadata from modules or from indexes. */
+	int64_t metadata;
+};
+
 struct srd_pd_callback {
 	int output_type;
 	srd_pd_output_callback cb;
@@ -344,6 +547,7 @@ struct srd_pd_callback {
 SRD_API int srd_init(const char *path);
 SRD_API int srd_exit(void);
 SRD_API GSList *srd_searchpaths_get(void);
+SRD_API int srd_startup_times_get(struct srd_startup_times *times);
 
 /* session.c */
 SRD_API int srd_session_new(struct srd_session **sess);
@@ -353,16 +557,38 @@ SRD_API int srd_session_metadata_set(struct srd_session *sess, int key,
 SRD_API int srd_session_send(struct srd_session *sess,
 		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
 		const uint8_t *inbuf, uint64_t inbuflen, uint64_t unitsize);
+SRD_API int srd_session_send_transitions(struct srd_session *sess,
+		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
+		const uint64_t *samplenums, const uint8_t *values,
+		uint64_t num_transitions, uint64_t unitsize);
+SRD_API int srd_session_chunk_queue_depth_set(struct srd_session *sess,
+		unsigned int depth);
+SRD_API int srd_session_sync(struct srd_session *sess);
+SRD_API int srd_session_parallel_send_set(struct srd_session *sess,
+		gboolean enable);
+SRD_API int srd_session_ann_text_ids_set(struct srd_session *sess,
+		gboolean enable);
 SRD_API int srd_session_terminate_reset(struct srd_session *sess);
 SRD_API int srd_session_destroy(struct srd_session *sess);
 SRD_API int srd_pd_output_callback_add(struct srd_session *sess,
 		int output_type, srd_pd_output_callback cb, void *cb_data);
+SRD_API int srd_pd_output_callback_add_batch(struct srd_session *sess,
+		int output_type, srd_pd_output_batch_callback cb, void *cb_data);
+SRD_API int srd_session_pool_new(struct srd_session_pool **pool,
+		srd_session_setup_callback setup, void *cb_data);
+SRD_API int srd_session_pool_get(struct srd_session_pool *pool,
+		const char *key, struct srd_session **sess);
+SRD_API int srd_session_pool_put(struct srd_session_pool *pool,
+		struct srd_session *sess);
+SRD_API int srd_session_pool_destroy(struct srd_session_pool *pool);
 
 /* decoder.c */
 SRD_API const GSList *srd_decoder_list(void);
 SRD_API struct srd_decoder *srd_decoder_get_by_id(const char *id);
 SRD_API int srd_decoder_load(const char *name);
 SRD_API char *srd_decoder_doc_get(const struct srd_decoder *dec);
+SRD_API const char *srd_decoder_ann_text_get(const struct srd_decoder *dec,
+		unsigned int id);
 SRD_API int srd_decoder_unload(struct srd_decoder *dec);
 SRD_API int srd_decoder_load_all(void);
 SRD_API int srd_decoder_unload_all(void);
@@ -372,6 +598,10 @@ SRD_API int srd_inst_option_set(struct srd_decoder_inst *di,
 		GHashTable *options);
 SRD_API int srd_inst_channel_set_all(struct srd_decoder_inst *di,
 		GHashTable *channels);
+SRD_API int srd_inst_channel_gather_set(struct srd_decoder_inst *di,
+		gboolean enable);
+SRD_API int srd_inst_ann_class_enable(struct srd_decoder_inst *di,
+		int ann_class, gboolean enable);
 SRD_API struct srd_decoder_inst *srd_inst_new(struct srd_session *sess,
 		const char *id, GHashTable *options);
 SRD_API int srd_inst_stack(struct srd_session *sess,
@@ -380,6 +610,8 @@ SRD_API struct srd_decoder_inst *srd_inst_find_by_id(struct srd_session *sess,
 		const char *inst_id);
 SRD_API int srd_inst_initial_pins_set_all(struct srd_decoder_inst *di,
 		GArray *initial_pins);
+SRD_API int srd_inst_stats_get(const struct srd_decoder_inst *di,
+		struct srd_inst_stats *stats);
 
 /* log.c */
 typedef int (*srd_log_callback)(void *cb_data, int loglevel,
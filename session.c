@@ -35,6 +35,40 @@
  *
  * Starting and handling decoding sessions.
  *
+ * Each bottom-level decoder instance of a session runs its decode()
+ * method in a thread of its own. All threads share the process' Python
+ * interpreter. The search for wait() conditions runs without the GIL,
+ * and can overlap across stacks (see srd_session_parallel_send_set()),
+ * but the Python code of the decoders runs under the GIL, one thread
+ * at a time.
+ *
+ * Running stacks in sub-interpreters with a GIL of their own is not
+ * supported: decoder classes get loaded once per process and are shared
+ * by all sessions, and the stable Python ABI which libsigrokdecode uses
+ * does not offer per-interpreter GILs. Applications which need the
+ * Python parts of many stacks to run in parallel should run sessions
+ * in separate processes.
+ *
+ * The sample data passed to srd_session_send() and
+ * srd_session_send_transitions() is not copied (unless the channel
+ * gather stage is enabled for an instance, see
+ * srd_inst_channel_gather_set()). Worker processes can pass pointers
+ * into a shared, read-only mapping of the capture, e.g. from mmap(),
+ * so that several processes decode the same samples without copies.
+ * Worker processes must call srd_init() themselves, they must not be
+ * forked from a process which already called srd_init().
+ *
+ * The library does not split one capture into segments which are decoded
+ * in parallel. Stitching the results would need a point in each segment
+ * where a decoder is known to be in sync again (e.g. an idle UART line or
+ * an I2C start condition), and the decoders declare no such points. Within
+ * one process, the segments' Python code would run under the single GIL
+ * anyway. Frontends which know a safe split point for their protocol can
+ * decode the segments in separate processes, from a shared mapping of the
+ * capture as described above. Each segment gets sent starting from sample
+ * zero, so the frontend adds the segment's first sample number to the
+ * sample numbers of the results.
+ *
  * @{
  */
 
@@ -63,8 +97,10 @@ SRD_API int srd_session_new(struct srd_session **sess)
 	if (!sess)
 		return SRD_ERR_ARG;
 
-	*sess = g_malloc(sizeof(struct srd_session));
+	*sess = g_malloc0(sizeof(struct srd_session));
 	(*sess)->session_id = ++max_session_id;
+	(*sess)->chunk_queue_depth = 1;
+	(*sess)->parallel_send = FALSE;
 	(*sess)->di_list = (*sess)->callbacks = NULL;
 
 	/* Keep a list of all sessions, so we can clean up as needed. */
@@ -201,6 +237,28 @@ SRD_API int srd_session_metadata_set(struct srd_session *sess, int key,
 	return ret;
 }
 
+/*
+ * Wait for the instances before 'end' in the session's list, which got a
+ * chunk sent in parallel. Returns 'ret', or the first error while waiting.
+ */
+static int srd_session_decode_join(struct srd_session *sess, GSList *end,
+		int ret)
+{
+	GSList *d;
+	int r;
+
+	if (!sess->parallel_send || sess->chunk_queue_depth > 1)
+		return ret;
+
+	for (d = sess->di_list; d != end; d = d->next) {
+		r = srd_inst_decode_wait(d->data);
+		if (ret == SRD_OK)
+			ret = r;
+	}
+
+	return ret;
+}
+
 /**
  * Send a chunk of logic sample data to a running decoder session.
  *
@@ -246,6 +304,10 @@ SRD_API int srd_session_metadata_set(struct srd_session *sess, int key,
  *   srd_session_send(s, 0,    1023, inbuf, 1024, 1);
  *   srd_session_send(s, 0,    1023, inbuf, 1024, 1);
  *
+ * By default, srd_session_send() returns when the decoders have processed
+ * all samples of the chunk, and 'inbuf' can be re-used right away. See
+ * srd_session_chunk_queue_depth_set() for keeping several chunks in flight.
+ *
  * @param sess The session to use. Must not be NULL.
  * @param abs_start_samplenum The absolute starting sample number for the
  *              buffer's sample set, relative to the start of capture.
@@ -269,15 +331,238 @@ SRD_API int srd_session_send(struct srd_session *sess,
 	if (!sess)
 		return SRD_ERR_ARG;
 
+	ret = SRD_OK;
 	for (d = sess->di_list; d; d = d->next) {
 		if ((ret = srd_inst_decode(d->data, abs_start_samplenum,
 				abs_end_samplenum, inbuf, inbuflen, unitsize)) != SRD_OK)
-			return ret;
+			break;
+	}
+
+	return srd_session_decode_join(sess, d, ret);
+}
+
+/**
+ * Send a chunk of logic sample data, given as a list of transitions,
+ * to a running decoder session.
+ *
+ * This is an alternative to srd_session_send() for sample data which is
+ * available in run-length form, e.g. a list of edges. The values don't
+ * need to be expanded to one value per sample. Value number i (of
+ * 'unitsize' bytes each) in 'values' holds for all samples from
+ * samplenums[i] up to samplenums[i + 1] - 1, the last value holds up to
+ * the end of the chunk. The first transition must be at the start of the
+ * chunk, and the sample numbers must be strictly increasing.
+ *
+ * The same rules as for srd_session_send() apply to the sequence of
+ * chunks. Calls to srd_session_send() and srd_session_send_transitions()
+ * can be mixed.
+ *
+ * Example (4096 samples total, 2 chunks, one signal which goes high at
+ * samples 10, 1500 and 3000, and low at samples 1030 and 2048):
+ *   samplenums = { 0, 10, 1030, 1500 }; values = { 0, 1, 0, 1 };
+ *   srd_session_send_transitions(s, 0,    2048, samplenums, values, 4, 1);
+ *   samplenums = { 2048, 3000 };        values = { 0, 1 };
+ *   srd_session_send_transitions(s, 2048, 4096, samplenums, values, 2, 1);
+ *
+ * @param sess The session to use. Must not be NULL.
+ * @param abs_start_samplenum The absolute starting sample number for the
+ *              chunk, relative to the start of capture.
+ * @param abs_end_samplenum The absolute ending sample number for the
+ *              chunk, relative to the start of capture.
+ * @param samplenums The absolute sample numbers of the transitions.
+ *              Must not be NULL.
+ * @param values The sample values after each transition, 'unitsize'
+ *              bytes per value. Must not be NULL.
+ * @param num_transitions The number of transitions. Must be > 0.
+ * @param unitsize The number of bytes per sample. Must be > 0.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_send_transitions(struct srd_session *sess,
+		uint64_t abs_start_samplenum, uint64_t abs_end_samplenum,
+		const uint64_t *samplenums, const uint8_t *values,
+		uint64_t num_transitions, uint64_t unitsize)
+{
+	GSList *d;
+	int ret;
+
+	if (!sess || !samplenums || !values || !num_transitions || !unitsize)
+		return SRD_ERR_ARG;
+
+	ret = SRD_OK;
+	for (d = sess->di_list; d; d = d->next) {
+		if ((ret = srd_inst_decode_transitions(d->data,
+				abs_start_samplenum, abs_end_samplenum,
+				samplenums, values, num_transitions,
+				unitsize)) != SRD_OK)
+			break;
+	}
+
+	return srd_session_decode_join(sess, d, ret);
+}
+
+/**
+ * Set the number of chunks which can be in flight per decoder instance.
+ *
+ * With the default depth of 1, srd_session_send() and
+ * srd_session_send_transitions() return when the decoders have processed
+ * all samples of the chunk. With a depth of N > 1, the chunks get queued
+ * in a ring of N chunks per decoder instance and the calls return as soon
+ * as the chunk is queued, so the application can acquire the next chunk
+ * while the decoders are busy. The calls only block when the ring is full.
+ *
+ * The buffers passed in the call number k must remain valid and unchanged
+ * until the call number k + N has returned, or until srd_session_sync()
+ * has returned. Applications typically cycle through N + 1 buffers.
+ *
+ * The depth can only be changed while no chunks are in flight, i.e.
+ * before sending the first chunk, or after srd_session_sync().
+ *
+ * @param sess The session to use. Must not be NULL.
+ * @param depth The number of chunks in flight per instance. Must be > 0.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_chunk_queue_depth_set(struct srd_session *sess,
+		unsigned int depth)
+{
+	GSList *d;
+	struct srd_decoder_inst *di;
+	unsigned int len;
+
+	if (!sess || depth < 1)
+		return SRD_ERR_ARG;
+
+	for (d = sess->di_list; d; d = d->next) {
+		di = d->data;
+		g_mutex_lock(&di->data_mutex);
+		len = di->chunk_queue_len;
+		g_mutex_unlock(&di->data_mutex);
+		if (len) {
+			srd_err("Chunks still in flight for %s, cannot "
+				"change the queue depth.", di->inst_id);
+			return SRD_ERR;
+		}
 	}
 
+	sess->chunk_queue_depth = depth;
+
+	return SRD_OK;
+}
+
+/**
+ * Send chunks to all decoder stacks of a session in parallel.
+ *
+ * By default, srd_session_send() and srd_session_send_transitions() pass
+ * the chunk to one bottom-level decoder instance after the other, and
+ * wait for each instance to handle all samples before the next instance
+ * gets the chunk. When enabled, the chunk is passed to all instances
+ * first, and then the calls wait for all of them. Independent stacks
+ * (e.g. UART on one channel and SPI on others) then search for their
+ * conditions concurrently, each in its own thread. Python code of the
+ * decoders still runs under the GIL.
+ *
+ * The calls still return when all instances have handled the chunk. This
+ * makes no difference with a chunk queue depth > 1, see
+ * srd_session_chunk_queue_depth_set().
+ *
+ * @param sess The session to use. Must not be NULL.
+ * @param enable TRUE to send chunks in parallel, FALSE to send them to
+ *               one instance after the other.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_parallel_send_set(struct srd_session *sess,
+		gboolean enable)
+{
+	if (!sess)
+		return SRD_ERR_ARG;
+
+	sess->parallel_send = enable;
+
 	return SRD_OK;
 }
 
+/**
+ * Pass interned annotation texts and their IDs to frontends.
+ *
+ * Decoders submit the same annotation texts over and over. When enabled,
+ * each decoder keeps a table of all annotation texts it has submitted,
+ * and annotations carry pointers into this table in 'ann_text', plus the
+ * IDs of the texts in 'ann_text_ids' (see struct
+ * srd_proto_data_annotation). The texts are no longer duplicated for
+ * every annotation. They remain valid until the decoder gets unloaded, so
+ * frontends can keep the pointers or the IDs instead of copies. The text
+ * for an ID can be retrieved with srd_decoder_ann_text_get().
+ *
+ * The table grows with the number of distinct texts a decoder submits,
+ * up to 65536 texts. Texts which don't fit anymore are passed as copies
+ * which are only valid during the callback, with the ID
+ * SRD_ANN_TEXT_ID_NONE.
+ *
+ * @param sess The session to use. Must not be NULL.
+ * @param enable TRUE to pass interned texts, FALSE to pass copies.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_ann_text_ids_set(struct srd_session *sess,
+		gboolean enable)
+{
+	if (!sess)
+		return SRD_ERR_ARG;
+
+	sess->ann_text_ids = enable;
+
+	return SRD_OK;
+}
+
+/**
+ * Wait until the decoders have processed all chunks which were sent.
+ *
+ * Afterwards all buffers which were passed to srd_session_send() and
+ * srd_session_send_transitions() can be re-used, and all output of the
+ * chunks, including what gets delivered when the decoders are flushed
+ * at the end of each chunk, was passed to the callbacks. Only needed with
+ * a chunk queue depth > 1, see srd_session_chunk_queue_depth_set().
+ *
+ * @param sess The session to use. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *         SRD_ERR_TERM_REQ if a decoder terminated.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_sync(struct srd_session *sess)
+{
+	GSList *d;
+	struct srd_decoder_inst *di;
+	gboolean terminated;
+
+	if (!sess)
+		return SRD_ERR_ARG;
+
+	terminated = FALSE;
+	for (d = sess->di_list; d; d = d->next) {
+		di = d->data;
+		g_mutex_lock(&di->data_mutex);
+		while (di->chunk_queue_len && !di->want_wait_terminate)
+			g_cond_wait(&di->handled_all_samples_cond, &di->data_mutex);
+		if (di->chunk_queue_len)
+			terminated = TRUE;
+		g_mutex_unlock(&di->data_mutex);
+	}
+
+	return terminated ? SRD_ERR_TERM_REQ : SRD_OK;
+}
+
 /**
  * Terminate currently executing decoders in a session, reset internal state.
  *
@@ -317,10 +602,35 @@ SRD_API int srd_session_terminate_reset(struct srd_session *sess)
 	return SRD_OK;
 }
 
+/* Log the profiling counters of an instance and the ones stacked on it. */
+static void srd_inst_stats_log(struct srd_decoder_inst *di)
+{
+	const struct srd_inst_stats *st;
+	GSList *l;
+
+	st = &di->stats;
+	srd_dbg("Instance %s: %" PRIu64 " waits, %" PRIu64 " samples scanned, %"
+		PRIu64 " matches, match %" PRId64 " us, Python %" PRId64 " us.",
+		di->inst_id, st->wait_calls, st->samples_scanned, st->matches,
+		st->match_time, st->python_time);
+	srd_dbg("Instance %s: put() ann/python/binary/logic/meta %" PRIu64
+		"/%" PRIu64 "/%" PRIu64 "/%" PRIu64 "/%" PRIu64 ", put %"
+		PRId64 " us, stacked decode %" PRId64 " us.", di->inst_id,
+		st->put_calls[SRD_OUTPUT_ANN], st->put_calls[SRD_OUTPUT_PYTHON],
+		st->put_calls[SRD_OUTPUT_BINARY], st->put_calls[SRD_OUTPUT_LOGIC],
+		st->put_calls[SRD_OUTPUT_META], st->put_time,
+		st->stacked_decode_time);
+
+	for (l = di->next_di; l; l = l->next)
+		srd_inst_stats_log(l->data);
+}
+
 /**
  * Destroy a decoding session.
  *
  * All decoder instances and output callbacks are properly released.
+ * With the log level set to SRD_LOG_DBG, the profiling counters of all
+ * instances get logged first (see srd_inst_stats_get()).
  *
  * @param sess The session to be destroyed. Must not be NULL.
  *
@@ -330,12 +640,17 @@ SRD_API int srd_session_terminate_reset(struct srd_session *sess)
  */
 SRD_API int srd_session_destroy(struct srd_session *sess)
 {
+	GSList *l;
 	int session_id;
 
 	if (!sess)
 		return SRD_ERR_ARG;
 
 	session_id = sess->session_id;
+	if (srd_log_loglevel_get() >= SRD_LOG_DBG) {
+		for (l = sess->di_list; l; l = l->next)
+			srd_inst_stats_log(l->data);
+	}
 	if (sess->di_list)
 		srd_inst_free_all(sess);
 	if (sess->callbacks)
@@ -348,6 +663,221 @@ SRD_API int srd_session_destroy(struct srd_session *sess)
 	return SRD_OK;
 }
 
+static void srd_session_pool_entry_free(void *data)
+{
+	struct srd_session_pool_entry *entry = data;
+
+	g_free(entry->key);
+	g_free(entry);
+}
+
+/**
+ * Create a pool of reusable decoding sessions.
+ *
+ * Building a decoder stack (srd_inst_new(), option conversion,
+ * srd_inst_stack(), output callbacks) costs far more than decoding a
+ * short capture. A pool builds the stack of a session once per key, and
+ * hands out reset sessions afterwards, so that decoding another capture
+ * with the same stack only costs the decoders' reset() and start().
+ *
+ * The key is chosen by the caller and identifies the stack, e.g. from
+ * the decoder IDs, options and channel maps. The setup callback builds
+ * the stack of a new session for a key, by creating, configuring and
+ * stacking instances and registering output callbacks.
+ *
+ * @param pool A pointer which will hold a pointer to a newly
+ *             initialized pool on return. Must not be NULL.
+ * @param setup The function to build the stack of a session for a key.
+ *              It returns SRD_OK upon success. Must not be NULL.
+ * @param cb_data Private data for the setup function. Can be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_pool_new(struct srd_session_pool **pool,
+		srd_session_setup_callback setup, void *cb_data)
+{
+	if (!pool || !setup)
+		return SRD_ERR_ARG;
+
+	*pool = g_malloc0(sizeof(struct srd_session_pool));
+	(*pool)->setup = setup;
+	(*pool)->setup_cb_data = cb_data;
+	(*pool)->idle = g_hash_table_new_full(g_str_hash, g_str_equal,
+			g_free, NULL);
+	(*pool)->keys = g_hash_table_new_full(g_direct_hash, g_direct_equal,
+			NULL, srd_session_pool_entry_free);
+	g_mutex_init(&(*pool)->mutex);
+
+	return SRD_OK;
+}
+
+/**
+ * Get a session for a key from a pool.
+ *
+ * Hands out an idle session of the pool which was set up for this key,
+ * or sets up a new one. Either way the caller sets the session's
+ * metadata and runs srd_session_start() before sending data, and hands
+ * the session back with srd_session_pool_put() when done.
+ *
+ * @param pool The pool. Must not be NULL.
+ * @param key The key which identifies the stack. Must not be NULL.
+ * @param sess A pointer which will hold a pointer to the session on
+ *             return. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_pool_get(struct srd_session_pool *pool,
+		const char *key, struct srd_session **sess)
+{
+	struct srd_session_pool_entry *entry;
+	GSList *idle;
+	int ret;
+
+	if (!pool || !key || !sess)
+		return SRD_ERR_ARG;
+
+	g_mutex_lock(&pool->mutex);
+	idle = g_hash_table_lookup(pool->idle, key);
+	if (idle) {
+		*sess = idle->data;
+		g_hash_table_insert(pool->idle, g_strdup(key),
+				g_slist_delete_link(idle, idle));
+		entry = g_hash_table_lookup(pool->keys, *sess);
+		entry->idle = FALSE;
+		g_mutex_unlock(&pool->mutex);
+		return SRD_OK;
+	}
+	g_mutex_unlock(&pool->mutex);
+
+	if ((ret = srd_session_new(sess)) != SRD_OK)
+		return ret;
+
+	if ((ret = pool->setup(*sess, key, pool->setup_cb_data)) != SRD_OK) {
+		srd_err("Failed to set up session for '%s'.", key);
+		srd_session_destroy(*sess);
+		*sess = NULL;
+		return ret;
+	}
+	srd_dbg("Session pool: set up session %d for '%s'.",
+		(*sess)->session_id, key);
+
+	entry = g_malloc(sizeof(struct srd_session_pool_entry));
+	entry->key = g_strdup(key);
+	entry->idle = FALSE;
+	g_mutex_lock(&pool->mutex);
+	g_hash_table_insert(pool->keys, *sess, entry);
+	g_mutex_unlock(&pool->mutex);
+
+	return SRD_OK;
+}
+
+/**
+ * Hand a session back to its pool.
+ *
+ * The session gets reset with srd_session_terminate_reset(), and can be
+ * handed out again for the same key. A session which fails to reset is
+ * destroyed. Putting back a session which is already in the pool fails.
+ *
+ * @param pool The pool. Must not be NULL.
+ * @param sess A session which was handed out by this pool.
+ *             Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_pool_put(struct srd_session_pool *pool,
+		struct srd_session *sess)
+{
+	struct srd_session_pool_entry *entry;
+	GSList *idle;
+	char *key;
+	int ret;
+
+	if (!pool || !sess)
+		return SRD_ERR_ARG;
+
+	g_mutex_lock(&pool->mutex);
+	entry = g_hash_table_lookup(pool->keys, sess);
+	if (!entry) {
+		g_mutex_unlock(&pool->mutex);
+		srd_err("Session %d is not part of this pool.", sess->session_id);
+		return SRD_ERR_ARG;
+	}
+	if (entry->idle) {
+		g_mutex_unlock(&pool->mutex);
+		srd_err("Session %d is already in the pool.", sess->session_id);
+		return SRD_ERR_ARG;
+	}
+	/* Reject a concurrent put of the same session while resetting. */
+	entry->idle = TRUE;
+	key = entry->key;
+	g_mutex_unlock(&pool->mutex);
+
+	if ((ret = srd_session_terminate_reset(sess)) != SRD_OK) {
+		g_mutex_lock(&pool->mutex);
+		g_hash_table_remove(pool->keys, sess);
+		g_mutex_unlock(&pool->mutex);
+		srd_session_destroy(sess);
+		return ret;
+	}
+
+	g_mutex_lock(&pool->mutex);
+	idle = g_hash_table_lookup(pool->idle, key);
+	g_hash_table_insert(pool->idle, g_strdup(key),
+			g_slist_prepend(idle, sess));
+	g_mutex_unlock(&pool->mutex);
+
+	return SRD_OK;
+}
+
+static void srd_session_pool_destroy_cb(void *key, void *value, void *ignored)
+{
+	(void)value;
+	(void)ignored;
+
+	srd_session_destroy(key);
+}
+
+static void srd_session_pool_idle_free_cb(void *key, void *value, void *ignored)
+{
+	(void)key;
+	(void)ignored;
+
+	g_slist_free(value);
+}
+
+/**
+ * Destroy a pool of sessions.
+ *
+ * All sessions of the pool are destroyed, including those which are
+ * currently handed out. Pools must be destroyed before srd_exit().
+ *
+ * @param pool The pool to be destroyed. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_session_pool_destroy(struct srd_session_pool *pool)
+{
+	if (!pool)
+		return SRD_ERR_ARG;
+
+	g_hash_table_foreach(pool->keys, srd_session_pool_destroy_cb, NULL);
+	g_hash_table_foreach(pool->idle, srd_session_pool_idle_free_cb, NULL);
+	g_hash_table_destroy(pool->keys);
+	g_hash_table_destroy(pool->idle);
+	g_mutex_clear(&pool->mutex);
+	g_free(pool);
+
+	return SRD_OK;
+}
+
 /**
  * Register/add a decoder output callback function.
  *
@@ -380,6 +910,57 @@ SRD_API int srd_pd_output_callback_add(struct srd_session *sess,
 	pd_cb->cb = cb;
 	pd_cb->cb_data = cb_data;
 	sess->callbacks = g_slist_append(sess->callbacks, pd_cb);
+	if (output_type >= 0 && output_type <= SRD_OUTPUT_META &&
+	    !sess->callback_table[output_type])
+		sess->callback_table[output_type] = pd_cb;
+
+	return SRD_OK;
+}
+
+/**
+ * Register a decoder output callback function which receives batches.
+ *
+ * Instead of one call per annotation, the callback receives all
+ * annotations which one decoder instance produced while decoding a chunk
+ * (or up to several thousand of them), as an array of 'num_pdata' items.
+ * The texts of all annotations in a batch are kept in one block of
+ * memory, which gets released (or re-used) in one go after the callback
+ * returns. The callback must copy what it needs to keep.
+ *
+ * When a batch callback is registered, annotations are no longer passed
+ * to a callback which was registered with srd_pd_output_callback_add().
+ * Annotations get delivered when the decoder stack gets flushed, i.e.
+ * after each chunk which was sent to the session.
+ *
+ * @param sess The output session in which to register the callback.
+ *             Must not be NULL.
+ * @param output_type The output type this callback will receive. Only
+ *                    SRD_OUTPUT_ANN is supported. A later registration
+ *                    replaces an earlier one.
+ * @param cb The function to call. Must not be NULL.
+ * @param cb_data Private data for the callback function. Can be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_pd_output_callback_add_batch(struct srd_session *sess,
+		int output_type, srd_pd_output_batch_callback cb, void *cb_data)
+{
+	if (!sess || !cb)
+		return SRD_ERR_ARG;
+
+	if (output_type != SRD_OUTPUT_ANN) {
+		srd_err("Batch callbacks are not supported for output type %s.",
+			output_type_name(output_type));
+		return SRD_ERR_ARG;
+	}
+
+	srd_dbg("Registering new batch callback for output type %s.",
+		output_type_name(output_type));
+
+	sess->ann_batch_cb = cb;
+	sess->ann_batch_cb_data = cb_data;
 
 	return SRD_OK;
 }
@@ -394,6 +975,9 @@ SRD_PRIV struct srd_pd_callback *srd_pd_output_callback_find(
 	if (!sess)
 		return NULL;
 
+	if (output_type >= 0 && output_type <= SRD_OUTPUT_META)
+		return sess->callback_table[output_type];
+
 	pd_cb = NULL;
 	for (l = sess->callbacks; l; l = l->next) {
 		tmp = l->data;
@@ -28,6 +28,9 @@
 /* Python module search paths */
 SRD_PRIV GSList *searchpaths = NULL;
 
+/* Where startup time went, see srd_startup_times_get(). */
+SRD_PRIV struct srd_startup_times startup_times;
+
 /* session.c */
 extern SRD_PRIV GSList *sessions;
 extern SRD_PRIV int max_session_id;
@@ -221,6 +224,7 @@ SRD_API int srd_init(const char *path)
 	const char *const *sys_datadirs;
 	const char *env_path;
 	size_t i;
+	int64_t start;
 	int ret;
 
 	if (max_session_id != -1) {
@@ -228,6 +232,9 @@ SRD_API int srd_init(const char *path)
 		return SRD_ERR;
 	}
 
+	start = g_get_monotonic_time();
+	memset(&startup_times, 0, sizeof(startup_times));
+
 	print_versions();
 
 	srd_dbg("Initializing libsigrokdecode.");
@@ -287,6 +294,9 @@ SRD_API int srd_init(const char *path)
 
 	print_searchpaths();
 
+	startup_times.init = g_get_monotonic_time() - start;
+	srd_dbg("Initialized in %" PRId64 " us.", startup_times.init);
+
 	return SRD_OK;
 }
 
@@ -410,4 +420,29 @@ SRD_API GSList *srd_searchpaths_get(void)
 	return paths;
 }
 
+/**
+ * Get a report of where the time spent starting up went.
+ *
+ * The report covers srd_init(), srd_decoder_load_all() and the loading
+ * of individual decoders, which includes the import of decoders listed
+ * in an index once they are first instantiated. The times of each
+ * decoder are in its struct srd_decoder. With the log level set to
+ * SRD_LOG_DBG, the same times are logged as decoders get loaded.
+ *
+ * @param times Where to store the report. Must not be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ *
+ * @since 0.6.0
+ */
+SRD_API int srd_startup_times_get(struct srd_startup_times *times)
+{
+	if (!times)
+		return SRD_ERR_ARG;
+
+	*times = startup_times;
+
+	return SRD_OK;
+}
+
 /** @} */
@@ -86,6 +86,32 @@ START_TEST(test_init_exit_3)
 }
 END_TEST
 
+/*
+ * Check whether srd_startup_times_get() reports the time spent in
+ * srd_init() and srd_decoder_load_all().
+ * If it returns != SRD_OK, accepts NULL, reports no import time for a
+ * loaded decoder (or segfaults) this test will fail.
+ */
+START_TEST(test_startup_times_get)
+{
+	struct srd_startup_times times;
+	struct srd_decoder *dec;
+	int ret;
+
+	srd_init(DECODERS_TESTDIR);
+	fail_unless(srd_startup_times_get(NULL) == SRD_ERR_ARG);
+	srd_decoder_load("uart");
+	dec = srd_decoder_get_by_id("uart");
+	ret = srd_startup_times_get(&times);
+	fail_unless(ret == SRD_OK, "srd_startup_times_get() failed: %d.", ret);
+	fail_unless(times.init > 0);
+	fail_unless(dec->import_time > 0);
+	fail_unless(times.import >= dec->import_time);
+	fail_unless(times.metadata >= dec->metadata_time);
+	srd_exit();
+}
+END_TEST
+
 Suite *suite_core(void)
 {
 	Suite *s;
@@ -100,5 +126,10 @@ Suite *suite_core(void)
 	tcase_add_test(tc, test_init_exit_3);
 	suite_add_tcase(s, tc);
 
+	tc = tcase_create("startup_times");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_startup_times_get);
+	suite_add_tcase(s, tc);
+
 	return s;
 }
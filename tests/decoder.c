@@ -20,6 +20,8 @@
 #include <config.h>
 #include <libsigrokdecode.h> /* First, to avoid compiler warning. */
 #include <stdlib.h>
+#include <string.h>
+#include <glib/gstdio.h>
 #include <check.h>
 #include "lib.h"
 
@@ -132,6 +134,77 @@ START_TEST(test_load_multiple)
 }
 END_TEST
 
+/*
+ * Check whether srd_decoder_load_all() lists decoders from an index
+ * without importing them, and whether instantiating such a decoder
+ * imports it.
+ * If the decoder isn't listed with its metadata, gets imported early,
+ * or can be instantiated without a module (or segfaults) this test
+ * will fail.
+ */
+START_TEST(test_load_all_index)
+{
+	static const char index[] =
+		"[libsigrokdecode-index]\n"
+		"version=1\n"
+		"ignore=\n"
+		"[lazy_pd]\n"
+		"id=lazy\nname=Lazy\nlongname=Lazy decoder\n"
+		"desc=Not imported.\nlicense=gplv2+\n"
+		"inputs=logic;\noutputs=\ntags=\n"
+		"channels=data;\nchannel_names=DATA;\nchannel_descs=Data line;\n"
+		"optional_channels=\noptional_channel_names=\n"
+		"optional_channel_descs=\n"
+		"options=baudrate;\noption_descs=Baud rate;\n"
+		"option_defaults=int64 9600;\n"
+		"option_values=[<int64 9600>, <int64 115200>];\n"
+		"annotations=bit;byte;\nannotation_descs=Bit;Byte;\n"
+		"annotation_rows=bits;\nannotation_row_descs=Bits;\n"
+		"annotation_row_classes=0,1;\n"
+		"binary=\nbinary_descs=\n"
+		"logic_output_channels=\nlogic_output_channel_descs=\n";
+	struct srd_session *sess;
+	struct srd_decoder *dec;
+	struct srd_decoder_option *o;
+	struct srd_decoder_annotation_row *row;
+	char *dir, *pd_dir, *index_file;
+
+	dir = g_dir_make_tmp("srd-index-XXXXXX", NULL);
+	fail_unless(dir != NULL);
+	pd_dir = g_build_filename(dir, "lazy_pd", NULL);
+	index_file = g_build_filename(dir, "decoders.index", NULL);
+	fail_unless(g_mkdir(pd_dir, 0700) == 0);
+	fail_unless(g_file_set_contents(index_file, index, -1, NULL));
+
+	srd_init(dir);
+	srd_decoder_load_all();
+	dec = srd_decoder_get_by_id("lazy");
+	fail_unless(dec != NULL, "Indexed decoder not listed.");
+	fail_unless(dec->py_mod == NULL, "Indexed decoder was imported.");
+	fail_unless(!strcmp(dec->longname, "Lazy decoder"));
+	fail_unless(g_slist_length(dec->channels) == 1);
+	fail_unless(g_slist_length(dec->annotations) == 2);
+	o = dec->options->data;
+	fail_unless(!strcmp(o->id, "baudrate"));
+	fail_unless(g_variant_get_int64(o->def) == 9600);
+	fail_unless(g_slist_length(o->values) == 2);
+	row = dec->annotation_rows->data;
+	fail_unless(g_slist_length(row->ann_classes) == 2);
+
+	/* There is no module to import, so this must fail. */
+	srd_session_new(&sess);
+	fail_unless(srd_inst_new(sess, "lazy", NULL) == NULL);
+	srd_exit();
+
+	g_remove(index_file);
+	g_rmdir(pd_dir);
+	g_rmdir(dir);
+	g_free(index_file);
+	g_free(pd_dir);
+	g_free(dir);
+}
+END_TEST
+
 /*
  * Check whether srd_decoder_load() fails if a non-existing PD dir is used.
  * If it returns SRD_OK (or segfaults) this test will fail.
@@ -421,6 +494,25 @@ START_TEST(test_doc_get_null)
 }
 END_TEST
 
+/*
+ * Check whether srd_decoder_ann_text_get() fails for NULL and for
+ * unknown IDs.
+ * If it returns a value != NULL (or segfaults) this test will fail.
+ */
+START_TEST(test_ann_text_get_bogus)
+{
+	struct srd_decoder *dec;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+	dec = srd_decoder_get_by_id("uart");
+	fail_unless(srd_decoder_ann_text_get(NULL, 0) == NULL);
+	fail_unless(srd_decoder_ann_text_get(dec, 0) == NULL);
+	fail_unless(srd_decoder_ann_text_get(dec, 12345) == NULL);
+	srd_exit();
+}
+END_TEST
+
 Suite *suite_decoder(void)
 {
 	Suite *s;
@@ -438,6 +530,7 @@ Suite *suite_decoder(void)
 	tcase_add_test(tc, test_load_valid_and_bogus);
 	tcase_add_test(tc, test_load_multiple);
 	tcase_add_test(tc, test_load_nonexisting_pd_dir);
+	tcase_add_test(tc, test_load_all_index);
 	suite_add_tcase(s, tc);
 
 	tc = tcase_create("unload");
@@ -471,5 +564,9 @@ Suite *suite_decoder(void)
 	tcase_add_test(tc, test_doc_get_null);
 	suite_add_tcase(s, tc);
 
+	tc = tcase_create("ann_text_get");
+	tcase_add_test(tc, test_ann_text_get_bogus);
+	suite_add_tcase(s, tc);
+
 	return s;
 }
@@ -0,0 +1,49 @@
+##
+## This file is part of the libsigrokdecode project.
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 2 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, see <http://www.gnu.org/licenses/>.
+##
+
+
+import sigrokdecode as srd
+
+class Decoder(srd.Decoder):
+    api_version = 3
+    id = 'test_stack_batch'
+    name = 'Test stack batch'
+    longname = 'Test stacked decoding in batches'
+    desc = 'Report the items of the decoder below (unit tests only).'
+    license = 'gplv2+'
+    inputs = ['test_wait']
+    outputs = []
+    tags = ['Debug/trace']
+    annotations = (
+        ('item', 'Item'),
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def start(self):
+        self.out_ann = self.register(srd.OUTPUT_ANN)
+
+    def decode(self, ss, es, data):
+        raise Exception('Items must be passed to decode_batch().')
+
+    def decode_batch(self, items):
+        for ss, es, data in items:
+            self.put(ss, es, self.out_ann, [0, ['%d' % data]])
@@ -0,0 +1,134 @@
+##
+## This file is part of the libsigrokdecode project.
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 2 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, see <http://www.gnu.org/licenses/>.
+##
+
+
+from array import array
+import sigrokdecode as srd
+
+class Decoder(srd.Decoder):
+    api_version = 3
+    id = 'test_wait'
+    name = 'Test wait'
+    longname = 'Test wait conditions'
+    desc = 'Report the matches of wait conditions (unit tests only).'
+    license = 'gplv2+'
+    inputs = ['logic']
+    outputs = ['test_wait']
+    tags = ['Debug/trace']
+    channels = (
+        {'id': 'd0', 'name': 'D0', 'desc': 'Data line 0'},
+    )
+    optional_channels = (
+        {'id': 'd1', 'name': 'D1', 'desc': 'Data line 1'},
+    )
+    options = (
+        {'id': 'mode', 'desc': 'What to wait for', 'default': 'edge',
+            'values': ('edge', 'edges', 'skip', 'skip_edge', 'chunk',
+            'binary')},
+        {'id': 'skip', 'desc': 'Samples to skip', 'default': 37},
+        {'id': 'wait_many', 'desc': 'Matches per wait_many() call, or 0',
+            'default': 0},
+    )
+    annotations = (
+        ('match', 'Match'),
+        ('chunk', 'Chunk'),
+    )
+    binary = (
+        ('bytes', 'Bytes'),
+        ('bytearray', 'Bytearray'),
+        ('memoryview', 'Memoryview'),
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.chunk_start = None
+
+    def start(self):
+        self.out_python = self.register(srd.OUTPUT_PYTHON)
+        self.out_binary = self.register(srd.OUTPUT_BINARY)
+        self.out_ann = self.register(srd.OUTPUT_ANN)
+        self.buf = bytearray()
+
+    def conditions(self):
+        mode, skip = self.options['mode'], self.options['skip']
+        if mode == 'edges':
+            return [{0: 'e'}, {1: 'e'}]
+        elif mode == 'skip':
+            return [{'skip': skip}]
+        elif mode == 'skip_edge':
+            return [{0: 'e'}, {'skip': skip}]
+        elif mode == 'chunk':
+            return [{'skip': 1}]
+        return [{0: 'e'}]
+
+    def report(self, samplenum, pins, matched):
+        # Pins as '01' strings, only for the channels which are used.
+        pins = ''.join(str(p) for i, p in enumerate(pins)
+            if self.has_channel(i))
+        matched = ''.join('1' if m else '0' for m in matched)
+        self.put(samplenum, samplenum, self.out_ann,
+            [0, ['%d %s %s' % (samplenum, pins, matched)]])
+        self.put(samplenum, samplenum, self.out_python, samplenum)
+
+    def report_chunk(self, pins):
+        start, end, data, unitsize, channelmap, samplenums = self.chunk()
+        if start != self.chunk_start:
+            self.chunk_start = start
+            text = '%d-%d %d %d %d' % (start, end, unitsize, len(data),
+                sum(data))
+            if samplenums is not None:
+                text += ' %d' % sum(samplenums.cast('Q'))
+            self.put(start, end, self.out_ann, [1, [text]])
+        # The view must hold the sample value which wait() returned.
+        if samplenums is None:
+            ch = channelmap[0]
+            offset = (self.samplenum - start) * unitsize + ch // 8
+            if (data[offset] >> (ch % 8)) & 1 != pins[0]:
+                self.put(self.samplenum, self.samplenum, self.out_ann,
+                    [1, ['mismatch %d' % self.samplenum]])
+
+    def report_binary(self):
+        data = b'%d' % self.samplenum
+        ss = es = self.samplenum
+        self.put(ss, es, self.out_binary, [0, data])
+        # The bytearray gets reused, and overwritten after each put().
+        self.buf[:] = data
+        self.put(ss, es, self.out_binary, [1, self.buf])
+        self.buf[:] = b'x' * len(data)
+        self.put(ss, es, self.out_binary, [2, memoryview(data)])
+
+    def decode(self):
+        conds = self.conditions()
+        mode, max_matches = self.options['mode'], self.options['wait_many']
+        while True:
+            if max_matches:
+                matches = array('Q', self.wait_many(conds, max_matches))
+                for i in range(0, len(matches), 3):
+                    samplenum, pins, matched = matches[i:i + 3]
+                    self.report(samplenum,
+                        [(pins >> ch) & 1 for ch in range(2)],
+                        [(matched >> c) & 1 for c in range(len(conds))])
+                continue
+            pins = self.wait(conds)
+            if mode == 'chunk':
+                self.report_chunk(pins)
+            elif mode == 'binary':
+                self.report_binary()
+            else:
+                self.report(self.samplenum, pins, self.matched)
@@ -19,7 +19,11 @@
 
 #include <config.h>
 #include <libsigrokdecode.h> /* First, to avoid compiler warning. */
+#include <stdint.h>
+#include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
+#include <inttypes.h>
 #include <check.h>
 #include "lib.h"
 
@@ -140,6 +144,551 @@ START_TEST(test_inst_option_set_bogus)
 }
 END_TEST
 
+/*
+ * Check whether srd_inst_channel_gather_set() works.
+ * If it returns != SRD_OK (or segfaults) this test will fail.
+ */
+START_TEST(test_inst_channel_gather_set)
+{
+	int ret;
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+	srd_session_new(&sess);
+	inst = srd_inst_new(sess, "uart", NULL);
+
+	ret = srd_inst_channel_gather_set(inst, TRUE);
+	fail_unless(ret == SRD_OK, "Enabling the gather stage failed: %d.", ret);
+	ret = srd_inst_channel_gather_set(inst, FALSE);
+	fail_unless(ret == SRD_OK, "Disabling the gather stage failed: %d.", ret);
+
+	/* NULL instance. */
+	ret = srd_inst_channel_gather_set(NULL, TRUE);
+	fail_unless(ret != SRD_OK, "srd_inst_channel_gather_set() with NULL "
+			"instance failed: %d.", ret);
+
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether srd_inst_ann_class_enable() works, and rejects bogus input.
+ * If it returns != SRD_OK (or segfaults) this test will fail.
+ */
+START_TEST(test_inst_ann_class_enable)
+{
+	int ret;
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+	srd_session_new(&sess);
+	inst = srd_inst_new(sess, "uart", NULL);
+
+	ret = srd_inst_ann_class_enable(inst, 0, FALSE);
+	fail_unless(ret == SRD_OK, "Disabling class 0 failed: %d.", ret);
+	ret = srd_inst_ann_class_enable(inst, 0, TRUE);
+	fail_unless(ret == SRD_OK, "Enabling class 0 failed: %d.", ret);
+
+	/* NULL instance, invalid annotation classes. */
+	ret = srd_inst_ann_class_enable(NULL, 0, FALSE);
+	fail_unless(ret != SRD_OK, "NULL instance was accepted.");
+	ret = srd_inst_ann_class_enable(inst, -1, FALSE);
+	fail_unless(ret != SRD_OK, "Annotation class -1 was accepted.");
+	ret = srd_inst_ann_class_enable(inst, 12345, FALSE);
+	fail_unless(ret != SRD_OK, "Annotation class 12345 was accepted.");
+
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether srd_inst_stats_get() returns zeroed counters for a new
+ * instance, and rejects bogus input.
+ */
+START_TEST(test_inst_stats_get)
+{
+	int ret;
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+	struct srd_inst_stats stats;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+	srd_session_new(&sess);
+	inst = srd_inst_new(sess, "uart", NULL);
+
+	memset(&stats, 0xff, sizeof(stats));
+	ret = srd_inst_stats_get(inst, &stats);
+	fail_unless(ret == SRD_OK, "srd_inst_stats_get() failed: %d.", ret);
+	fail_unless(stats.wait_calls == 0, "New instance has wait calls.");
+	fail_unless(stats.samples_scanned == 0, "New instance has samples.");
+	fail_unless(stats.put_time == 0, "New instance has put time.");
+
+	ret = srd_inst_stats_get(NULL, &stats);
+	fail_unless(ret != SRD_OK, "NULL instance was accepted.");
+	ret = srd_inst_stats_get(inst, NULL);
+	fail_unless(ret != SRD_OK, "NULL stats was accepted.");
+
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Decode a capture with the test_wait decoder. Maps D1 to 'd1' unless
+ * that is -1. Returns the log of the decoder's output.
+ */
+static GString *decode_test_wait(const struct srdtest_capture *cap,
+		uint64_t chunk_len, const char *mode, int64_t wait_many,
+		int d0, int d1)
+{
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+	GString *log;
+	int ret;
+
+	log = g_string_new(NULL);
+	sess = srdtest_session_new(log);
+	inst = srdtest_inst_new(sess, "test_wait",
+		"mode", g_variant_new_string(mode),
+		"wait_many", g_variant_new_int64(wait_many), NULL);
+	fail_unless(inst != NULL, "Cannot instantiate test_wait.");
+	if (d1 == -1)
+		ret = srdtest_inst_channels_set(inst, "d0", d0, NULL);
+	else
+		ret = srdtest_inst_channels_set(inst, "d0", d0, "d1", d1, NULL);
+	fail_unless(ret == SRD_OK, "Cannot set channels: %d.", ret);
+	ret = srdtest_session_run(sess, cap, chunk_len);
+	fail_unless(ret == SRD_OK, "Decoding failed: %d.", ret);
+	srd_session_destroy(sess);
+
+	return log;
+}
+
+/*
+ * Decode a capture with the UART decoder, RX on input channel 'rx', and
+ * TX on 'tx' unless that is -1. Returns the log of the decoder's output.
+ */
+static GString *decode_uart(const struct srdtest_capture *cap,
+		uint64_t chunk_len, int rx, int tx, gboolean gather)
+{
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+	GString *log;
+	int ret;
+
+	log = g_string_new(NULL);
+	sess = srdtest_session_new(log);
+	inst = srdtest_inst_new(sess, "uart",
+		"baudrate", g_variant_new_int64(SRDTEST_UART_BAUDRATE), NULL);
+	fail_unless(inst != NULL, "Cannot instantiate uart.");
+	if (tx == -1)
+		ret = srdtest_inst_channels_set(inst, "rx", rx, NULL);
+	else
+		ret = srdtest_inst_channels_set(inst, "rx", rx, "tx", tx, NULL);
+	fail_unless(ret == SRD_OK, "Cannot set channels: %d.", ret);
+	ret = srd_inst_channel_gather_set(inst, gather);
+	fail_unless(ret == SRD_OK, "Cannot set the gather stage: %d.", ret);
+	ret = srdtest_session_run(sess, cap, chunk_len);
+	fail_unless(ret == SRD_OK, "Decoding failed: %d.", ret);
+	srd_session_destroy(sess);
+
+	return log;
+}
+
+/*
+ * Check whether matching the conditions with bitmasks yields the same
+ * results as checking the terms one by one. The latter is forced with
+ * an input channel beyond the 64th bit, or with two decoder channels on
+ * the same input channel.
+ * If the results differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_condition_masks)
+{
+	struct srdtest_capture *cap;
+	GString *ref, *log;
+	const int channels[] = { 2, 10, 66, -1 };
+	int ch;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+
+	cap = srdtest_uart_capture(40, 9, channels);
+	for (ch = 0; ch < 72; ch++) {
+		if (ch != 2 && ch != 10 && ch != 66)
+			srdtest_capture_noise(cap, ch);
+	}
+
+	ref = decode_uart(cap, 1000, 2, -1, FALSE);
+	fail_unless(ref->len > 0, "No annotations.");
+	log = decode_uart(cap, 1000, 66, -1, FALSE);
+	fail_unless(!strcmp(log->str, ref->str),
+		"Input channel 66 yields different annotations.");
+	g_string_free(log, TRUE);
+	g_string_free(ref, TRUE);
+
+	/* Channels 2 and 10 carry the same signal. */
+	ref = decode_uart(cap, 1000, 2, 10, FALSE);
+	log = decode_uart(cap, 1000, 2, 2, FALSE);
+	fail_unless(!strcmp(log->str, ref->str),
+		"Shared input channels yield different annotations.");
+	g_string_free(log, TRUE);
+	g_string_free(ref, TRUE);
+
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether the gather stage leaves the decoder output unchanged, with
+ * the decoder channels spread over several bytes of each sample.
+ * If the results differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_channel_gather_decode)
+{
+	struct srdtest_capture *cap;
+	GString *ref, *log;
+	const int channels[] = { 3, 19, -1 };
+	const uint64_t chunk_lens[] = { 1000, 77 };
+	unsigned int i;
+	int ch;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+
+	cap = srdtest_uart_capture(40, 3, channels);
+	for (ch = 0; ch < 24; ch++) {
+		if (ch != 3 && ch != 19)
+			srdtest_capture_noise(cap, ch);
+	}
+
+	for (i = 0; i < G_N_ELEMENTS(chunk_lens); i++) {
+		ref = decode_uart(cap, chunk_lens[i], 19, 3, FALSE);
+		fail_unless(ref->len > 0, "No annotations.");
+		log = decode_uart(cap, chunk_lens[i], 19, 3, TRUE);
+		fail_unless(!strcmp(log->str, ref->str), "The gather stage "
+			"changes the annotations (chunk length %" PRIu64 ").",
+			chunk_lens[i]);
+		g_string_free(log, TRUE);
+		g_string_free(ref, TRUE);
+	}
+
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether jumping over samples where no watched channel changes
+ * finds the same edges as the sample by sample scan. The edges are next
+ * to and on 64bit word boundaries, chunk boundaries and the last samples
+ * of chunks, and the watched channel is the top bit of the sample.
+ * If an edge gets missed, or is found twice (or something segfaults)
+ * this test will fail.
+ */
+START_TEST(test_inst_next_change)
+{
+	struct srdtest_capture *cap;
+	GString *log, *expected, *expected_shared;
+	const uint64_t changes[] = { 1, 7, 8, 9, 15, 16, 17, 63, 64, 65, 127,
+		128, 199, 200, 201, 255, 256, 399, 400, 401, 520, 599 };
+	const unsigned int unitsizes[] = { 1, 2, 3, 4, 8 };
+	unsigned int i, j;
+	int ch, level;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+
+	for (i = 0; i < G_N_ELEMENTS(unitsizes); i++) {
+		cap = srdtest_capture_new(600, unitsizes[i]);
+		ch = 8 * unitsizes[i] - 1;
+		expected = g_string_new(NULL);
+		expected_shared = g_string_new(NULL);
+		level = 0;
+		for (j = 0; j < G_N_ELEMENTS(changes); j++) {
+			level = !level;
+			srdtest_capture_set(cap, ch, changes[j], 600, level);
+			g_string_append_printf(expected, "%" PRIu64 "-%" PRIu64
+				" 0 %" PRIu64 " %d 1\n", changes[j], changes[j],
+				changes[j], level);
+			g_string_append_printf(expected_shared, "%" PRIu64 "-%"
+				PRIu64 " 0 %" PRIu64 " %d%d 1\n", changes[j],
+				changes[j], changes[j], level, level);
+		}
+		for (j = 0; j < (unsigned int)ch; j++)
+			srdtest_capture_noise(cap, j);
+
+		/* Sharing the input channel forces the sample by sample scan. */
+		log = decode_test_wait(cap, 200, "edge", 0, ch, -1);
+		fail_unless(!strcmp(log->str, expected->str), "Unexpected "
+			"matches with unitsize %u:\n%s", unitsizes[i], log->str);
+		g_string_free(log, TRUE);
+		log = decode_test_wait(cap, 200, "edge", 0, ch, ch);
+		fail_unless(!strcmp(log->str, expected_shared->str), "Unexpected "
+			"matches with unitsize %u:\n%s", unitsizes[i], log->str);
+		g_string_free(log, TRUE);
+
+		g_string_free(expected, TRUE);
+		g_string_free(expected_shared, TRUE);
+		srdtest_capture_free(cap);
+	}
+
+	srd_exit();
+}
+END_TEST
+
+/* Reduce a log of test_wait matches to their sample numbers and conditions. */
+static GString *strip_pins(const GString *log)
+{
+	GString *res;
+	gchar **lines;
+	char samplenum[32], matched[32];
+	unsigned int i;
+
+	res = g_string_new(NULL);
+	lines = g_strsplit(log->str, "\n", 0);
+	for (i = 0; lines[i]; i++) {
+		if (sscanf(lines[i], "%*s %*d %31s %*s %31s", samplenum, matched) == 2)
+			g_string_append_printf(res, "%s %s\n", samplenum, matched);
+	}
+	g_strfreev(lines);
+
+	return res;
+}
+
+/*
+ * Check whether skip conditions, alone and ORed with an edge condition,
+ * match at the same samples when they carry across chunk boundaries, as
+ * with the sample by sample scan (which counts skipped samples the way
+ * it always did).
+ * If the matches differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_skip_chunks)
+{
+	struct srdtest_capture *cap;
+	GString *log, *ref, *matches, *ref_matches;
+	const uint64_t changes[] = { 45, 100, 101, 180, 333, 499 };
+	const uint64_t chunk_lens[] = { 500, 50, 13, 1 };
+	const char *modes[] = { "skip", "skip_edge" };
+	unsigned int i, j;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+
+	cap = srdtest_capture_new(500, 1);
+	for (i = 0; i < G_N_ELEMENTS(changes); i++)
+		srdtest_capture_set(cap, 0, changes[i], 500, !(i & 1));
+
+	for (i = 0; i < G_N_ELEMENTS(modes); i++) {
+		/* Sharing the input channel forces the sample by sample scan. */
+		ref = decode_test_wait(cap, 500, modes[i], 0, 0, 0);
+		ref_matches = strip_pins(ref);
+		fail_unless(ref_matches->len > 0, "No matches in mode %s.",
+			modes[i]);
+		for (j = 0; j < G_N_ELEMENTS(chunk_lens); j++) {
+			log = decode_test_wait(cap, chunk_lens[j], modes[i], 0, 0, -1);
+			matches = strip_pins(log);
+			fail_unless(!strcmp(matches->str, ref_matches->str),
+				"Mode %s, chunks of %" PRIu64 " samples: got\n%s"
+				"expected\n%s", modes[i], chunk_lens[j],
+				matches->str, ref_matches->str);
+			g_string_free(matches, TRUE);
+			g_string_free(log, TRUE);
+			log = decode_test_wait(cap, chunk_lens[j], modes[i], 0, 0, 0);
+			fail_unless(!strcmp(log->str, ref->str), "Mode %s, chunks "
+				"of %" PRIu64 " samples differ from a single chunk.",
+				modes[i], chunk_lens[j]);
+			g_string_free(log, TRUE);
+		}
+		g_string_free(ref_matches, TRUE);
+		g_string_free(ref, TRUE);
+	}
+
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether Decoder.wait_many() returns the same matches as repeated
+ * Decoder.wait() calls: sample numbers, pin values and matched conditions.
+ * If the matches differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_wait_many)
+{
+	struct srdtest_capture *cap;
+	GString *ref, *log;
+	const int channels[] = { 0, 9, -1 };
+	const char *modes[] = { "edges", "skip_edge" };
+	const int64_t max_matches[] = { 1, 3, 1000 };
+	unsigned int i, j;
+	int ch;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+
+	cap = srdtest_uart_capture(20, 2, channels);
+	for (ch = 1; ch < 8; ch++)
+		srdtest_capture_noise(cap, ch);
+
+	for (i = 0; i < G_N_ELEMENTS(modes); i++) {
+		ref = decode_test_wait(cap, 128, modes[i], 0, 0, 9);
+		fail_unless(ref->len > 0, "No matches in mode %s.", modes[i]);
+		for (j = 0; j < G_N_ELEMENTS(max_matches); j++) {
+			log = decode_test_wait(cap, 128, modes[i],
+				max_matches[j], 0, 9);
+			fail_unless(!strcmp(log->str, ref->str), "wait_many(%"
+				PRId64 ") differs from wait() in mode %s.",
+				max_matches[j], modes[i]);
+			g_string_free(log, TRUE);
+		}
+		g_string_free(ref, TRUE);
+	}
+
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether Decoder.chunk() returns the chunk which holds the current
+ * sample: its sample range, unitsize and data, and whether the data holds
+ * the pin value which wait() returned.
+ * If the chunks differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_chunk)
+{
+	struct srdtest_capture *cap;
+	GString *log, *expected;
+	const uint64_t chunk_len = 100;
+	uint64_t start, end, i, sum;
+	int ch;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+
+	cap = srdtest_capture_new(600, 2);
+	for (ch = 0; ch < 16; ch++)
+		srdtest_capture_noise(cap, ch);
+
+	expected = g_string_new(NULL);
+	for (start = 0; start < cap->num_samples; start = end) {
+		end = MIN(start + chunk_len, cap->num_samples);
+		sum = 0;
+		for (i = start * cap->unitsize; i < end * cap->unitsize; i++)
+			sum += cap->samples[i];
+		g_string_append_printf(expected, "%" PRIu64 "-%" PRIu64 " 1 %"
+			PRIu64 "-%" PRIu64 " %u %" PRIu64 " %" PRIu64 "\n",
+			start, end, start, end, cap->unitsize,
+			(end - start) * cap->unitsize, sum);
+	}
+
+	log = decode_test_wait(cap, chunk_len, "chunk", 0, 9, -1);
+	fail_unless(!strcmp(log->str, expected->str),
+		"Got\n%sexpected\n%s", log->str, expected->str);
+	g_string_free(log, TRUE);
+
+	g_string_free(expected, TRUE);
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether the pins and matched tuples which wait() returns hold the
+ * values of the matching sample, also when a tuple gets reused for the
+ * same values.
+ * If the values differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_wait_pins)
+{
+	struct srdtest_capture *cap;
+	GString *log, *expected;
+	const uint64_t chunk_lens[] = { 100, 1 };
+	uint64_t sn;
+	unsigned int i;
+	int ch, d0, d1, e0, e1;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+
+	cap = srdtest_capture_new(400, 2);
+	for (ch = 0; ch < 16; ch++)
+		srdtest_capture_noise(cap, ch);
+
+	expected = g_string_new(NULL);
+	for (sn = 1; sn < cap->num_samples; sn++) {
+		d0 = srdtest_capture_get(cap, 0, sn);
+		d1 = srdtest_capture_get(cap, 9, sn);
+		e0 = d0 != srdtest_capture_get(cap, 0, sn - 1);
+		e1 = d1 != srdtest_capture_get(cap, 9, sn - 1);
+		if (!e0 && !e1)
+			continue;
+		g_string_append_printf(expected, "%" PRIu64 "-%" PRIu64
+			" 0 %" PRIu64 " %d%d %d%d\n", sn, sn, sn, d0, d1,
+			e0, e1);
+	}
+
+	for (i = 0; i < G_N_ELEMENTS(chunk_lens); i++) {
+		log = decode_test_wait(cap, chunk_lens[i], "edges", 0, 0, 9);
+		fail_unless(!strcmp(log->str, expected->str), "Chunks of %"
+			PRIu64 " samples: got\n%sexpected\n%s", chunk_lens[i],
+			log->str, expected->str);
+		g_string_free(log, TRUE);
+	}
+
+	g_string_free(expected, TRUE);
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether binary output from bytes, bytearray and memoryview objects
+ * gets delivered with the data the decoder put, in the order it was put.
+ * If the output differs (or something segfaults) this test will fail.
+ */
+START_TEST(test_inst_output_binary)
+{
+	struct srdtest_capture *cap;
+	GString *log, *expected;
+	const uint64_t changes[] = { 5, 40, 199, 200, 201, 350, 599 };
+	const uint64_t chunk_lens[] = { 600, 200, 7 };
+	unsigned int i, bin_class;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+
+	cap = srdtest_capture_new(600, 1);
+	expected = g_string_new(NULL);
+	for (i = 0; i < G_N_ELEMENTS(changes); i++) {
+		srdtest_capture_set(cap, 0, changes[i], 600, !(i & 1));
+		/* The bytearray gets overwritten right after it was put. */
+		for (bin_class = 0; bin_class < 3; bin_class++) {
+			g_string_append_printf(expected, "%" PRIu64 "-%" PRIu64
+				" b%u %" PRIu64 "\n", changes[i], changes[i],
+				bin_class, changes[i]);
+		}
+	}
+
+	for (i = 0; i < G_N_ELEMENTS(chunk_lens); i++) {
+		log = decode_test_wait(cap, chunk_lens[i], "binary", 0, 0, -1);
+		fail_unless(!strcmp(log->str, expected->str), "Chunks of %"
+			PRIu64 " samples: got\n%sexpected\n%s", chunk_lens[i],
+			log->str, expected->str);
+		g_string_free(log, TRUE);
+	}
+
+	g_string_free(expected, TRUE);
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
 Suite *suite_inst(void)
 {
 	Suite *s;
@@ -159,5 +708,36 @@ Suite *suite_inst(void)
 	tcase_add_test(tc, test_inst_option_set_bogus);
 	suite_add_tcase(s, tc);
 
+	tc = tcase_create("ann_class");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_inst_ann_class_enable);
+	suite_add_tcase(s, tc);
+
+	tc = tcase_create("stats");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_inst_stats_get);
+	suite_add_tcase(s, tc);
+
+	tc = tcase_create("wait");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_inst_wait_many);
+	tcase_add_test(tc, test_inst_condition_masks);
+	tcase_add_test(tc, test_inst_next_change);
+	tcase_add_test(tc, test_inst_skip_chunks);
+	tcase_add_test(tc, test_inst_chunk);
+	tcase_add_test(tc, test_inst_wait_pins);
+	suite_add_tcase(s, tc);
+
+	tc = tcase_create("output");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_inst_output_binary);
+	suite_add_tcase(s, tc);
+
+	tc = tcase_create("channel");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_inst_channel_gather_set);
+	tcase_add_test(tc, test_inst_channel_gather_decode);
+	suite_add_tcase(s, tc);
+
 	return s;
 }
@@ -20,9 +20,40 @@
 #ifndef LIBSIGROKDECODE_TESTS_LIB_H
 #define LIBSIGROKDECODE_TESTS_LIB_H
 
+/* Sample rate of the captures which the tests decode. */
+#define SRDTEST_SAMPLERATE 1000000
+
+/* UART frames at 100 kbaud, i.e. 10 samples per bit. */
+#define SRDTEST_UART_BAUDRATE 100000
+
+/* Logic samples which the tests feed to decoders. */
+struct srdtest_capture {
+	uint8_t *samples;
+	uint64_t num_samples;
+	unsigned int unitsize;
+};
+
 void srdtest_setup(void);
 void srdtest_teardown(void);
 
+struct srdtest_capture *srdtest_capture_new(uint64_t num_samples,
+		unsigned int unitsize);
+void srdtest_capture_free(struct srdtest_capture *cap);
+void srdtest_capture_set(struct srdtest_capture *cap, int channel,
+		uint64_t start, uint64_t end, int value);
+int srdtest_capture_get(const struct srdtest_capture *cap, int channel,
+		uint64_t samplenum);
+void srdtest_capture_noise(struct srdtest_capture *cap, int channel);
+struct srdtest_capture *srdtest_uart_capture(unsigned int num_bytes,
+		unsigned int unitsize, const int *channels);
+struct srd_decoder_inst *srdtest_inst_new(struct srd_session *sess,
+		const char *decoder_id, ...);
+int srdtest_inst_channels_set(struct srd_decoder_inst *di, ...);
+struct srd_session *srdtest_session_new(GString *log);
+int srdtest_session_start(struct srd_session *sess);
+int srdtest_session_run(struct srd_session *sess,
+		const struct srdtest_capture *cap, uint64_t chunk_len);
+
 Suite *suite_core(void);
 Suite *suite_decoder(void);
 Suite *suite_inst(void);
@@ -19,7 +19,10 @@
 
 #include <config.h>
 #include <libsigrokdecode.h> /* First, to avoid compiler warning. */
+#include <stdarg.h>
+#include <stdint.h>
 #include <stdlib.h>
+#include <inttypes.h>
 #include <check.h>
 #include "lib.h"
 
@@ -33,6 +36,245 @@ void srdtest_teardown(void)
 {
 }
 
+/* Create a capture with all channels low. */
+struct srdtest_capture *srdtest_capture_new(uint64_t num_samples,
+		unsigned int unitsize)
+{
+	struct srdtest_capture *cap;
+
+	cap = g_malloc(sizeof(struct srdtest_capture));
+	cap->samples = g_malloc0(num_samples * unitsize);
+	cap->num_samples = num_samples;
+	cap->unitsize = unitsize;
+
+	return cap;
+}
+
+void srdtest_capture_free(struct srdtest_capture *cap)
+{
+	g_free(cap->samples);
+	g_free(cap);
+}
+
+/* Set a channel to a value, from sample 'start' up to sample 'end' - 1. */
+void srdtest_capture_set(struct srdtest_capture *cap, int channel,
+		uint64_t start, uint64_t end, int value)
+{
+	uint8_t *pos;
+	uint64_t i;
+
+	end = MIN(end, cap->num_samples);
+	for (i = start; i < end; i++) {
+		pos = cap->samples + i * cap->unitsize + channel / 8;
+		if (value)
+			*pos |= 1 << (channel % 8);
+		else
+			*pos &= ~(1 << (channel % 8));
+	}
+}
+
+int srdtest_capture_get(const struct srdtest_capture *cap, int channel,
+		uint64_t samplenum)
+{
+	const uint8_t *pos;
+
+	pos = cap->samples + samplenum * cap->unitsize + channel / 8;
+
+	return (*pos >> (channel % 8)) & 1;
+}
+
+/* Toggle a channel every few samples, the period depends on the channel. */
+void srdtest_capture_noise(struct srdtest_capture *cap, int channel)
+{
+	uint64_t i, period;
+
+	period = 3 + channel % 5;
+	for (i = 0; i < cap->num_samples; i += period)
+		srdtest_capture_set(cap, channel, i, i + period, (i / period) & 1);
+}
+
+/* Samples of idle line (high) before a UART byte. */
+static uint64_t uart_idle_len(unsigned int byte)
+{
+	return 20 + (byte * 97) % 400;
+}
+
+/*
+ * Create a capture of UART bytes (8N1, SRDTEST_UART_BAUDRATE), with idle
+ * stretches of varying length in between. The same bytes appear on all
+ * channels in the -1 terminated list 'channels', the other channels are
+ * low.
+ */
+struct srdtest_capture *srdtest_uart_capture(unsigned int num_bytes,
+		unsigned int unitsize, const int *channels)
+{
+	struct srdtest_capture *cap;
+	uint64_t num_samples, pos;
+	unsigned int byte, bit, value, spb;
+	int level;
+	const int *ch;
+
+	spb = SRDTEST_SAMPLERATE / SRDTEST_UART_BAUDRATE;
+	num_samples = 0;
+	for (byte = 0; byte < num_bytes; byte++)
+		num_samples += uart_idle_len(byte) + 10 * spb;
+	num_samples += uart_idle_len(num_bytes);
+
+	cap = srdtest_capture_new(num_samples, unitsize);
+	for (ch = channels; *ch != -1; ch++) {
+		pos = 0;
+		for (byte = 0; byte < num_bytes; byte++) {
+			srdtest_capture_set(cap, *ch, pos,
+				pos + uart_idle_len(byte), 1);
+			pos += uart_idle_len(byte);
+			value = (byte * 37 + 5) & 0xff;
+			/* Start bit, data bits (LSB first), stop bit. */
+			for (bit = 0; bit < 10; bit++) {
+				if (bit == 0)
+					level = 0;
+				else if (bit == 9)
+					level = 1;
+				else
+					level = (value >> (bit - 1)) & 1;
+				srdtest_capture_set(cap, *ch, pos, pos + spb, level);
+				pos += spb;
+			}
+		}
+		srdtest_capture_set(cap, *ch, pos, num_samples, 1);
+	}
+
+	return cap;
+}
+
+/*
+ * Create a decoder instance. The decoder ID is followed by pairs of
+ * option names and GVariant values, terminated by NULL.
+ */
+struct srd_decoder_inst *srdtest_inst_new(struct srd_session *sess,
+		const char *decoder_id, ...)
+{
+	struct srd_decoder_inst *di;
+	GHashTable *options;
+	const char *key;
+	va_list args;
+
+	options = g_hash_table_new_full(g_str_hash, g_str_equal, g_free,
+			(GDestroyNotify)g_variant_unref);
+	va_start(args, decoder_id);
+	while ((key = va_arg(args, const char *))) {
+		g_hash_table_insert(options, g_strdup(key),
+			g_variant_ref_sink(va_arg(args, GVariant *)));
+	}
+	va_end(args);
+
+	di = srd_inst_new(sess, decoder_id, options);
+	g_hash_table_destroy(options);
+
+	return di;
+}
+
+/*
+ * Map the channels of a decoder instance. The instance is followed by
+ * pairs of channel IDs and (int) input channel numbers, terminated by NULL.
+ */
+int srdtest_inst_channels_set(struct srd_decoder_inst *di, ...)
+{
+	GHashTable *channels;
+	const char *id;
+	va_list args;
+	int ret;
+
+	channels = g_hash_table_new_full(g_str_hash, g_str_equal, g_free,
+			(GDestroyNotify)g_variant_unref);
+	va_start(args, di);
+	while ((id = va_arg(args, const char *))) {
+		g_hash_table_insert(channels, g_strdup(id),
+			g_variant_ref_sink(g_variant_new_int32(va_arg(args, int))));
+	}
+	va_end(args);
+
+	ret = srd_inst_channel_set_all(di, channels);
+	g_hash_table_destroy(channels);
+
+	return ret;
+}
+
+/* Log annotations and binary output, one line per item. */
+static void srdtest_output_cb(struct srd_proto_data *pdata, void *cb_data)
+{
+	GString *log;
+	struct srd_proto_data_annotation *pda;
+	struct srd_proto_data_binary *pdb;
+
+	log = cb_data;
+	g_string_append_printf(log, "%" PRIu64 "-%" PRIu64 " ",
+		pdata->start_sample, pdata->end_sample);
+
+	switch (pdata->pdo->output_type) {
+	case SRD_OUTPUT_ANN:
+		pda = pdata->data;
+		g_string_append_printf(log, "%d %s\n", pda->ann_class,
+			pda->ann_text[0]);
+		break;
+	case SRD_OUTPUT_BINARY:
+		pdb = pdata->data;
+		g_string_append_printf(log, "b%d %.*s\n", pdb->bin_class,
+			(int)pdb->size, (const char *)pdb->data);
+		break;
+	}
+}
+
+/* Create a session which logs all annotations and binary output. */
+struct srd_session *srdtest_session_new(GString *log)
+{
+	struct srd_session *sess;
+
+	if (srd_session_new(&sess) != SRD_OK)
+		return NULL;
+	srd_pd_output_callback_add(sess, SRD_OUTPUT_ANN, srdtest_output_cb, log);
+	srd_pd_output_callback_add(sess, SRD_OUTPUT_BINARY, srdtest_output_cb, log);
+
+	return sess;
+}
+
+/* Set the sample rate of a session, and start it. */
+int srdtest_session_start(struct srd_session *sess)
+{
+	int ret;
+
+	ret = srd_session_metadata_set(sess, SRD_CONF_SAMPLERATE,
+		g_variant_new_uint64(SRDTEST_SAMPLERATE));
+	if (ret != SRD_OK)
+		return ret;
+
+	return srd_session_start(sess);
+}
+
+/*
+ * Start a session and send a capture in chunks of 'chunk_len' samples.
+ * Returns when all chunks were handled.
+ */
+int srdtest_session_run(struct srd_session *sess,
+		const struct srdtest_capture *cap, uint64_t chunk_len)
+{
+	uint64_t start, end;
+	int ret;
+
+	if ((ret = srdtest_session_start(sess)) != SRD_OK)
+		return ret;
+
+	for (start = 0; start < cap->num_samples; start = end) {
+		end = MIN(start + chunk_len, cap->num_samples);
+		ret = srd_session_send(sess, start, end,
+			cap->samples + start * cap->unitsize,
+			(end - start) * cap->unitsize, cap->unitsize);
+		if (ret != SRD_OK)
+			return ret;
+	}
+
+	return srd_session_sync(sess);
+}
+
 int main(void)
 {
 	int ret;
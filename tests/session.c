@@ -22,6 +22,8 @@
 #include <libsigrokdecode.h>
 #include <stdint.h>
 #include <stdlib.h>
+#include <string.h>
+#include <inttypes.h>
 #include <check.h>
 #include "lib.h"
 
@@ -260,6 +262,454 @@ START_TEST(test_session_reset_nodata)
 }
 END_TEST
 
+/*
+ * Check whether srd_session_send_transitions() fails with invalid input.
+ * If it returns SRD_OK (or segfaults) this test will fail.
+ */
+START_TEST(test_session_send_transitions_bogus)
+{
+	int ret;
+	struct srd_session *sess;
+	uint64_t samplenums[] = { 0, 10, 20 };
+	uint8_t values[] = { 0x00, 0x01, 0x00 };
+
+	srd_init(NULL);
+	srd_session_new(&sess);
+
+	/* NULL session. */
+	ret = srd_session_send_transitions(NULL, 0, 100, samplenums, values, 3, 1);
+	fail_unless(ret != SRD_OK, "srd_session_send_transitions(NULL) worked.");
+
+	/* NULL sample numbers or values. */
+	ret = srd_session_send_transitions(sess, 0, 100, NULL, values, 3, 1);
+	fail_unless(ret != SRD_OK, "NULL sample numbers were accepted.");
+	ret = srd_session_send_transitions(sess, 0, 100, samplenums, NULL, 3, 1);
+	fail_unless(ret != SRD_OK, "NULL values were accepted.");
+
+	/* Empty list of transitions, unitsize 0. */
+	ret = srd_session_send_transitions(sess, 0, 100, samplenums, values, 0, 1);
+	fail_unless(ret != SRD_OK, "Empty list of transitions was accepted.");
+	ret = srd_session_send_transitions(sess, 0, 100, samplenums, values, 3, 0);
+	fail_unless(ret != SRD_OK, "Unitsize 0 was accepted.");
+
+	srd_session_destroy(sess);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Send a capture as lists of transitions, in calls of 'chunk_len' samples.
+ * Every call starts with a transition, also where the value doesn't change.
+ */
+static int send_transitions(struct srd_session *sess,
+		const struct srdtest_capture *cap, uint64_t chunk_len)
+{
+	uint64_t start, end, i, num, *samplenums;
+	uint8_t *values;
+	const uint8_t *sample;
+	unsigned int unitsize;
+	int ret;
+
+	unitsize = cap->unitsize;
+	for (start = 0; start < cap->num_samples; start = end) {
+		end = MIN(start + chunk_len, cap->num_samples);
+		samplenums = g_malloc((end - start) * sizeof(uint64_t));
+		values = g_malloc((end - start) * unitsize);
+		num = 0;
+		for (i = start; i < end; i++) {
+			sample = cap->samples + i * unitsize;
+			if (i > start && !memcmp(sample, sample - unitsize, unitsize))
+				continue;
+			samplenums[num] = i;
+			memcpy(values + num * unitsize, sample, unitsize);
+			num++;
+		}
+		ret = srd_session_send_transitions(sess, start, end,
+			samplenums, values, num, unitsize);
+		g_free(samplenums);
+		g_free(values);
+		if (ret != SRD_OK)
+			return ret;
+	}
+
+	return srd_session_sync(sess);
+}
+
+/*
+ * Check whether decoding a capture sent as transitions yields the same
+ * annotations as sending every sample. Call boundaries fall into the
+ * middle of runs of unchanged samples.
+ * If the annotations differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_session_send_transitions)
+{
+	struct srdtest_capture *cap;
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+	GString *log, *ref;
+	const int channels[] = { 0, -1 };
+	const uint64_t chunk_lens[] = { 1000, 333, 100000 };
+	unsigned int i;
+	int ret;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+
+	cap = srdtest_uart_capture(30, 1, channels);
+	/* A run of equal samples spans the first call boundary. */
+	fail_unless(srdtest_capture_get(cap, 0, 999) ==
+		srdtest_capture_get(cap, 0, 1000));
+
+	for (i = 0; i < G_N_ELEMENTS(chunk_lens); i++) {
+		ref = g_string_new(NULL);
+		sess = srdtest_session_new(ref);
+		inst = srdtest_inst_new(sess, "uart", "baudrate",
+			g_variant_new_int64(SRDTEST_UART_BAUDRATE), NULL);
+		srdtest_inst_channels_set(inst, "rx", 0, NULL);
+		ret = srdtest_session_run(sess, cap, chunk_lens[i]);
+		fail_unless(ret == SRD_OK, "srd_session_send() failed: %d.", ret);
+		srd_session_destroy(sess);
+		fail_unless(ref->len > 0, "No annotations.");
+
+		log = g_string_new(NULL);
+		sess = srdtest_session_new(log);
+		inst = srdtest_inst_new(sess, "uart", "baudrate",
+			g_variant_new_int64(SRDTEST_UART_BAUDRATE), NULL);
+		srdtest_inst_channels_set(inst, "rx", 0, NULL);
+		fail_unless(srdtest_session_start(sess) == SRD_OK);
+		ret = send_transitions(sess, cap, chunk_lens[i]);
+		fail_unless(ret == SRD_OK, "srd_session_send_transitions() "
+			"failed: %d.", ret);
+		srd_session_destroy(sess);
+
+		fail_unless(!strcmp(log->str, ref->str), "Transitions in "
+			"chunks of %" PRIu64 " samples yield different "
+			"annotations.", chunk_lens[i]);
+		g_string_free(log, TRUE);
+		g_string_free(ref, TRUE);
+	}
+
+	srdtest_capture_free(cap);
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether srd_session_chunk_queue_depth_set() and srd_session_sync()
+ * work, and reject bogus input.
+ */
+START_TEST(test_session_chunk_queue_depth)
+{
+	int ret;
+	struct srd_session *sess;
+
+	srd_init(NULL);
+	srd_session_new(&sess);
+
+	ret = srd_session_chunk_queue_depth_set(sess, 4);
+	fail_unless(ret == SRD_OK, "Setting a depth of 4 failed: %d.", ret);
+	ret = srd_session_sync(sess);
+	fail_unless(ret == SRD_OK, "srd_session_sync() failed: %d.", ret);
+
+	/* Depth 0, NULL session. */
+	ret = srd_session_chunk_queue_depth_set(sess, 0);
+	fail_unless(ret != SRD_OK, "A depth of 0 was accepted.");
+	ret = srd_session_chunk_queue_depth_set(NULL, 4);
+	fail_unless(ret != SRD_OK, "NULL session was accepted.");
+	ret = srd_session_sync(NULL);
+	fail_unless(ret != SRD_OK, "srd_session_sync(NULL) worked.");
+
+	srd_session_destroy(sess);
+	srd_exit();
+}
+END_TEST
+
+static void ann_count_cb(struct srd_proto_data *pdata,
+		unsigned int num_pdata, void *cb_data)
+{
+	unsigned int *num_anns = cb_data;
+
+	(void)pdata;
+	*num_anns += num_pdata;
+}
+
+/*
+ * Decode UART bytes in several chunks with the given queue depth. Returns
+ * the number of annotations delivered when srd_session_sync() returned,
+ * and in 'num_total' the number delivered by the end of the session.
+ */
+static unsigned int decode_uart_chunks(unsigned int depth,
+		unsigned int *num_total)
+{
+	struct srdtest_capture *cap;
+	struct srd_session *sess;
+	struct srd_decoder_inst *inst;
+	const int channels[] = { 0, -1 };
+	unsigned int num_anns, num_synced;
+
+	cap = srdtest_uart_capture(64, 1, channels);
+
+	srd_session_new(&sess);
+	srd_session_chunk_queue_depth_set(sess, depth);
+	num_anns = 0;
+	srd_pd_output_callback_add_batch(sess, SRD_OUTPUT_ANN,
+			ann_count_cb, &num_anns);
+	inst = srdtest_inst_new(sess, "uart", "baudrate",
+		g_variant_new_int64(SRDTEST_UART_BAUDRATE), NULL);
+	fail_unless(inst != NULL, "Cannot instantiate uart.");
+	fail_unless(srdtest_inst_channels_set(inst, "rx", 0, NULL) == SRD_OK);
+
+	/* Four chunks, all of which fit into the queue. */
+	fail_unless(srdtest_session_run(sess, cap,
+		cap->num_samples / 4 + 1) == SRD_OK);
+	num_synced = num_anns;
+
+	srd_session_destroy(sess);
+	srdtest_capture_free(cap);
+	*num_total = num_anns;
+
+	return num_synced;
+}
+
+/*
+ * Check whether srd_session_sync() only returns after the output of all
+ * chunks was delivered, including what gets delivered when flushing.
+ * If annotations arrive after srd_session_sync() returned, or a queue
+ * depth of 4 yields fewer annotations than a depth of 1, this test will
+ * fail.
+ */
+START_TEST(test_session_sync_output)
+{
+	unsigned int num_ref, num_synced, num_total;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+
+	num_ref = decode_uart_chunks(1, &num_total);
+	fail_unless(num_ref > 0, "No annotations were delivered.");
+	num_synced = decode_uart_chunks(4, &num_total);
+	fail_unless(num_synced == num_total, "%u of %u annotations arrived "
+			"after srd_session_sync().", num_total - num_synced,
+			num_total);
+	fail_unless(num_synced == num_ref, "Got %u annotations, expected %u.",
+			num_synced, num_ref);
+
+	srd_exit();
+}
+END_TEST
+
+/*
+ * Check whether srd_session_parallel_send_set() works.
+ * If it returns != SRD_OK (or segfaults) this test will fail.
+ */
+START_TEST(test_session_parallel_send_set)
+{
+	int ret;
+	struct srd_session *sess;
+
+	srd_init(NULL);
+	srd_session_new(&sess);
+
+	ret = srd_session_parallel_send_set(sess, TRUE);
+	fail_unless(ret == SRD_OK, "Enabling parallel send failed: %d.", ret);
+	ret = srd_session_parallel_send_set(sess, FALSE);
+	fail_unless(ret == SRD_OK, "Disabling parallel send failed: %d.", ret);
+
+	/* NULL session. */
+	ret = srd_session_parallel_send_set(NULL, TRUE);
+	fail_unless(ret != SRD_OK, "NULL session was accepted.");
+
+	srd_session_destroy(sess);
+	srd_exit();
+}
+END_TEST
+
+static void ann_batch_cb(struct srd_proto_data *pdata,
+		unsigned int num_pdata, void *cb_data)
+{
+	(void)pdata;
+	(void)num_pdata;
+	(void)cb_data;
+}
+
+/*
+ * Check whether srd_pd_output_callback_add_batch() works, and rejects
+ * bogus input.
+ */
+START_TEST(test_session_callback_add_batch)
+{
+	int ret;
+	struct srd_session *sess;
+
+	srd_init(NULL);
+	srd_session_new(&sess);
+
+	ret = srd_pd_output_callback_add_batch(sess, SRD_OUTPUT_ANN,
+			ann_batch_cb, NULL);
+	fail_unless(ret == SRD_OK, "Adding a batch callback failed: %d.", ret);
+
+	/* NULL session, NULL callback, unsupported output type. */
+	ret = srd_pd_output_callback_add_batch(NULL, SRD_OUTPUT_ANN,
+			ann_batch_cb, NULL);
+	fail_unless(ret != SRD_OK, "NULL session was accepted.");
+	ret = srd_pd_output_callback_add_batch(sess, SRD_OUTPUT_ANN,
+			NULL, NULL);
+	fail_unless(ret != SRD_OK, "NULL callback was accepted.");
+	ret = srd_pd_output_callback_add_batch(sess, SRD_OUTPUT_BINARY,
+			ann_batch_cb, NULL);
+	fail_unless(ret != SRD_OK, "SRD_OUTPUT_BINARY was accepted.");
+
+	srd_session_destroy(sess);
+	srd_exit();
+}
+END_TEST
+
+static int compare_lines(const void *a, const void *b)
+{
+	return strcmp(*(char * const *)a, *(char * const *)b);
+}
+
+/*
+ * Stack the 'stack_id' decoder on top of test_wait, and decode a capture
+ * with an edge every 7 samples. Returns the lines of the output, sorted.
+ */
+static char **decode_stacked(const char *stack_id)
+{
+	struct srdtest_capture *cap;
+	struct srd_session *sess;
+	struct srd_decoder_inst *di_from, *di_to;
+	GString *log;
+	char **lines;
+	uint64_t start;
+	int ret;
+
+	cap = srdtest_capture_new(3000, 1);
+	for (start = 0; start < cap->num_samples; start += 14)
+		srdtest_capture_set(cap, 0, start + 7, start + 14, 1);
+
+	log = g_string_new(NULL);
+	sess = srdtest_session_new(log);
+	di_from = srdtest_inst_new(sess, "test_wait", NULL);
+	fail_unless(di_from != NULL, "Cannot instantiate test_wait.");
+	fail_unless(srdtest_inst_channels_set(di_from, "d0", 0, NULL) == SRD_OK);
+	di_to = srdtest_inst_new(sess, stack_id, NULL);
+	fail_unless(di_to != NULL, "Cannot instantiate %s.", stack_id);
+	fail_unless(srd_inst_stack(sess, di_from, di_to) == SRD_OK);
+	ret = srdtest_session_run(sess, cap, 1000);
+	fail_unless(ret == SRD_OK, "Decoding failed: %d.", ret);
+	srd_session_destroy(sess);
+	srdtest_capture_free(cap);
+
+	lines = g_strsplit(log->str, "\n", 0);
+	g_string_free(log, TRUE);
+	qsort(lines, g_strv_length(lines), sizeof(char *), compare_lines);
+
+	return lines;
+}
+
+/*
+ * Check whether a stacked PD with decode_batch() gets the same items as
+ * one with decode(), over more items than fit into one batch.
+ * If the outputs differ (or something segfaults) this test will fail.
+ */
+START_TEST(test_session_decode_batch)
+{
+	char **ref, **lines;
+	unsigned int i;
+
+	srd_init(TEST_DECODERS_DIR);
+	srd_decoder_load("test_wait");
+	srd_decoder_load("test_stack");
+	srd_decoder_load("test_stack_batch");
+
+	ref = decode_stacked("test_stack");
+	lines = decode_stacked("test_stack_batch");
+	/* An annotation from each of the two PDs per edge. */
+	fail_unless(g_strv_length(ref) > 2 * 256, "Too few annotations.");
+	fail_unless(g_strv_length(lines) == g_strv_length(ref),
+		"%u instead of %u annotations.", g_strv_length(lines),
+		g_strv_length(ref));
+	for (i = 0; ref[i]; i++) {
+		fail_unless(!strcmp(lines[i], ref[i]), "'%s' instead of '%s'.",
+			lines[i], ref[i]);
+	}
+	g_strfreev(lines);
+	g_strfreev(ref);
+
+	srd_exit();
+}
+END_TEST
+
+static int pool_setup_cb(struct srd_session *sess, const char *key,
+		void *cb_data)
+{
+	int *num_setups = cb_data;
+
+	(*num_setups)++;
+	if (!srd_inst_new(sess, key, NULL))
+		return SRD_ERR;
+
+	return SRD_OK;
+}
+
+/*
+ * Check whether a session pool sets up a session once per key, and
+ * hands it out again after it was put back.
+ * If a session gets set up twice for the same key, a handed out session
+ * is handed out again (or something segfaults) this test will fail.
+ */
+START_TEST(test_session_pool)
+{
+	struct srd_session_pool *pool;
+	struct srd_session *sess1, *sess2, *sess3;
+	int ret, num_setups;
+
+	srd_init(DECODERS_TESTDIR);
+	srd_decoder_load("uart");
+	num_setups = 0;
+	ret = srd_session_pool_new(&pool, pool_setup_cb, &num_setups);
+	fail_unless(ret == SRD_OK, "srd_session_pool_new() failed: %d.", ret);
+
+	ret = srd_session_pool_get(pool, "uart", &sess1);
+	fail_unless(ret == SRD_OK, "srd_session_pool_get() failed: %d.", ret);
+	fail_unless(srd_session_start(sess1) == SRD_OK);
+	ret = srd_session_pool_get(pool, "uart", &sess2);
+	fail_unless(ret == SRD_OK, "srd_session_pool_get() failed: %d.", ret);
+	fail_unless(sess1 != sess2, "Session handed out twice.");
+	fail_unless(num_setups == 2);
+
+	ret = srd_session_pool_put(pool, sess1);
+	fail_unless(ret == SRD_OK, "srd_session_pool_put() failed: %d.", ret);
+	ret = srd_session_pool_get(pool, "uart", &sess3);
+	fail_unless(ret == SRD_OK, "srd_session_pool_get() failed: %d.", ret);
+	fail_unless(sess3 == sess1, "Idle session was not reused.");
+	fail_unless(num_setups == 2);
+	fail_unless(srd_session_start(sess3) == SRD_OK);
+
+	/* A session which was put back twice is only handed out once. */
+	ret = srd_session_pool_put(pool, sess2);
+	fail_unless(ret == SRD_OK, "srd_session_pool_put() failed: %d.", ret);
+	ret = srd_session_pool_put(pool, sess2);
+	fail_unless(ret != SRD_OK, "Session was put back twice.");
+	fail_unless(srd_session_pool_get(pool, "uart", &sess1) == SRD_OK);
+	fail_unless(sess1 == sess2, "Idle session was not reused.");
+	fail_unless(srd_session_pool_get(pool, "uart", &sess2) == SRD_OK);
+	fail_unless(sess1 != sess2, "Session handed out twice.");
+	fail_unless(num_setups == 3);
+
+	/* Unknown decoders fail to set up, foreign sessions are rejected. */
+	fail_unless(srd_session_pool_get(pool, "nonexisting", &sess1) != SRD_OK);
+	srd_session_new(&sess1);
+	fail_unless(srd_session_pool_put(pool, sess1) != SRD_OK);
+	fail_unless(srd_session_pool_put(NULL, sess2) != SRD_OK);
+	fail_unless(srd_session_pool_new(&pool, NULL, NULL) != SRD_OK);
+
+	ret = srd_session_pool_destroy(pool);
+	fail_unless(ret == SRD_OK, "srd_session_pool_destroy() failed: %d.", ret);
+	srd_exit();
+}
+END_TEST
+
 Suite *suite_session(void)
 {
 	Suite *s;
@@ -282,9 +732,29 @@ Suite *suite_session(void)
 	tcase_add_test(tc, test_session_metadata_set_bogus);
 	suite_add_tcase(s, tc);
 
+	tc = tcase_create("send");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_session_send_transitions_bogus);
+	tcase_add_test(tc, test_session_send_transitions);
+	tcase_add_test(tc, test_session_chunk_queue_depth);
+	tcase_add_test(tc, test_session_sync_output);
+	tcase_add_test(tc, test_session_parallel_send_set);
+	suite_add_tcase(s, tc);
+
+	tc = tcase_create("callback");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_session_callback_add_batch);
+	tcase_add_test(tc, test_session_decode_batch);
+	suite_add_tcase(s, tc);
+
 	tc = tcase_create("reset");
 	tcase_add_test(tc, test_session_reset_nodata);
 	suite_add_tcase(s, tc);
 
+	tc = tcase_create("pool");
+	tcase_add_checked_fixture(tc, srdtest_setup, srdtest_teardown);
+	tcase_add_test(tc, test_session_pool);
+	suite_add_tcase(s, tc);
+
 	return s;
 }
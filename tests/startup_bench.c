@@ -0,0 +1,110 @@
+/*
+ * This file is part of the libsigrokdecode project.
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 2 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, see <http://www.gnu.org/licenses/>.
+ */
+
+/*
+ * Startup benchmark: runs srd_init() and srd_decoder_load_all(), then
+ * instantiates the given decoders, and reports where the time went.
+ *
+ * Build with "make tests/startup_bench", then run e.g.
+ *
+ *   tests/startup_bench -d decoders uart i2c
+ *
+ * Each run starts a fresh Python interpreter, so run it a few times and
+ * compare the medians. Times are in milliseconds.
+ */
+
+#include <config.h>
+#include <libsigrokdecode.h> /* First, to avoid compiler warning. */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+static gint decoder_time_cmp(gconstpointer a, gconstpointer b)
+{
+	const struct srd_decoder *dec_a = a, *dec_b = b;
+	int64_t time_a, time_b;
+
+	time_a = dec_a->import_time + dec_a->metadata_time;
+	time_b = dec_b->import_time + dec_b->metadata_time;
+
+	return (time_a < time_b) - (time_a > time_b);
+}
+
+int main(int argc, char **argv)
+{
+	struct srd_startup_times times;
+	struct srd_session *sess;
+	struct srd_decoder *dec;
+	const char *path;
+	GSList *decoders, *l;
+	int64_t start, init_time, load_time, inst_time;
+	int i;
+
+	path = DECODERS_TESTDIR;
+	i = 1;
+	if (argc > 2 && !strcmp(argv[1], "-d")) {
+		path = argv[2];
+		i = 3;
+	}
+
+	start = g_get_monotonic_time();
+	if (srd_init(path) != SRD_OK) {
+		fprintf(stderr, "srd_init() failed.\n");
+		return EXIT_FAILURE;
+	}
+	init_time = g_get_monotonic_time() - start;
+
+	start = g_get_monotonic_time();
+	srd_decoder_load_all();
+	load_time = g_get_monotonic_time() - start;
+
+	/* Decoders loaded from an index get imported here. */
+	start = g_get_monotonic_time();
+	srd_session_new(&sess);
+	for (; i < argc; i++) {
+		if (!srd_inst_new(sess, argv[i], NULL))
+			fprintf(stderr, "Cannot instantiate %s.\n", argv[i]);
+	}
+	inst_time = g_get_monotonic_time() - start;
+
+	srd_startup_times_get(&times);
+
+	decoders = g_slist_sort(g_slist_copy((GSList *)srd_decoder_list()),
+			decoder_time_cmp);
+	printf("%-24s %10s %10s\n", "decoder", "import", "metadata");
+	for (l = decoders; l; l = l->next) {
+		dec = l->data;
+		printf("%-24s %10.3f %10.3f\n", dec->id,
+			dec->import_time / 1000.0, dec->metadata_time / 1000.0);
+	}
+	g_slist_free(decoders);
+
+	printf("\n");
+	printf("%-24s %10d\n", "decoders", g_slist_length(
+		(GSList *)srd_decoder_list()));
+	printf("%-24s %10.3f\n", "srd_init", init_time / 1000.0);
+	printf("%-24s %10.3f\n", "srd_decoder_load_all", load_time / 1000.0);
+	printf("%-24s %10.3f\n", "srd_inst_new", inst_time / 1000.0);
+	printf("%-24s %10.3f\n", "total init", times.init / 1000.0);
+	printf("%-24s %10.3f\n", "total scan", times.scan / 1000.0);
+	printf("%-24s %10.3f\n", "total import", times.import / 1000.0);
+	printf("%-24s %10.3f\n", "total metadata", times.metadata / 1000.0);
+
+	srd_exit();
+
+	return EXIT_SUCCESS;
+}
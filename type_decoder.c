@@ -22,14 +22,6 @@
 #include "libsigrokdecode.h"
 #include <inttypes.h>
 
-/** @cond PRIVATE */
-extern SRD_PRIV GSList *sessions;
-/** @endcond */
-
-typedef struct {
-        PyObject_HEAD
-} srd_Decoder;
-
 /* This is only used for nicer srd_dbg() output. */
 SRD_PRIV const char *output_type_name(unsigned int idx)
 {
@@ -53,23 +45,22 @@ static void release_annotation(struct srd_proto_data_annotation *pda)
 		g_strfreev(pda->ann_text);
 }
 
-static int convert_annotation(struct srd_decoder_inst *di, PyObject *obj,
-		struct srd_proto_data *pdata)
+/*
+ * Check an annotation from Python, which should be a list of
+ * [annotation class, [string, ...]]. The caller must hold the GIL.
+ */
+static int parse_annotation(struct srd_decoder_inst *di, PyObject *obj,
+		int *out_ann_class, PyObject **out_texts)
 {
 	PyObject *py_tmp;
 	struct srd_pd_output *pdo;
-	struct srd_proto_data_annotation *pda;
 	int ann_class;
-	char **ann_text;
-	PyGILState_STATE gstate;
-
-	gstate = PyGILState_Ensure();
 
 	/* Should be a list of [annotation class, [string, ...]]. */
 	if (!PyList_Check(obj)) {
 		srd_err("Protocol decoder %s submitted an annotation that"
 			" is not a list", di->decoder->name);
-		goto err;
+		return SRD_ERR_PYTHON;
 	}
 
 	/* Should have 2 elements. */
@@ -77,7 +68,7 @@ static int convert_annotation(struct srd_decoder_inst *di, PyObject *obj,
 		srd_err("Protocol decoder %s submitted annotation list with "
 			"%zd elements instead of 2", di->decoder->name,
 			PyList_Size(obj));
-		goto err;
+		return SRD_ERR_PYTHON;
 	}
 
 	/*
@@ -88,13 +79,13 @@ static int convert_annotation(struct srd_decoder_inst *di, PyObject *obj,
 	if (!PyLong_Check(py_tmp)) {
 		srd_err("Protocol decoder %s submitted annotation list, but "
 			"first element was not an integer.", di->decoder->name);
-		goto err;
+		return SRD_ERR_PYTHON;
 	}
 	ann_class = PyLong_AsLong(py_tmp);
 	if (!(pdo = g_slist_nth_data(di->decoder->annotations, ann_class))) {
 		srd_err("Protocol decoder %s submitted data to unregistered "
 			"annotation class %d.", di->decoder->name, ann_class);
-		goto err;
+		return SRD_ERR_PYTHON;
 	}
 
 	/* Second element must be a list. */
@@ -102,9 +93,30 @@ static int convert_annotation(struct srd_decoder_inst *di, PyObject *obj,
 	if (!PyList_Check(py_tmp)) {
 		srd_err("Protocol decoder %s submitted annotation list, but "
 			"second element was not a list.", di->decoder->name);
-		goto err;
+		return SRD_ERR_PYTHON;
 	}
-	if (py_strseq_to_char(py_tmp, &ann_text) != SRD_OK) {
+
+	*out_ann_class = ann_class;
+	*out_texts = py_tmp;
+
+	return SRD_OK;
+}
+
+static int convert_annotation(struct srd_decoder_inst *di, PyObject *obj,
+		struct srd_proto_data *pdata)
+{
+	PyObject *py_texts;
+	struct srd_proto_data_annotation *pda;
+	int ann_class;
+	char **ann_text;
+	PyGILState_STATE gstate;
+
+	gstate = PyGILState_Ensure();
+
+	if (parse_annotation(di, obj, &ann_class, &py_texts) != SRD_OK)
+		goto err;
+
+	if (py_strseq_to_char(py_texts, &ann_text) != SRD_OK) {
 		srd_err("Protocol decoder %s submitted annotation list, but "
 			"second element was malformed.", di->decoder->name);
 		goto err;
@@ -113,17 +125,335 @@ static int convert_annotation(struct srd_decoder_inst *di, PyObject *obj,
 	pda = pdata->data;
 	pda->ann_class = ann_class;
 	pda->ann_text = ann_text;
+	pda->ann_text_ids = NULL;
+
+	PyGILState_Release(gstate);
+
+	return SRD_OK;
+
+err:
+	PyGILState_Release(gstate);
+
+	return SRD_ERR_PYTHON;
+}
+
+/* Max number of texts in a decoder's intern table. */
+#define ANN_TEXTS_MAX 65536
+
+/**
+ * Look up (or add) an annotation text in the decoder's intern table.
+ *
+ * Once the table is full, texts which are not in the table yet are not
+ * interned: 'out_text' is set to NULL, 'out_id' to SRD_ANN_TEXT_ID_NONE,
+ * and the caller has to copy the text. The caller must hold the GIL.
+ *
+ * @param dec The decoder which owns the table. Must not be NULL.
+ * @param py_str The text. Must not be NULL.
+ * @param out_text The interned text, valid until the decoder is unloaded.
+ * @param out_id The text's ID.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise, with
+ *         a Python exception set.
+ */
+static int ann_text_intern(struct srd_decoder *dec, PyObject *py_str,
+		char **out_text, unsigned int *out_id)
+{
+	PyObject *py_id, *py_bytes;
+	unsigned int id;
+
+	if (!PyUnicode_Check(py_str)) {
+		PyErr_SetString(PyExc_TypeError, "annotation text must be a string");
+		return SRD_ERR_PYTHON;
+	}
+
+	if (!dec->py_ann_text_ids) {
+		if (!(dec->py_ann_text_ids = PyDict_New()))
+			return SRD_ERR_PYTHON;
+		dec->ann_texts = g_ptr_array_new_with_free_func(g_free);
+	}
+
+	/* Python strings cache their hash, lookups are cheap. */
+	if ((py_id = PyDict_GetItem(dec->py_ann_text_ids, py_str))) {
+		id = PyLong_AsUnsignedLong(py_id);
+		*out_text = g_ptr_array_index(dec->ann_texts, id);
+		*out_id = id;
+		return SRD_OK;
+	}
+
+	/* Don't let decoders which put values into texts grow it forever. */
+	if (dec->ann_texts->len >= ANN_TEXTS_MAX) {
+		*out_text = NULL;
+		*out_id = SRD_ANN_TEXT_ID_NONE;
+		return SRD_OK;
+	}
+
+	if (!(py_bytes = PyUnicode_AsUTF8String(py_str)))
+		return SRD_ERR_PYTHON;
+	id = dec->ann_texts->len;
+	g_ptr_array_add(dec->ann_texts, g_strdup(PyBytes_AsString(py_bytes)));
+	Py_DECREF(py_bytes);
+
+	py_id = PyLong_FromUnsignedLong(id);
+	if (!py_id || PyDict_SetItem(dec->py_ann_text_ids, py_str, py_id) < 0) {
+		Py_XDECREF(py_id);
+		return SRD_ERR_PYTHON;
+	}
+	Py_DECREF(py_id);
+
+	*out_text = g_ptr_array_index(dec->ann_texts, id);
+	*out_id = id;
+
+	return SRD_OK;
+}
+
+/* Number of annotation texts which fit into the stack buffers of put(). */
+#define ANN_TEXTS_BUF 8
+
+/**
+ * Convert an annotation to interned texts and their IDs.
+ *
+ * The vectors 'texts' and 'ids' must have room for ANN_TEXTS_BUF items,
+ * larger annotations get newly allocated vectors. Texts which could not
+ * be interned get copied. Both must be released with
+ * release_annotation_interned().
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ */
+static int convert_annotation_interned(struct srd_decoder_inst *di,
+		PyObject *obj, struct srd_proto_data *pdata,
+		char **texts, unsigned int *ids)
+{
+	PyObject *py_texts, *py_item, *py_bytes;
+	struct srd_proto_data_annotation *pda;
+	Py_ssize_t num_texts, i;
+	int ann_class;
+	PyGILState_STATE gstate;
+
+	pda = pdata->data;
+	pda->ann_text = texts;
+	pda->ann_text_ids = ids;
+	texts[0] = NULL;
+
+	gstate = PyGILState_Ensure();
+
+	if (parse_annotation(di, obj, &ann_class, &py_texts) != SRD_OK)
+		goto err;
+
+	num_texts = PyList_Size(py_texts);
+	if (num_texts >= ANN_TEXTS_BUF) {
+		texts = g_new(char *, num_texts + 1);
+		ids = g_new(unsigned int, num_texts + 1);
+		pda->ann_text = texts;
+		pda->ann_text_ids = ids;
+	}
+	pda->ann_class = ann_class;
+
+	for (i = 0; i < num_texts; i++) {
+		py_item = PyList_GetItem(py_texts, i);
+		if (ann_text_intern(di->decoder, py_item, &texts[i],
+				&ids[i]) != SRD_OK)
+			goto err_text;
+		if (texts[i])
+			continue;
+		if (!(py_bytes = PyUnicode_AsUTF8String(py_item)))
+			goto err_text;
+		texts[i] = g_strdup(PyBytes_AsString(py_bytes));
+		Py_DECREF(py_bytes);
+	}
+	texts[num_texts] = NULL;
+	ids[num_texts] = 0;
 
 	PyGILState_Release(gstate);
 
 	return SRD_OK;
 
+err_text:
+	texts[i] = NULL;
+	srd_exception_catch("Failed to obtain string item");
+	srd_err("Protocol decoder %s submitted annotation list, but "
+		"second element was malformed.", di->decoder->name);
 err:
 	PyGILState_Release(gstate);
 
 	return SRD_ERR_PYTHON;
 }
 
+static void release_annotation_interned(struct srd_proto_data_annotation *pda,
+		char **texts)
+{
+	unsigned int i;
+
+	/* Interned texts belong to the decoder's intern table. */
+	for (i = 0; pda->ann_text[i]; i++) {
+		if (pda->ann_text_ids[i] == SRD_ANN_TEXT_ID_NONE)
+			g_free(pda->ann_text[i]);
+	}
+	if (pda->ann_text != texts) {
+		g_free(pda->ann_text);
+		g_free(pda->ann_text_ids);
+	}
+}
+
+/* Max number of annotations per instance before a batch gets delivered. */
+#define ANN_BATCH_MAX 4096
+
+/**
+ * Queue an annotation for the session's batch callback.
+ *
+ * The texts get copied into the batch's string storage. The caller must
+ * hold the GIL.
+ *
+ * @param di The decoder instance which submitted the annotation.
+ * @param pdata The annotation's sample range and output.
+ * @param obj The annotation as submitted by the decoder.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ */
+static int ann_batch_append(struct srd_decoder_inst *di,
+		const struct srd_proto_data *pdata, PyObject *obj)
+{
+	struct srd_ann_batch *batch;
+	struct srd_proto_data_annotation pda;
+	PyObject *py_texts, *py_item, *py_bytes;
+	Py_ssize_t num_texts, i;
+	guint offset;
+	char *text;
+	unsigned int id;
+
+	if (parse_annotation(di, obj, &pda.ann_class, &py_texts) != SRD_OK)
+		return SRD_ERR_PYTHON;
+
+	if (!(batch = di->ann_batch)) {
+		batch = g_malloc(sizeof(struct srd_ann_batch));
+		batch->pdata = g_array_new(FALSE, FALSE, sizeof(struct srd_proto_data));
+		batch->pda = g_array_new(FALSE, FALSE, sizeof(struct srd_proto_data_annotation));
+		batch->text_offsets = g_array_new(FALSE, FALSE, sizeof(guint));
+		batch->texts = g_ptr_array_new();
+		batch->text_ids = g_array_new(FALSE, FALSE, sizeof(unsigned int));
+		batch->strings = g_string_chunk_new(4096);
+		di->ann_batch = batch;
+	}
+
+	offset = batch->texts->len;
+	num_texts = PyList_Size(py_texts);
+	for (i = 0; i < num_texts; i++) {
+		py_item = PyList_GetItem(py_texts, i);
+		text = NULL;
+		if (di->sess->ann_text_ids) {
+			/* Interned texts need no copy. */
+			if (ann_text_intern(di->decoder, py_item, &text, &id) != SRD_OK)
+				goto err;
+		} else if (!PyUnicode_Check(py_item)) {
+			PyErr_SetString(PyExc_TypeError,
+				"annotation text must be a string");
+			goto err;
+		}
+		if (!text) {
+			if (!(py_bytes = PyUnicode_AsUTF8String(py_item)))
+				goto err;
+			text = g_string_chunk_insert(batch->strings,
+				PyBytes_AsString(py_bytes));
+			Py_DECREF(py_bytes);
+		}
+		g_ptr_array_add(batch->texts, text);
+		if (di->sess->ann_text_ids)
+			g_array_append_val(batch->text_ids, id);
+	}
+	g_ptr_array_add(batch->texts, NULL);
+	if (di->sess->ann_text_ids) {
+		id = 0;
+		g_array_append_val(batch->text_ids, id);
+	}
+
+	pda.ann_text = NULL;
+	g_array_append_val(batch->pdata, *pdata);
+	g_array_append_val(batch->pda, pda);
+	g_array_append_val(batch->text_offsets, offset);
+
+	return SRD_OK;
+
+err:
+	g_ptr_array_set_size(batch->texts, offset);
+	if (batch->text_ids->len > offset)
+		g_array_set_size(batch->text_ids, offset);
+	srd_exception_catch("Failed to obtain string item");
+	srd_err("Protocol decoder %s submitted annotation list, but "
+		"second element was malformed.", di->decoder->name);
+
+	return SRD_ERR_PYTHON;
+}
+
+/**
+ * Pass the instance's pending annotations to the session's batch callback.
+ *
+ * The GIL need not be held. The Python side of the instance must not run
+ * concurrently.
+ *
+ * @param di The decoder instance. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void ann_batch_deliver(struct srd_decoder_inst *di)
+{
+	struct srd_ann_batch *batch;
+	struct srd_proto_data *pdata;
+	struct srd_proto_data_annotation *pda;
+	guint i, *offsets;
+	unsigned int *ids;
+	gboolean with_ids;
+
+	batch = di->ann_batch;
+	if (!batch || !batch->pdata->len)
+		return;
+
+	/* The arrays don't move anymore, point the items into them. */
+	pdata = (struct srd_proto_data *)batch->pdata->data;
+	pda = (struct srd_proto_data_annotation *)batch->pda->data;
+	offsets = (guint *)batch->text_offsets->data;
+	ids = (unsigned int *)batch->text_ids->data;
+	with_ids = batch->text_ids->len == batch->texts->len;
+	for (i = 0; i < batch->pdata->len; i++) {
+		pdata[i].data = &pda[i];
+		pda[i].ann_text = (char **)&batch->texts->pdata[offsets[i]];
+		pda[i].ann_text_ids = with_ids ? &ids[offsets[i]] : NULL;
+	}
+
+	if (di->sess->ann_batch_cb)
+		di->sess->ann_batch_cb(pdata, batch->pdata->len,
+			di->sess->ann_batch_cb_data);
+
+	g_array_set_size(batch->pdata, 0);
+	g_array_set_size(batch->pda, 0);
+	g_array_set_size(batch->text_offsets, 0);
+	g_ptr_array_set_size(batch->texts, 0);
+	g_array_set_size(batch->text_ids, 0);
+	g_string_chunk_clear(batch->strings);
+}
+
+/**
+ * Drop the instance's pending annotations, and free the batch storage.
+ *
+ * @param di The decoder instance. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void ann_batch_free(struct srd_decoder_inst *di)
+{
+	struct srd_ann_batch *batch;
+
+	if (!(batch = di->ann_batch))
+		return;
+
+	g_array_free(batch->pdata, TRUE);
+	g_array_free(batch->pda, TRUE);
+	g_array_free(batch->text_offsets, TRUE);
+	g_ptr_array_free(batch->texts, TRUE);
+	g_array_free(batch->text_ids, TRUE);
+	g_string_chunk_free(batch->strings);
+	g_free(batch);
+	di->ann_batch = NULL;
+}
+
 static void release_logic(struct srd_proto_data_logic *pdl)
 {
 	if (!pdl)
@@ -207,18 +537,22 @@ err:
 	return SRD_ERR_PYTHON;
 }
 
-static void release_binary(struct srd_proto_data_binary *pdb)
-{
-	if (!pdb)
-		return;
-	g_free((void *)pdb->data);
-}
-
+/**
+ * Convert a binary output from Python, without copying the data.
+ *
+ * The data can be bytes or bytearray, and is passed as a pointer into
+ * the Python object. Other objects which support the buffer protocol
+ * (e.g. memoryview) get copied into a bytes object once. A reference to
+ * the object which holds the data is returned in 'out_py_data', and must
+ * be released (with the GIL held) after the callback was called.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ */
 static int convert_binary(struct srd_decoder_inst *di, PyObject *obj,
-		struct srd_proto_data *pdata)
+		struct srd_proto_data *pdata, PyObject **out_py_data)
 {
 	struct srd_proto_data_binary *pdb;
-	PyObject *py_tmp;
+	PyObject *py_tmp, *py_data;
 	Py_ssize_t size;
 	int bin_class;
 	char *class_name, *buf;
@@ -255,32 +589,41 @@ static int convert_binary(struct srd_decoder_inst *di, PyObject *obj,
 		goto err;
 	}
 
-	/* Second element should be bytes. */
+	/* Second element should be bytes, or some other bytes-like object. */
 	py_tmp = PyList_GetItem(obj, 1);
-	if (!PyBytes_Check(py_tmp)) {
+	if (PyBytes_Check(py_tmp) || PyByteArray_Check(py_tmp)) {
+		Py_INCREF(py_tmp);
+		py_data = py_tmp;
+	} else if (!(py_data = PyBytes_FromObject(py_tmp))) {
+		PyErr_Clear();
 		srd_err("Protocol decoder %s submitted SRD_OUTPUT_BINARY list, "
 			"but second element was not bytes.", di->decoder->name);
 		goto err;
 	}
 
+	if (PyByteArray_Check(py_data)) {
+		buf = PyByteArray_AsString(py_data);
+		size = PyByteArray_Size(py_data);
+	} else {
+		buf = PyBytes_AsString(py_data);
+		size = PyBytes_Size(py_data);
+	}
+
 	/* Consider an empty set of bytes a bug. */
-	if (PyBytes_Size(py_tmp) == 0) {
+	if (size == 0) {
 		srd_err("Protocol decoder %s submitted SRD_OUTPUT_BINARY "
 				"with empty data set.", di->decoder->name);
+		Py_DECREF(py_data);
 		goto err;
 	}
 
-	if (PyBytes_AsStringAndSize(py_tmp, &buf, &size) == -1)
-		goto err;
-
 	PyGILState_Release(gstate);
 
 	pdb = pdata->data;
 	pdb->bin_class = bin_class;
 	pdb->size = size;
-	if (!(pdb->data = g_try_malloc(pdb->size)))
-		return SRD_ERR_MALLOC;
-	memcpy((void *)pdb->data, (const void *)buf, pdb->size);
+	pdb->data = (const uint8_t *)buf;
+	*out_py_data = py_data;
 
 	return SRD_OK;
 
@@ -290,65 +633,42 @@ err:
 	return SRD_ERR_PYTHON;
 }
 
-static inline struct srd_decoder_inst *srd_sess_inst_find_by_obj(
-	struct srd_session *sess, const GSList *stack, const PyObject *obj)
-{
-	const GSList *l;
-	struct srd_decoder_inst *tmp, *di;
-
-	if (!sess)
-		return NULL;
-
-	di = NULL;
-	for (l = stack ? stack : sess->di_list; di == NULL && l != NULL; l = l->next) {
-		tmp = l->data;
-		if (tmp->py_inst == obj)
-			di = tmp;
-		else if (tmp->next_di)
-			di = srd_sess_inst_find_by_obj(sess, tmp->next_di, obj);
-	}
-
-	return di;
-}
-
 /**
  * Find a decoder instance by its Python object.
  *
  * I.e. find that instance's instantiation of the sigrokdecode.Decoder class.
- * This will recurse to find the instance anywhere in the stack tree of all
- * sessions.
+ * The object holds a pointer to its instance, which gets set up when the
+ * instance is created.
  *
- * @param stack Pointer to a GSList of struct srd_decoder_inst, indicating the
- *              stack to search. To start searching at the bottom level of
- *              decoder instances, pass NULL.
  * @param obj The Python class instantiation.
  *
  * @return Pointer to struct srd_decoder_inst, or NULL if not found.
  *
  * @since 0.1.0
  */
-static inline struct srd_decoder_inst *srd_inst_find_by_obj(
-		const GSList *stack, const PyObject *obj)
+static inline struct srd_decoder_inst *srd_inst_find_by_obj(const PyObject *obj)
 {
 	struct srd_decoder_inst *di;
-	struct srd_session *sess;
-	GSList *l;
 
-	/* Performance shortcut: Handle the most common case first. */
-	sess = sessions->data;
-	di = sess->di_list->data;
-	if (di->py_inst == obj)
-		return di;
-
-	di = NULL;
-	for (l = sessions; di == NULL && l != NULL; l = l->next) {
-		sess = l->data;
-		di = srd_sess_inst_find_by_obj(sess, stack, obj);
-	}
+	di = ((const srd_Decoder *)obj)->di;
+	if (!di || di->py_inst != obj)
+		return NULL;
 
 	return di;
 }
 
+/* Annotations of unknown classes count as enabled, put() rejects them. */
+static inline gboolean ann_class_enabled(const struct srd_decoder_inst *di,
+		long ann_class)
+{
+	if (!di->ann_classes_enabled)
+		return TRUE;
+	if (ann_class < 0 || ann_class >= di->num_ann_classes)
+		return TRUE;
+
+	return di->ann_classes_enabled[ann_class];
+}
+
 static int convert_meta(struct srd_proto_data *pdata, PyObject *obj)
 {
 	long long intvalue;
@@ -396,17 +716,88 @@ static void release_meta(GVariant *gvar)
 	g_variant_unref(gvar);
 }
 
+/* Max number of items passed to a stacked PD's decode_batch() at once. */
+#define DECODE_BATCH_MAX 256
+
+/**
+ * Pass the pending items of a stacked PD to its decode_batch() method.
+ *
+ * The caller must hold the GIL.
+ *
+ * @param di The stacked decoder instance. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void decode_batch_deliver(struct srd_decoder_inst *di)
+{
+	PyObject *py_batch, *py_res;
+	int64_t start;
+
+	if (!di->py_batch || !di->py_decode_batch)
+		return;
+
+	/* Items which get put while decode_batch() runs start a new batch. */
+	py_batch = di->py_batch;
+	di->py_batch = NULL;
+
+	start = g_get_monotonic_time();
+	py_res = PyObject_CallFunctionObjArgs(di->py_decode_batch, py_batch, NULL);
+	di->stats.stacked_decode_time += g_get_monotonic_time() - start;
+	if (!py_res) {
+		srd_exception_catch("Calling %s decode_batch() failed",
+					di->inst_id);
+	}
+	Py_XDECREF(py_res);
+	Py_DECREF(py_batch);
+}
+
+/**
+ * Queue an item for a stacked PD's decode_batch() method.
+ *
+ * The items get delivered when DECODE_BATCH_MAX items are pending, and
+ * when the stack gets flushed at the end of each chunk.
+ *
+ * @param di The stacked decoder instance. Must not be NULL.
+ * @param start_sample The absolute start sample number of the item.
+ * @param end_sample The absolute end sample number of the item.
+ * @param py_data The item's data. Must not be NULL.
+ */
+static void decode_batch_append(struct srd_decoder_inst *di,
+		uint64_t start_sample, uint64_t end_sample, PyObject *py_data)
+{
+	PyObject *py_item;
+
+	if (!di->py_batch && !(di->py_batch = PyList_New(0))) {
+		srd_exception_catch("Cannot queue items for %s",
+					di->inst_id);
+		return;
+	}
+
+	py_item = Py_BuildValue("(KKO)", start_sample, end_sample, py_data);
+	if (!py_item || PyList_Append(di->py_batch, py_item) < 0) {
+		srd_exception_catch("Cannot queue items for %s",
+					di->inst_id);
+	}
+	Py_XDECREF(py_item);
+
+	if (PyList_Size(di->py_batch) >= DECODE_BATCH_MAX)
+		decode_batch_deliver(di);
+}
+
 static PyObject *Decoder_put(PyObject *self, PyObject *args)
 {
 	GSList *l;
-	PyObject *py_data, *py_res;
+	PyObject *py_data, *py_res, *py_bin, *py_tmp;
 	struct srd_decoder_inst *di, *next_di;
 	struct srd_pd_output *pdo;
 	struct srd_proto_data pdata;
 	struct srd_proto_data_annotation pda;
+	char *ann_texts[ANN_TEXTS_BUF];
+	unsigned int ann_text_ids[ANN_TEXTS_BUF];
 	struct srd_proto_data_binary pdb;
 	struct srd_proto_data_logic pdl;
 	uint64_t start_sample, end_sample;
+	int64_t start, decode_start;
 	int output_id;
 	struct srd_pd_callback *cb;
 	PyGILState_STATE gstate;
@@ -415,7 +806,7 @@ static PyObject *Decoder_put(PyObject *self, PyObject *args)
 
 	gstate = PyGILState_Ensure();
 
-	if (!(di = srd_inst_find_by_obj(NULL, self))) {
+	if (!(di = srd_inst_find_by_obj(self))) {
 		/* Shouldn't happen. */
 		srd_dbg("put(): self instance not found.");
 		goto err;
@@ -431,12 +822,16 @@ static PyObject *Decoder_put(PyObject *self, PyObject *args)
 		goto err;
 	}
 
-	if (!(l = g_slist_nth(di->pd_output, output_id))) {
+	if (output_id < 0 || output_id >= di->pd_output_count) {
 		srd_err("Protocol decoder %s submitted invalid output ID %d.",
 			di->decoder->name, output_id);
 		goto err;
 	}
-	pdo = l->data;
+	pdo = di->pd_output_array[output_id];
+
+	start = g_get_monotonic_time();
+	if (pdo->output_type >= 0 && pdo->output_type <= SRD_OUTPUT_META)
+		di->stats.put_calls[pdo->output_type]++;
 
 	/* Upon SRD_OUTPUT_PYTHON for stacked PDs, we have a nicer log message later. */
 	if (pdo->output_type != SRD_OUTPUT_PYTHON && di->next_di != NULL) {
@@ -453,8 +848,37 @@ static PyObject *Decoder_put(PyObject *self, PyObject *args)
 
 	switch (pdo->output_type) {
 	case SRD_OUTPUT_ANN:
+		/* Drop annotations of disabled classes before converting them. */
+		if (di->ann_classes_enabled && PyList_Check(py_data) &&
+		    PyList_Size(py_data) == 2 &&
+		    PyLong_Check(py_tmp = PyList_GetItem(py_data, 0)) &&
+		    !ann_class_enabled(di, PyLong_AsLong(py_tmp)))
+			break;
 		/* Annotations are only fed to callbacks. */
-		if ((cb = srd_pd_output_callback_find(di->sess, pdo->output_type))) {
+		if (di->sess->ann_batch_cb) {
+			if (ann_batch_append(di, &pdata, py_data) != SRD_OK) {
+				/* An error was already logged. */
+				break;
+			}
+			if (di->ann_batch->pdata->len >= ANN_BATCH_MAX) {
+				Py_BEGIN_ALLOW_THREADS
+				ann_batch_deliver(di);
+				Py_END_ALLOW_THREADS
+			}
+		} else if (di->sess->ann_text_ids &&
+				(cb = srd_pd_output_callback_find(di->sess, pdo->output_type))) {
+			pdata.data = &pda;
+			if (convert_annotation_interned(di, py_data, &pdata,
+					ann_texts, ann_text_ids) != SRD_OK) {
+				/* An error was already logged. */
+				release_annotation_interned(&pda, ann_texts);
+				break;
+			}
+			Py_BEGIN_ALLOW_THREADS
+			cb->cb(&pdata, cb->cb_data);
+			Py_END_ALLOW_THREADS
+			release_annotation_interned(&pda, ann_texts);
+		} else if ((cb = srd_pd_output_callback_find(di->sess, pdo->output_type))) {
 			pdata.data = &pda;
 			/* Convert from PyDict to srd_proto_data_annotation. */
 			if (convert_annotation(di, py_data, &pdata) != SRD_OK) {
@@ -475,9 +899,22 @@ static PyObject *Decoder_put(PyObject *self, PyObject *args)
 				 start_sample,
 				 end_sample, output_type_name(pdo->output_type),
 				 output_id, pdo->proto_id, next_di->inst_id);
-			if (!(py_res = PyObject_CallMethod(
-				next_di->py_inst, "decode", "KKO", start_sample,
-				end_sample, py_data))) {
+			if (next_di->py_decode_batch) {
+				decode_batch_append(next_di, start_sample,
+					end_sample, py_data);
+				continue;
+			}
+			decode_start = g_get_monotonic_time();
+			if (next_di->py_decode)
+				py_res = PyObject_CallFunction(next_di->py_decode,
+					"KKO", start_sample, end_sample, py_data);
+			else
+				py_res = PyObject_CallMethod(next_di->py_inst,
+					"decode", "KKO", start_sample,
+					end_sample, py_data);
+			next_di->stats.stacked_decode_time +=
+				g_get_monotonic_time() - decode_start;
+			if (!py_res) {
 				srd_exception_catch("Calling %s decode() failed",
 							next_di->inst_id);
 			}
@@ -496,14 +933,15 @@ static PyObject *Decoder_put(PyObject *self, PyObject *args)
 		if ((cb = srd_pd_output_callback_find(di->sess, pdo->output_type))) {
 			pdata.data = &pdb;
 			/* Convert from PyDict to srd_proto_data_binary. */
-			if (convert_binary(di, py_data, &pdata) != SRD_OK) {
+			if (convert_binary(di, py_data, &pdata, &py_bin) != SRD_OK) {
 				/* An error was already logged. */
 				break;
 			}
 			Py_BEGIN_ALLOW_THREADS
 			cb->cb(&pdata, cb->cb_data);
 			Py_END_ALLOW_THREADS
-			release_binary(pdata.data);
+			/* The data pointed into this object. */
+			Py_DECREF(py_bin);
 		}
 		break;
 	case SRD_OUTPUT_LOGIC:
@@ -544,6 +982,8 @@ static PyObject *Decoder_put(PyObject *self, PyObject *args)
 		break;
 	}
 
+	di->stats.put_time += g_get_monotonic_time() - start;
+
 	PyGILState_Release(gstate);
 
 	Py_RETURN_NONE;
@@ -576,7 +1016,7 @@ static PyObject *Decoder_register(PyObject *self, PyObject *args,
 	meta_type_gv = NULL;
 	meta_name = meta_descr = NULL;
 
-	if (!(di = srd_inst_find_by_obj(NULL, self))) {
+	if (!(di = srd_inst_find_by_obj(self))) {
 		PyErr_SetString(PyExc_Exception, "decoder instance not found");
 		goto err;
 	}
@@ -640,6 +1080,10 @@ static PyObject *Decoder_register(PyObject *self, PyObject *args,
 	}
 
 	di->pd_output = g_slist_append(di->pd_output, pdo);
+	di->pd_output_array = g_renew(struct srd_pd_output *,
+		di->pd_output_array, pdo->pdo_id + 1);
+	di->pd_output_array[pdo->pdo_id] = pdo;
+	di->pd_output_count = pdo->pdo_id + 1;
 	py_new_output_id = Py_BuildValue("i", pdo->pdo_id);
 
 	PyGILState_Release(gstate);
@@ -679,41 +1123,198 @@ static int get_term_type(const char *v)
 }
 
 /**
- * Get the pin values at the current sample number.
+ * Get the current pin values as a bitmask.
+ *
+ * Bit N holds the value of the decoder's channel N, unused channels
+ * read as 0. Only the first 64 channels are covered.
  *
  * @param di The decoder instance to use. Must not be NULL.
- *           The number of channels must be >= 1.
  *
- * @return A newly allocated PyTuple containing the pin values at the
- *         current sample number.
+ * @return The pin values.
  */
-static PyObject *get_current_pinvalues(const struct srd_decoder_inst *di)
+static uint64_t get_current_pinvalues_mask(struct srd_decoder_inst *di)
 {
-	int i;
-	uint8_t sample;
+	int i, ch;
+	uint64_t pins;
 	const uint8_t *sample_pos;
-	int byte_offset, bit_offset;
-	PyObject *py_pinvalues;
-	PyGILState_STATE gstate;
+	const int *map;
 
-	if (!di) {
-		srd_err("Invalid decoder instance.");
-		return NULL;
+	sample_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum);
+	map = srd_inst_input_channelmap(di);
+
+	pins = 0;
+	for (i = 0; i < MIN(di->dec_num_channels, 64); i++) {
+		ch = map[i];
+		if (ch == -1)
+			continue;
+		if (sample_pos[ch / 8] & (1 << (ch % 8)))
+			pins |= (uint64_t)1 << i;
 	}
 
-	gstate = PyGILState_Ensure();
+	return pins;
+}
 
-	py_pinvalues = PyTuple_New(di->dec_num_channels);
+/**
+ * Get a tuple of booleans for the matched conditions.
+ *
+ * Tuples for up to 8 conditions are cached per instance, as for pin
+ * values. The caller must hold the GIL.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ * @param num_conditions The number of conditions.
+ * @param matched The matched conditions (bit N for condition N).
+ *
+ * @return A PyTuple (new reference).
+ */
+static PyObject *get_matched_tuple(struct srd_decoder_inst *di,
+		unsigned int num_conditions, uint64_t matched)
+{
+	unsigned int i, idx;
+	PyObject *py_matched;
+
+	idx = 0;
+	if (num_conditions <= 8) {
+		idx = (1 << num_conditions) + matched;
+		if (!di->py_matched_tuples)
+			di->py_matched_tuples = g_malloc0(512 * sizeof(PyObject *));
+		py_matched = di->py_matched_tuples[idx];
+		if (py_matched) {
+			Py_INCREF(py_matched);
+			return py_matched;
+		}
+	}
 
-	for (i = 0; i < di->dec_num_channels; i++) {
+	py_matched = PyTuple_New(num_conditions);
+	for (i = 0; i < num_conditions; i++)
+		PyTuple_SetItem(py_matched, i, PyBool_FromLong((matched >> i) & 1));
+
+	if (idx) {
+		di->py_matched_tuples[idx] = py_matched;
+		Py_INCREF(py_matched);
+	}
+
+	return py_matched;
+}
+
+/**
+ * Free the cached pin value and matched tuples of an instance.
+ *
+ * The caller must hold the GIL.
+ *
+ * @param di The decoder instance. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void tuple_caches_free(struct srd_decoder_inst *di)
+{
+	int i;
+
+	if (di->py_pin_tuples) {
+		for (i = 0; i < 256; i++)
+			Py_XDECREF((PyObject *)di->py_pin_tuples[i]);
+		g_free(di->py_pin_tuples);
+		di->py_pin_tuples = NULL;
+	}
+
+	if (di->py_matched_tuples) {
+		for (i = 0; i < 512; i++)
+			Py_XDECREF((PyObject *)di->py_matched_tuples[i]);
+		g_free(di->py_matched_tuples);
+		di->py_matched_tuples = NULL;
+	}
+}
+
+/* Create a tuple of pin values from a bitmask, see get_current_pinvalues(). */
+static PyObject *pinvalues_tuple_new(const struct srd_decoder_inst *di,
+		uint64_t pins)
+{
+	int i;
+	PyObject *py_pinvalues;
+
+	py_pinvalues = PyTuple_New(di->dec_num_channels);
+
+	for (i = 0; i < di->dec_num_channels; i++) {
+		/* A channelmap value of -1 means "unused optional channel". */
+		if (di->dec_channelmap[i] == -1) {
+			/* Value of unused channel is 0xff, instead of 0 or 1. */
+			PyTuple_SetItem(py_pinvalues, i, PyLong_FromUnsignedLong(0xff));
+		} else {
+			PyTuple_SetItem(py_pinvalues, i,
+				PyLong_FromUnsignedLong((pins >> i) & 1));
+		}
+	}
+
+	return py_pinvalues;
+}
+
+/**
+ * Get the pin values at the current sample number.
+ *
+ * @param di The decoder instance to use. Must not be NULL.
+ *           The number of channels must be >= 1.
+ *
+ * @return A PyTuple (new reference) containing the pin values at the
+ *         current sample number.
+ */
+static PyObject *get_current_pinvalues(struct srd_decoder_inst *di)
+{
+	int i;
+	uint64_t pins, unused;
+	uint8_t sample;
+	const uint8_t *sample_pos;
+	const int *map;
+	int byte_offset, bit_offset;
+	PyObject *py_pinvalues;
+	PyGILState_STATE gstate;
+
+	if (!di) {
+		srd_err("Invalid decoder instance.");
+		return NULL;
+	}
+
+	gstate = PyGILState_Ensure();
+
+	/*
+	 * Tuples are immutable, so the tuples of instances with few
+	 * channels are created once per combination of pin values, and
+	 * get re-used.
+	 */
+	if (di->dec_num_channels <= 8) {
+		unused = 0;
+		for (i = 0; i < di->dec_num_channels; i++) {
+			if (di->dec_channelmap[i] == -1)
+				unused |= 1 << i;
+		}
+		if (di->py_pin_tuples && di->py_pin_tuples_unused != unused)
+			tuple_caches_free(di);
+		if (!di->py_pin_tuples) {
+			di->py_pin_tuples = g_malloc0(256 * sizeof(PyObject *));
+			di->py_pin_tuples_unused = unused;
+		}
+		pins = get_current_pinvalues_mask(di);
+		py_pinvalues = di->py_pin_tuples[pins];
+		if (!py_pinvalues) {
+			py_pinvalues = pinvalues_tuple_new(di, pins);
+			di->py_pin_tuples[pins] = py_pinvalues;
+		}
+		Py_INCREF(py_pinvalues);
+		PyGILState_Release(gstate);
+		return py_pinvalues;
+	}
+
+	py_pinvalues = PyTuple_New(di->dec_num_channels);
+
+	sample_pos = srd_inst_sample_pos(di, di->abs_cur_samplenum);
+	map = srd_inst_input_channelmap(di);
+
+	for (i = 0; i < di->dec_num_channels; i++) {
 		/* A channelmap value of -1 means "unused optional channel". */
 		if (di->dec_channelmap[i] == -1) {
 			/* Value of unused channel is 0xff, instead of 0 or 1. */
 			PyTuple_SetItem(py_pinvalues, i, PyLong_FromUnsignedLong(0xff));
 		} else {
-			sample_pos = di->inbuf + ((di->abs_cur_samplenum - di->abs_start_samplenum) * di->data_unitsize);
-			byte_offset = di->dec_channelmap[i] / 8;
-			bit_offset = di->dec_channelmap[i] % 8;
+			byte_offset = map[i] / 8;
+			bit_offset = map[i] % 8;
 			sample = *(sample_pos + byte_offset) & (1 << bit_offset) ? 1 : 0;
 			PyTuple_SetItem(py_pinvalues, i, PyLong_FromUnsignedLong(sample));
 		}
@@ -827,7 +1428,7 @@ static int set_new_condition_list(PyObject *self, PyObject *args)
 	gstate = PyGILState_Ensure();
 
 	/* Get the decoder instance. */
-	if (!(di = srd_inst_find_by_obj(NULL, self))) {
+	if (!(di = srd_inst_find_by_obj(self))) {
 		PyErr_SetString(PyExc_Exception, "decoder instance not found");
 		goto err;
 	}
@@ -900,6 +1501,10 @@ static int set_new_condition_list(PyObject *self, PyObject *args)
 		di->condition_list = g_slist_append(di->condition_list, term_list);
 	}
 
+	/* Prepare the bitmask form of the new conditions. */
+	if (ret >= 0)
+		condition_list_compile(di);
+
 	Py_DecRef(py_conditionlist);
 
 	PyGILState_Release(gstate);
@@ -948,35 +1553,35 @@ static int set_skip_condition(struct srd_decoder_inst *di, uint64_t count)
 	term->num_samples_already_skipped = 0;
 	term_list = g_slist_append(NULL, term);
 	di->condition_list = g_slist_append(di->condition_list, term_list);
+	condition_list_compile(di);
 
 	return SRD_OK;
 }
 
-static PyObject *Decoder_wait(PyObject *self, PyObject *args)
+/**
+ * Setup the condition list for a wait() call.
+ *
+ * @param self The Decoder object. Must not be NULL.
+ * @param di The decoder instance. Must not be NULL.
+ * @param args A tuple holding the (optional) conditions. Must not be NULL.
+ * @param skip_wait Will be set to TRUE when no conditions were given.
+ *                  May be NULL.
+ *
+ * @return SRD_OK upon success, a (negative) error code otherwise.
+ */
+static int set_wait_conditions(PyObject *self, struct srd_decoder_inst *di,
+		PyObject *args, gboolean *skip_wait)
 {
 	int ret;
 	uint64_t skip_count;
-	unsigned int i;
-	gboolean found_match;
-	struct srd_decoder_inst *di;
-	PyObject *py_pinvalues, *py_matched, *py_samplenum;
-	PyGILState_STATE gstate;
-
-	if (!self || !args)
-		return NULL;
-
-	gstate = PyGILState_Ensure();
 
-	if (!(di = srd_inst_find_by_obj(NULL, self))) {
-		PyErr_SetString(PyExc_Exception, "decoder instance not found");
-		PyGILState_Release(gstate);
-		Py_RETURN_NONE;
-	}
+	if (skip_wait)
+		*skip_wait = FALSE;
 
 	ret = set_new_condition_list(self, args);
 	if (ret < 0) {
 		srd_dbg("%s: %s: Aborting wait().", di->inst_id, __func__);
-		goto err;
+		return ret;
 	}
 	if (ret == 9999) {
 		/*
@@ -996,9 +1601,92 @@ static PyObject *Decoder_wait(PyObject *self, PyObject *args)
 		if (ret < 0) {
 			srd_dbg("%s: %s: Cannot setup condition-less wait().",
 				di->inst_id, __func__);
-			goto err;
+			return ret;
+		}
+		if (skip_wait)
+			*skip_wait = TRUE;
+	}
+
+	return SRD_OK;
+}
+
+/**
+ * Restart the current condition list after a match, as if wait() got
+ * called again with the same conditions.
+ *
+ * @param di The decoder instance. Must not be NULL.
+ * @param skip_wait TRUE when wait() was called without conditions.
+ */
+static void restart_wait_conditions(struct srd_decoder_inst *di,
+		gboolean skip_wait)
+{
+	GSList *l, *t;
+	struct srd_term *term;
+
+	for (l = di->condition_list; l; l = l->next) {
+		for (t = l->data; t; t = t->next) {
+			term = t->data;
+			if (term->type != SRD_TERM_SKIP)
+				continue;
+			term->num_samples_already_skipped = 0;
+			/* Away from sample 0, condition-less waits skip one. */
+			if (skip_wait)
+				term->num_samples_to_skip = 1;
 		}
 	}
+}
+
+/* Account for a wait() call, and the Python code which ran before it. */
+static void wait_stats_enter(struct srd_decoder_inst *di)
+{
+	di->stats.wait_calls++;
+	if (di->wait_return_time) {
+		di->stats.python_time += g_get_monotonic_time() -
+			di->wait_return_time;
+		di->wait_return_time = 0;
+	}
+}
+
+/*
+ * With a ring of chunks, the application doesn't flush, so flush at the
+ * end of each chunk. This happens before the chunk gets handed back, so
+ * that srd_session_sync() also waits for the flush's output. The caller
+ * holds the data_mutex, which gets dropped while flushing.
+ */
+static void chunk_flush(struct srd_decoder_inst *di)
+{
+	if (di->chunk_queue_depth < 2 || di->want_wait_terminate)
+		return;
+
+	g_mutex_unlock(&di->data_mutex);
+	srd_inst_flush(di);
+	g_mutex_lock(&di->data_mutex);
+}
+
+static PyObject *Decoder_wait(PyObject *self, PyObject *args)
+{
+	unsigned int i;
+	uint64_t matched_mask;
+	gboolean found_match;
+	struct srd_decoder_inst *di;
+	PyObject *py_pinvalues, *py_matched, *py_samplenum;
+	PyGILState_STATE gstate;
+
+	if (!self || !args)
+		return NULL;
+
+	gstate = PyGILState_Ensure();
+
+	if (!(di = srd_inst_find_by_obj(self))) {
+		PyErr_SetString(PyExc_Exception, "decoder instance not found");
+		PyGILState_Release(gstate);
+		Py_RETURN_NONE;
+	}
+
+	wait_stats_enter(di);
+
+	if (set_wait_conditions(self, di, args, NULL) < 0)
+		goto err;
 
 	while (1) {
 
@@ -1006,7 +1694,7 @@ static PyObject *Decoder_wait(PyObject *self, PyObject *args)
 
 		/* Wait for new samples to process, or termination request. */
 		g_mutex_lock(&di->data_mutex);
-		while (!di->got_new_samples && !di->want_wait_terminate)
+		while (!di->want_wait_terminate && !srd_inst_chunk_next(di))
 			g_cond_wait(&di->got_new_samples_cond, &di->data_mutex);
 
 		/*
@@ -1031,9 +1719,18 @@ static PyObject *Decoder_wait(PyObject *self, PyObject *args)
 			Py_DECREF(py_samplenum);
 
 			if (di->match_array && di->match_array->len > 0) {
-				py_matched = PyTuple_New(di->match_array->len);
-				for (i = 0; i < di->match_array->len; i++)
-					PyTuple_SetItem(py_matched, i, PyBool_FromLong(di->match_array->data[i]));
+				if (di->match_array->len <= 64) {
+					matched_mask = 0;
+					for (i = 0; i < di->match_array->len; i++) {
+						if (di->match_array->data[i])
+							matched_mask |= (uint64_t)1 << i;
+					}
+					py_matched = get_matched_tuple(di, di->match_array->len, matched_mask);
+				} else {
+					py_matched = PyTuple_New(di->match_array->len);
+					for (i = 0; i < di->match_array->len; i++)
+						PyTuple_SetItem(py_matched, i, PyBool_FromLong(di->match_array->data[i]));
+				}
 				PyObject_SetAttrString(di->py_inst, "matched", py_matched);
 				Py_DECREF(py_matched);
 				match_array_free(di);
@@ -1045,21 +1742,16 @@ static PyObject *Decoder_wait(PyObject *self, PyObject *args)
 
 			g_mutex_unlock(&di->data_mutex);
 
+			di->wait_return_time = g_get_monotonic_time();
 			PyGILState_Release(gstate);
 
 			return py_pinvalues;
 		}
 
-		/* No match, reset state for the next chunk. */
-		di->got_new_samples = FALSE;
-		di->handled_all_samples = TRUE;
-		di->abs_start_samplenum = 0;
-		di->abs_end_samplenum = 0;
-		di->inbuf = NULL;
-		di->inbuflen = 0;
-
-		/* Signal the main thread that we handled all samples. */
-		g_cond_signal(&di->handled_all_samples_cond);
+		/* No match, hand the chunk back and continue with the next. */
+		chunk_views_release(di);
+		chunk_flush(di);
+		srd_inst_chunk_done(di);
 
 		/*
 		 * When termination of wait() and decode() was requested,
@@ -1085,6 +1777,356 @@ err:
 	return NULL;
 }
 
+/* Max number of matches which wait_many() returns at once. */
+#define WAIT_MANY_MAX (1 << 20)
+
+/**
+ * Wait for several successive matches of the same conditions.
+ *
+ * Behaves like calling self.wait(conds) up to 'max_matches' times in a
+ * row, but returns all matches at once, as a bytes object holding three
+ * native uint64 values per match: the sample number, the pin values
+ * (bit N for channel N) and the matched conditions (bit N for condition
+ * N). Returns early at the end of a chunk when at least one match was
+ * found, so decoders don't stall at the end of the input. Supports up to
+ * 64 channels and 64 conditions, and up to WAIT_MANY_MAX matches per call.
+ *
+ * self.samplenum and self.matched reflect the last match.
+ *
+ * @param self The Decoder object. Must not be NULL.
+ * @param args The conditions and the maximum number of matches.
+ *             Must not be NULL.
+ *
+ * @return The matches, or NULL upon errors and termination requests.
+ */
+static PyObject *Decoder_wait_many(PyObject *self, PyObject *args)
+{
+	unsigned int i;
+	uint64_t matched_mask, item[3];
+	Py_ssize_t max_matches, num_matches;
+	gboolean found_match, skip_wait;
+	struct srd_decoder_inst *di;
+	PyObject *py_conds, *py_args, *py_matched, *py_samplenum, *py_res;
+	GArray *matches;
+	PyGILState_STATE gstate;
+
+	if (!self || !args)
+		return NULL;
+
+	gstate = PyGILState_Ensure();
+
+	if (!(di = srd_inst_find_by_obj(self))) {
+		PyErr_SetString(PyExc_Exception, "decoder instance not found");
+		PyGILState_Release(gstate);
+		Py_RETURN_NONE;
+	}
+
+	wait_stats_enter(di);
+
+	if (!PyArg_ParseTuple(args, "On", &py_conds, &max_matches)) {
+		/* Let Python raise this exception. */
+		goto err;
+	}
+	if (max_matches < 1) {
+		PyErr_SetString(PyExc_ValueError, "max_matches must be positive");
+		goto err;
+	}
+	if (max_matches > WAIT_MANY_MAX) {
+		PyErr_Format(PyExc_ValueError, "max_matches must not exceed %d",
+			WAIT_MANY_MAX);
+		goto err;
+	}
+	if (di->dec_num_channels > 64) {
+		PyErr_SetString(PyExc_ValueError, "too many channels for wait_many()");
+		goto err;
+	}
+
+	py_args = PyTuple_Pack(1, py_conds);
+	if (!py_args)
+		goto err;
+	if (set_wait_conditions(self, di, py_args, &skip_wait) < 0) {
+		Py_DECREF(py_args);
+		goto err;
+	}
+	Py_DECREF(py_args);
+	if (g_slist_length(di->condition_list) > 64) {
+		PyErr_SetString(PyExc_ValueError, "too many conditions for wait_many()");
+		goto err;
+	}
+
+	/* Start small, most calls return way less than 'max_matches'. */
+	matches = g_array_sized_new(FALSE, FALSE, sizeof(uint64_t),
+		3 * MIN(max_matches, 64));
+	num_matches = 0;
+
+	while (1) {
+
+		Py_BEGIN_ALLOW_THREADS
+
+		/* Wait for new samples to process, or termination request. */
+		g_mutex_lock(&di->data_mutex);
+		while (!di->want_wait_terminate && !srd_inst_chunk_next(di))
+			g_cond_wait(&di->got_new_samples_cond, &di->data_mutex);
+
+		/* Collect matches until the chunk or 'max_matches' is exhausted. */
+		found_match = FALSE;
+		while (num_matches < max_matches) {
+			(void)process_samples_until_condition_match(di, &found_match);
+			if (!found_match)
+				break;
+			matched_mask = 0;
+			for (i = 0; di->match_array && i < di->match_array->len; i++) {
+				if (di->match_array->data[i])
+					matched_mask |= (uint64_t)1 << i;
+			}
+			item[0] = di->abs_cur_samplenum;
+			item[1] = get_current_pinvalues_mask(di);
+			item[2] = matched_mask;
+			g_array_append_vals(matches, item, 3);
+			num_matches++;
+			restart_wait_conditions(di, skip_wait);
+		}
+
+		Py_END_ALLOW_THREADS
+
+		if (matches->len > 0) {
+			/* Set self.samplenum and self.matched from the last match. */
+			item[0] = g_array_index(matches, uint64_t, matches->len - 3);
+			item[2] = g_array_index(matches, uint64_t, matches->len - 1);
+			py_samplenum = PyLong_FromUnsignedLongLong(item[0]);
+			PyObject_SetAttrString(di->py_inst, "samplenum", py_samplenum);
+			Py_DECREF(py_samplenum);
+			if (di->match_array && di->match_array->len > 0) {
+				py_matched = get_matched_tuple(di, di->match_array->len, item[2]);
+				PyObject_SetAttrString(di->py_inst, "matched", py_matched);
+				Py_DECREF(py_matched);
+			} else {
+				PyObject_SetAttrString(di->py_inst, "matched", Py_None);
+			}
+			match_array_free(di);
+		}
+
+		/* All samples of the chunk were checked, hand it back. */
+		if (!found_match) {
+			chunk_views_release(di);
+			chunk_flush(di);
+			srd_inst_chunk_done(di);
+
+			if (di->want_wait_terminate) {
+				srd_dbg("%s: %s: Will return from wait_many().",
+					di->inst_id, __func__);
+				g_mutex_unlock(&di->data_mutex);
+				g_array_free(matches, TRUE);
+				goto err;
+			}
+		}
+
+		g_mutex_unlock(&di->data_mutex);
+
+		if (matches->len > 0)
+			break;
+	}
+
+	py_res = PyBytes_FromStringAndSize((const char *)matches->data,
+		matches->len * sizeof(uint64_t));
+	g_array_free(matches, TRUE);
+
+	di->wait_return_time = g_get_monotonic_time();
+	PyGILState_Release(gstate);
+
+	return py_res;
+
+err:
+	PyGILState_Release(gstate);
+
+	return NULL;
+}
+
+/*
+ * The limited API only provides the buffer flags since Python 3.11, yet
+ * PyMemoryView_FromMemory() is available (and takes them) since 3.3.
+ */
+#ifndef PyBUF_READ
+#define PyBUF_READ 0x100
+#endif
+
+/* Release one of the memoryviews of the current chunk. */
+static void chunk_view_release(struct srd_decoder_inst *di, void **view)
+{
+	PyObject *py_view, *py_res;
+
+	py_view = *view;
+	if (!py_view)
+		return;
+	*view = NULL;
+
+	py_res = PyObject_CallMethod(py_view, "release", NULL);
+	if (py_res) {
+		Py_DECREF(py_res);
+	} else if (PyErr_ExceptionMatches(PyExc_BufferError)) {
+		/* Some object (e.g. a NumPy array) still uses the memory. */
+		PyErr_Clear();
+		srd_warn("%s: Chunk data is still in use after the end of "
+			"the chunk, it must not be accessed any longer.",
+			di->inst_id);
+	} else {
+		srd_exception_catch("Cannot release chunk data of %s",
+			di->inst_id);
+	}
+	Py_DECREF(py_view);
+}
+
+/**
+ * Release the memoryviews of the current chunk.
+ *
+ * Gets called when the decoder instance is done with a chunk, as the
+ * memory is owned by the frontend and must not be accessed afterwards.
+ * The caller must hold the GIL.
+ *
+ * @param di The decoder instance. Must not be NULL.
+ *
+ * @private
+ */
+SRD_PRIV void chunk_views_release(struct srd_decoder_inst *di)
+{
+	chunk_view_release(di, &di->py_chunk_data);
+	chunk_view_release(di, &di->py_chunk_samplenums);
+}
+
+/**
+ * Get the current chunk of input samples.
+ *
+ * Returns a tuple (start, end, data, unitsize, channelmap, samplenums):
+ * the absolute sample numbers of the first sample of the chunk and the
+ * one after its last sample, a read-only memoryview of the sample values
+ * with 'unitsize' bytes per value, and the input channel numbers (bit
+ * offsets within a value) of the decoder's channels, -1 for unused
+ * channels. For chunks which were sent as a list of transitions,
+ * 'samplenums' is a read-only memoryview of the transitions' sample
+ * numbers (native uint64, use .cast('Q')), and 'data' holds one value
+ * per transition. Otherwise 'samplenums' is None, and 'data' holds one
+ * value per sample.
+ *
+ * The memoryviews are only valid until the chunk has been handled, i.e.
+ * until a wait() call runs past its end. They get released then, so
+ * objects which use their memory must not be kept beyond that point.
+ * Returns None when no chunk is available.
+ *
+ * @param self The Decoder object. Must not be NULL.
+ * @param args Unused.
+ *
+ * @return The chunk information, None without a chunk, NULL upon errors.
+ */
+static PyObject *Decoder_chunk(PyObject *self, PyObject *args)
+{
+	int i;
+	const int *map;
+	uint64_t num_values;
+	struct srd_decoder_inst *di;
+	PyObject *py_channelmap, *py_samplenums, *py_res;
+	PyGILState_STATE gstate;
+
+	(void)args;
+
+	if (!self)
+		return NULL;
+
+	gstate = PyGILState_Ensure();
+
+	if (!(di = srd_inst_find_by_obj(self))) {
+		PyErr_SetString(PyExc_Exception, "decoder instance not found");
+		goto err;
+	}
+
+	if (!di->got_new_samples || !di->inbuf) {
+		PyGILState_Release(gstate);
+		Py_RETURN_NONE;
+	}
+
+	if (!di->py_chunk_data) {
+		di->py_chunk_data = PyMemoryView_FromMemory((char *)di->inbuf,
+			di->inbuflen, PyBUF_READ);
+		if (!di->py_chunk_data)
+			goto err;
+	}
+	if (di->inbuf_samplenums && !di->py_chunk_samplenums) {
+		num_values = di->inbuf_num_transitions;
+		di->py_chunk_samplenums = PyMemoryView_FromMemory(
+			(char *)di->inbuf_samplenums,
+			num_values * sizeof(uint64_t), PyBUF_READ);
+		if (!di->py_chunk_samplenums)
+			goto err;
+	}
+	py_samplenums = di->py_chunk_samplenums ? di->py_chunk_samplenums : Py_None;
+
+	map = srd_inst_input_channelmap(di);
+	py_channelmap = PyTuple_New(di->dec_num_channels);
+	for (i = 0; i < di->dec_num_channels; i++)
+		PyTuple_SetItem(py_channelmap, i, PyLong_FromLong(map[i]));
+
+	py_res = Py_BuildValue("(KKOiNO)",
+		(unsigned long long)di->abs_start_samplenum,
+		(unsigned long long)di->abs_end_samplenum,
+		di->py_chunk_data, di->data_unitsize, py_channelmap,
+		py_samplenums);
+
+	PyGILState_Release(gstate);
+
+	return py_res;
+
+err:
+	PyGILState_Release(gstate);
+
+	return NULL;
+}
+
+/**
+ * Return whether the frontend receives an annotation class.
+ *
+ * Decoders can skip building annotations of disabled classes.
+ *
+ * @param self The Decoder object. Must not be NULL.
+ * @param arg The annotation class. Must not be NULL.
+ *
+ * @retval Py_True The annotation class is enabled.
+ * @retval Py_False The annotation class is disabled.
+ * @retval NULL An error occurred.
+ */
+static PyObject *Decoder_ann_enabled(PyObject *self, PyObject *arg)
+{
+	long ann_class;
+	struct srd_decoder_inst *di;
+	PyGILState_STATE gstate;
+	PyObject *bool_ret;
+
+	if (!self || !arg)
+		return NULL;
+
+	gstate = PyGILState_Ensure();
+
+	if (!(di = srd_inst_find_by_obj(self))) {
+		PyErr_SetString(PyExc_Exception, "decoder instance not found");
+		goto err;
+	}
+
+	ann_class = PyLong_AsLong(arg);
+	if (ann_class == -1 && PyErr_Occurred()) {
+		/* Let Python raise this exception. */
+		goto err;
+	}
+
+	bool_ret = PyBool_FromLong(ann_class_enabled(di, ann_class));
+
+	PyGILState_Release(gstate);
+
+	return bool_ret;
+
+err:
+	PyGILState_Release(gstate);
+
+	return NULL;
+}
+
 /**
  * Return whether the specified channel was supplied to the decoder.
  *
@@ -1107,7 +2149,7 @@ static PyObject *Decoder_has_channel(PyObject *self, PyObject *args)
 
 	gstate = PyGILState_Ensure();
 
-	if (!(di = srd_inst_find_by_obj(NULL, self))) {
+	if (!(di = srd_inst_find_by_obj(self))) {
 		PyErr_SetString(PyExc_Exception, "decoder instance not found");
 		goto err;
 	}
@@ -1148,8 +2190,14 @@ static PyMethodDef Decoder_methods[] = {
 			"Register a new output stream" },
 	{ "wait", Decoder_wait, METH_VARARGS,
 			"Wait for one or more conditions to occur" },
+	{ "wait_many", Decoder_wait_many, METH_VARARGS,
+			"Wait for up to max_matches successive condition matches" },
 	{ "has_channel", Decoder_has_channel, METH_VARARGS,
 			"Report whether a channel was supplied" },
+	{ "chunk", Decoder_chunk, METH_NOARGS,
+			"Get the current chunk of input samples" },
+	{ "ann_enabled", Decoder_ann_enabled, METH_O,
+			"Report whether an annotation class is enabled" },
 	{NULL, NULL, 0, NULL}
 };
 